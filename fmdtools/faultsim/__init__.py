@@ -1,3 +1,6 @@
 
 from fmdtools.faultsim import networks
-from fmdtools.faultsim import propagate
\ No newline at end of file
+from fmdtools.faultsim import propagate
+from fmdtools.faultsim import nomcache
+from fmdtools.faultsim import profiler
+from fmdtools.faultsim import eventstream
\ No newline at end of file
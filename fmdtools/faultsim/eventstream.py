@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+File name: eventstream.py
+Created: October 2026
+
+Description: structured events of fault propagation runs (see propagate), which are sent to the callbacks
+subscribed to them (e.g. to monitor long runs) and can be written to a compact binary log.
+
+Main Classes:
+    - EventStream:          Sends the events of the runs it is given to to the callbacks subscribed to them
+    - EventLog:             Writes the events it is called with to a binary log file
+Main Methods:
+    - read_eventlog():      Reads the events written to a binary log file by EventLog
+"""
+import struct
+import pickle
+from collections import namedtuple
+
+eventkinds = ('scenario start', 'scenario end', 'fault injected', 'function changed', 'flow degraded',
+              'nonconvergence', 'reconverged', 'error')
+Event = namedtuple('Event', ['kind', 'scen', 'time', 'name', 'data'])
+Event.__doc__ = """
+Event of a propagation run (see EventStream)
+
+Fields
+------
+kind : str
+    Kind of event (in eventkinds)
+scen : str
+    Name of the scenario the event occurred in
+time : float
+    Time of the event in the scenario
+name : str or None
+    Name of the function (for 'fault injected'/'function changed') or flow (for 'flow degraded') of the event
+data : dict or None
+    Data of the event (see EventStream)
+"""
+
+class EventStream(object):
+    """
+    Sends the events of the runs it is given to (e.g. propagate.single_faults(mdl, events=stream)) to the callbacks
+    subscribed to them. Events are only constructed if a callback is subscribed to their kind, so events not
+    subscribed to do not slow down the run. Events in worker processes (with pool/workers) are not sent.
+
+    Kinds of events (with the name and data of each event):
+        - 'scenario start':     the start of a scenario (data: None)
+        - 'scenario end':       the end of a scenario (data: {'elapsed': wall time of the scenario in s})
+        - 'fault injected':     faults injected in a function (name: function, data: {'faults': faults injected})
+        - 'function changed':   a change in the states/faults of a function (name: function,
+                                data: {'states': states, 'faults': faults}, see Block.return_states)
+        - 'flow degraded':      a flow first deviating from the nominal scenario (name: flow, data: {att: value} of the
+                                deviating attributes). Requires track and is not sent for scenarios run in lanes.
+        - 'nonconvergence':     the functions of the model not converging in a time-step (data: {'fxns':functions,
+                                'loops':feedback loops, 'sweeps':sweeps}, see propagate.ConvergenceError)
+        - 'reconverged':        the scenario reconverging with the nominal scenario (with reconv=True)
+        - 'error':              an error raised in the scenario (data: {'error': repr of the error})
+
+    Attributes
+    ----------
+    subscribers : list
+        Callbacks and the kinds and names of the events they are subscribed to with structure [(callback, kinds, names)]
+    kinds : set
+        Kinds of events any callback is subscribed to
+    scen : str
+        Name of the scenario being run (or, for scenarios run in lanes, the names of the scenarios joined by ', ')
+    """
+    def __init__(self):
+        self.subscribers = []
+        self.kinds = set()
+        self.scen = None
+    def subscribe(self, callback, kinds=eventkinds, names=None):
+        """
+        Subscribes a callback to the events of the given kinds (and names).
+
+        Parameters
+        ----------
+        callback : callable
+            Function called with each event subscribed to (an Event)
+        kinds : iterable, optional
+            Kinds of events to subscribe to (see EventStream). The default is eventkinds (all kinds).
+        names : iterable or None, optional
+            Names of the functions/flows of the events to subscribe to (events without names, e.g. 'scenario end',
+            are always sent). The default is None (all names).
+
+        Returns
+        -------
+        callback : callable
+            The callback subscribed (e.g. to unsubscribe it later)
+        """
+        if type(kinds)==str: kinds=[kinds]
+        if set(kinds).difference(eventkinds):
+            raise Exception("Invalid event kinds: "+str(set(kinds).difference(eventkinds))+". Kinds should be in "+str(eventkinds))
+        self.subscribers.append((callback, frozenset(kinds), frozenset(names) if names is not None else None))
+        self.kinds.update(kinds)
+        return callback
+    def unsubscribe(self, callback):
+        """ Unsubscribes the callback from the events it is subscribed to """
+        self.subscribers = [sub for sub in self.subscribers if sub[0]!=callback]
+        self.kinds = set().union(*[kinds for _, kinds, _ in self.subscribers])
+    def emit(self, kind, time, name=None, data=None):
+        """ Sends the event (of the current scenario) to the callbacks subscribed to it """
+        event = Event(kind, self.scen, float(time), name, data)
+        for callback, kinds, names in self.subscribers:
+            if kind in kinds and (names is None or name is None or name in names): callback(event)
+
+class EventLog(object):
+    """
+    Writes the events it is called with to a binary log file (e.g. stream.subscribe(EventLog('run.evt'))), which
+    can be read with read_eventlog.
+
+    Each event is written as a fixed-size record (kind, scenario, name, time, size of data) followed by its data
+    (pickled, if any). Scenario and function/flow names are written once, as string records, and then referred to
+    by their index, so each event without data takes 21 bytes.
+
+    Attributes
+    ----------
+    file : file
+        File the events are written to
+    strings : dict
+        Index of each string written to the file {string:index}
+    """
+    header = b'FMDEVT\x01'
+    record = struct.Struct('<BIIdI')
+    def __init__(self, filename):
+        """
+        Parameters
+        ----------
+        filename : str
+            File to write the events to (overwritten if it exists)
+        """
+        self.file = open(filename, 'wb')
+        self.file.write(self.header)
+        self.strings = {None:0}
+    def __call__(self, event):
+        data = pickle.dumps(event.data, protocol=pickle.HIGHEST_PROTOCOL) if event.data is not None else b''
+        self.file.write(self.record.pack(eventkinds.index(event.kind)+1, self._string(event.scen),
+                                         self._string(event.name), event.time, len(data)))
+        self.file.write(data)
+    def _string(self, string):
+        """ Returns the index of the string in the log (writing a string record if it is not yet written) """
+        if string not in self.strings:
+            self.strings[string] = len(self.strings)
+            encoded = str(string).encode()
+            self.file.write(self.record.pack(0, self.strings[string], 0, 0.0, len(encoded)))
+            self.file.write(encoded)
+        return self.strings[string]
+    def close(self):
+        """ Closes the log file """
+        self.file.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+
+def read_eventlog(filename):
+    """
+    Reads the events written to a binary log file by EventLog
+
+    Parameters
+    ----------
+    filename : str
+        File the events were written to
+
+    Yields
+    ------
+    event : Event
+        Each event in the log (in the order they were written)
+    """
+    record = EventLog.record
+    with open(filename, 'rb') as f:
+        if f.read(len(EventLog.header))!=EventLog.header:
+            raise Exception("Invalid event log: "+str(filename))
+        strings = [None]
+        while True:
+            fields = f.read(record.size)
+            if len(fields)<record.size: return
+            kind, scen, name, time, size = record.unpack(fields)
+            data = f.read(size)
+            if kind==0:     strings.append(data.decode())
+            else:           yield Event(eventkinds[kind-1], strings[scen], time, strings[name], pickle.loads(data) if size else None)
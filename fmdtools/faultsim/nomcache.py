@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+File name: nomcache.py
+Created: October 2026
+
+Description: an on-disk cache of nominal runs, so repeated analyses of the same model/design (in the same or
+different processes or sessions) do not need to re-simulate the nominal scenario.
+
+Main Classes:
+    - NominalCache:         Cache of the nominal results of model runs (see propagate.run_nominal) in a directory
+Private Methods:
+    - get_key():            Returns a stable hash of a model class, params, modelparams, and the nominal run options
+    - stable_repr():        Returns a representation of a value which is the same across processes/sessions
+    - split_arrays():       Replaces the arrays in a nested structure with references to a list of arrays
+    - join_arrays():        Replaces the array references in a nested structure with the given arrays
+"""
+import os
+import sys
+import pickle
+import hashlib
+import inspect
+import numpy as np
+
+_cacheversion = 2 # version of the format of the cached nominal results (changing it invalidates existing entries)
+
+class NominalCache(object):
+    """
+    Cache of the nominal results of model runs (see propagate.run_nominal) stored on disk, keyed by a stable hash of the
+    model class (and the source of its module), params, modelparams, and the options of the run (see get_key).
+
+    Each entry is stored as two files in the directory: a .dat file with the (numeric) arrays of the results (e.g.
+    the nominal history), which is loaded as a copy-on-write memory map, so arrays are only read from disk when used,
+    and a .pkl file with the rest of the results. When the total size of the entries exceeds maxsize, the least
+    recently used entries are removed.
+
+    Attributes
+    ----------
+    path : str
+        Directory the cache is stored in
+    maxsize : int
+        Maximum total size of the cached entries in bytes
+    """
+    def __init__(self, path, maxsize=1e9):
+        """
+        Parameters
+        ----------
+        path : str
+            Directory to store the cache in (created if it does not exist)
+        maxsize : int, optional
+            Maximum total size of the cached entries in bytes. The default is 1e9 (1 GB).
+        """
+        self.path = path
+        self.maxsize = maxsize
+        os.makedirs(path, exist_ok=True)
+    def get(self, key):
+        """ Returns the nominal results cached with the given key (or False if there are none) """
+        pklfile, datfile = self._files(key)
+        try:
+            with open(pklfile, 'rb') as f:   layout, results = pickle.load(f)
+            if layout:  data = np.memmap(datfile, mode='c')
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False
+        os.utime(pklfile) # records the use of the entry (for LRU eviction)
+        arrays = [np.ndarray(shape, dtype=dtype, buffer=data, offset=offset) for offset, dtype, shape in layout]
+        return join_arrays(results, arrays)
+    def put(self, key, results):
+        """ Caches the nominal results with the given key, removing least-recently-used entries if over maxsize """
+        arrays = []
+        results = split_arrays(results, arrays)
+        layout, offset = [], 0
+        for array in arrays:
+            layout.append((offset, array.dtype.str, array.shape))
+            offset += -(-array.nbytes//64)*64   # arrays are aligned to 64 bytes
+        pkl = pickle.dumps((layout, results))
+        if offset+len(pkl) > self.maxsize: return
+        pklfile, datfile = self._files(key)
+        if arrays:
+            data = np.memmap(datfile+'.tmp', mode='w+', shape=(max(offset, 1),), dtype=np.uint8)
+            for (start, _, _), array in zip(layout, arrays):
+                data[start:start+array.nbytes] = np.ascontiguousarray(array).view(np.uint8).ravel()
+            data.flush()
+            del data
+            os.replace(datfile+'.tmp', datfile)
+        with open(pklfile+'.tmp', 'wb') as f: f.write(pkl)
+        os.replace(pklfile+'.tmp', pklfile) # the entry is only read once its .pkl file exists
+        self.evict(keep=key)
+    def evict(self, keep=None):
+        """ Removes the least-recently-used entries (other than keep) until the cache is within maxsize """
+        entries = []
+        for filename in os.listdir(self.path):
+            if filename.endswith('.pkl'):
+                key = filename[:-4]
+                pklfile, datfile = self._files(key)
+                try:
+                    size = os.path.getsize(pklfile) + (os.path.getsize(datfile) if os.path.exists(datfile) else 0)
+                    entries.append((os.path.getmtime(pklfile), size, key))
+                except OSError: continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.maxsize: break
+            if key==keep: continue
+            self.remove(key)
+            total -= size
+    def remove(self, key):
+        """ Removes the entry with the given key from the cache """
+        for filename in self._files(key):
+            try:                os.remove(filename)
+            except OSError:     pass
+    def clear(self):
+        """ Removes all entries from the cache """
+        for filename in os.listdir(self.path):
+            if filename.endswith('.pkl'): self.remove(filename[:-4])
+    def _files(self, key):
+        return os.path.join(self.path, key+'.pkl'), os.path.join(self.path, key+'.dat')
+
+def get_key(mdl, **options):
+    """
+    Returns a stable hash of the model class (and the source of the module it is defined in, so entries are
+    invalidated when the model is changed), params, modelparams, and the given options of the nominal run.
+    """
+    cls = type(mdl)
+    try:                        source = inspect.getsource(sys.modules[cls.__module__])
+    except (OSError, TypeError, KeyError):  source = ''
+    modelparams = {'phases':mdl.phases, 'times':mdl.times, 'tstep':mdl.tstep, 'units':mdl.units,
+                   'statevector':getattr(mdl, '_use_statevector', False)}
+    if getattr(mdl, '_adaptive', False): modelparams['adaptive'] = True
+    ident = (_cacheversion, cls.__module__, cls.__qualname__, hashlib.sha1(source.encode()).hexdigest(),
+             getattr(mdl, 'params', {}), modelparams, options)
+    return hashlib.sha1(stable_repr(ident).encode()).hexdigest()
+def stable_repr(val):
+    """ Returns a representation of a value which is the same across processes/sessions (e.g. sets are sorted) """
+    if isinstance(val, dict):           return '{'+','.join(sorted(stable_repr(k)+':'+stable_repr(v) for k, v in val.items()))+'}'
+    elif isinstance(val, (set, frozenset)):   return 'set('+','.join(sorted(stable_repr(v) for v in val))+')'
+    elif isinstance(val, (list, tuple)):return type(val).__name__+'('+','.join(stable_repr(v) for v in val)+')'
+    elif isinstance(val, np.ndarray):   return 'array('+val.dtype.str+str(val.shape)+hashlib.sha1(np.ascontiguousarray(val).tobytes()).hexdigest()+')'
+    elif isinstance(val, type):         return val.__module__+'.'+val.__qualname__
+    else:                               return repr(val)
+
+class _ArrayRef(object):
+    """ Reference to an array stored separately from a nested structure (see split_arrays) """
+    def __init__(self, ind):
+        self.ind = ind
+def split_arrays(val, arrays):
+    """ Replaces the numeric arrays in the dicts/lists/tuples of val with references to the arrays (added to arrays) """
+    if isinstance(val, np.ndarray) and val.dtype!=object:
+        arrays.append(val)
+        return _ArrayRef(len(arrays)-1)
+    elif type(val)==dict:   return {k:split_arrays(v, arrays) for k, v in val.items()}
+    elif type(val)==list:   return [split_arrays(v, arrays) for v in val]
+    elif type(val)==tuple:  return tuple(split_arrays(v, arrays) for v in val)
+    else:                   return val
+def join_arrays(val, arrays):
+    """ Replaces the array references in val (see split_arrays) with the arrays they refer to """
+    if isinstance(val, _ArrayRef):  return arrays[val.ind]
+    elif type(val)==dict:   return {k:join_arrays(v, arrays) for k, v in val.items()}
+    elif type(val)==list:   return [join_arrays(v, arrays) for v in val]
+    elif type(val)==tuple:  return tuple(join_arrays(v, arrays) for v in val)
+    else:                   return val
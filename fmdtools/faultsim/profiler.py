@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+File name: profiler.py
+Created: October 2026
+
+Description: instrumentation of fault propagation runs (see propagate), which records where the time of a run is
+spent without wrapping the run in a general-purpose profiler (e.g. cProfile).
+
+Main Classes:
+    - Profiler:             Records the time/calls of the functions of a model, the sweeps of each propagation step, and the
+                            time spent recording histories, copying model states, and classifying scenarios
+"""
+import contextlib
+from time import perf_counter
+import pandas as pd
+
+class Profiler(object):
+    """
+    Records the time spent in the runs of a model it is given to (e.g. propagate.single_faults(mdl, profile=profiler)).
+    The records accumulate over the runs, and are returned as DataFrames by report (time and calls of each section of
+    the run) and sweeps (number of flows changed in each sweep of each propagation step). When no profiler is given,
+    the runs are not instrumented. Runs in worker processes (with pool/workers) are not recorded.
+
+    Sections recorded in report:
+        - ('condfaults', fxnname)/('behavior', fxnname): the condfaults/behavior methods of each function
+        - ('propagation', 'propagate'): the propagation of each time-step (including the functions run)
+        - ('history', 'init_mdlhist')/('history', 'update_mdlhist'): initializing and recording model histories
+        - ('copy', method): copying, resetting, and capturing/setting the state of the model (e.g. in staged execution)
+        - ('classification', 'classify'): classifying the scenarios
+
+    Attributes
+    ----------
+    sections : dict
+        Calls and total time of each section of the runs with structure {(section, name):[calls, time]}
+    sweeplog : list
+        (scenario, time, flows changed) of each sweep of the functions in propagation (see propagate.prop_time)
+    scen : str
+        Name of the scenario being run (used to label the sweeps)
+    """
+    def __init__(self):
+        self.sections = {}
+        self.sweeplog = []
+        self.scen = None
+    def add(self, section, name, elapsed, calls=1):
+        """ Adds the elapsed time (and number of calls) to the record of the section (section, name) """
+        record = self.sections.setdefault((section, name), [0, 0.0])
+        record[0] += calls
+        record[1] += elapsed
+    @contextlib.contextmanager
+    def section(self, section, name):
+        """ Context manager which records the time spent in its block as a call of the section (section, name) """
+        start = perf_counter()
+        try:        yield
+        finally:    self.add(section, name, perf_counter()-start)
+    def add_sweep(self, time, numflows):
+        """ Records a sweep of the functions in the propagation step at time which changed numflows flows """
+        self.sweeplog.append((self.scen, time, numflows))
+    def updatefxn(self, fxn, time, faults=['nom']):
+        """ Runs FxnBlock.updatefxn for the function, recording the time spent in its condfaults and behavior methods """
+        overridden = {}
+        for method in ['condfaults', 'behavior']:
+            overridden[method] = fxn.__dict__.get(method)
+            fxn.__dict__[method] = self._timed(getattr(fxn, method), method, fxn.name)
+        try:        fxn.updatefxn(faults=faults, time=time)
+        finally:    # the methods are only wrapped during the call (so they are not part of the state of the function)
+            for method, prev in overridden.items():
+                if prev is None:    del fxn.__dict__[method]
+                else:               fxn.__dict__[method] = prev
+    def _timed(self, method, section, name):
+        """ Returns the method wrapped to record the time spent in it as a call of the section (section, name) """
+        def timed(time):
+            start = perf_counter()
+            try:        return method(time)
+            finally:    self.add(section, name, perf_counter()-start)
+        return timed
+    def report(self):
+        """
+        Returns the calls, total time, and time per call of each section of the runs (see Profiler), sorted by total time.
+
+        Returns
+        -------
+        report : DataFrame
+            Table indexed by (section, name) with the columns 'calls', 'time', and 'time per call'
+        """
+        index = pd.MultiIndex.from_tuples(list(self.sections), names=['section', 'name'])
+        report = pd.DataFrame([record for record in self.sections.values()], index=index, columns=['calls', 'time'])
+        report['time per call'] = report['time']/report['calls']
+        return report.sort_values('time', ascending=False)
+    def sweeps(self):
+        """
+        Returns the number of flows changed in each sweep of the functions in propagation (see propagate.prop_time).
+        The number of sweeps in each propagation step is given by sweeps().groupby(['scenario', 'time']).size().
+
+        Returns
+        -------
+        sweeps : DataFrame
+            Table with the columns 'scenario', 'time', 'sweep' (index of the sweep in the time-step), and 'flows changed'
+        """
+        sweeps = pd.DataFrame(self.sweeplog, columns=['scenario', 'time', 'flows changed'])
+        sweeps.insert(2, 'sweep', sweeps.groupby(['scenario', 'time'], dropna=False).cumcount())
+        return sweeps
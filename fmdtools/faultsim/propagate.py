@@ -12,26 +12,92 @@ Main Methods:
     - mult_fault():         Runs arbitrary scenario of fault modes at specified times
     - singlefaults():       Creates and propagates a list of failure scenarios in a model over given model times
     - approach:             Injects and propagates faults in the model defined by a given sample approach.   
+    - iter_approach:        Injects and propagates faults in the model defined by a given sample approach, yielding the results of each scenario
 Private Methods:
+    - use_profiler():       Profiles the runs in its context with a given Profiler (see profiler.Profiler)
+    - profiled():           Returns a context manager timing a section of the run (if it is profiled)
+    - use_events():         Sends the events of the runs in its context to a given EventStream (see eventstream.EventStream)
+    - run_nominal():        Runs the nominal scenario and gathers the nominal results used to run the fault scenarios
+    - run_scenlist():       Runs a list of fault scenarios (serially or in a process pool)
+    - fork_scenlist():      Runs a list of fault scenarios in worker processes forked after the nominal run
+    - check_parallel():     Checks that the pool, workers, and lanes arguments are valid
+    - exec_batches():       Runs a list of fault scenarios in batches of scenarios injected at the same time
+    - exec_batch():         Runs and classifies a batch of fault scenarios in the lanes of one model
+    - exec_scen():          Runs and classifies one fault scenario
+    - classify_scen():      Classifies a fault scenario given the model at the end of the scenario
+    - classify_endstate():  Classifies a scenario given the end states the model declares (without the state graph)
+    - get_checkpoints():    Returns the times to capture the state of the model at in the nominal run of staged execution
+    - replay_nominal():     Runs the model in the nominal scenario between two times (e.g. from a checkpoint)
     - list_init_faults():   Creates a list of single-fault scenarios for the graph, given the modes set up in the fault model
     - prop_one_scen():      Runs a fault scenario in the model over time
+    - prop_batch():         Runs a batch of fault scenarios injected at the same time in the lanes of one model
+    - init_scenhist():      Initializes the time range and history of a scenario
+    - get_events():         Returns the times which are not skipped in adaptive time-stepping
+        - get_stepstate():  Returns the state of the model compared between time-steps in adaptive time-stepping
+        - get_next_event_ind(): Returns the index of the next event after a given time
+    - check_reconv():       Checks whether a fault scenario has reconverged with the nominal scenario at a given time
+    - get_degraded():       Returns the flows in a fault scenario history which deviate from the nominal history at a given time
+    - get_fullstate():      Returns a snapshot of all the attributes of the flows and functions in the model
+    - same_state():         Checks whether two full model states have the same values
+    - splice_mdlhist():     Copies the nominal history into a scenario history from a given time onward
+    - overlay_mdlhist():    Overlays the history of a staged scenario on the nominal history (see HistOverlay)
     - propagate():          Injects and propagates faults through the graph at one time-step
     - prop_time():          Propagates faults through model graph.
+    - get_schedule():       Returns the (topological) order to evaluate the functions of the model in propagation
+        - reset_schedule(): Resets the schedule of the model to the one planned from the flows learned in the nominal run
+    - init_cone():          Initializes the cone of influence of the faults in a scenario (the functions which are run)
+        - thaw_fxns():      Adds frozen functions (and the functions writing to their flows) to the cone of influence
+        - check_cone():     Returns the frozen functions connected to flows which deviate from the nominal scenario
+        - cone_state():     Returns the part of a full model state inside the cone of influence
+        - fill_cone_hist(): Copies the history of the functions/flows outside the cone of influence from the nominal history
     - update_mdlhist():     Updates the model history at a given time.
-        - update_flowhist():Updates the flows in the model history at t_ind
-        - update_fxnhist(): Updates the functions (faults and states) in the model history at t_ind
+    - init_histrecord():    Compiles the layout used to record the states of a model in a history
+        - add_histrow():    Adds a history vector to its 2-D history block (if any)
     - init_mdlhist():       Initializes the model history over a given timerange
         - init_flowhist():  Initializes the flow history flowhist of the model mdl over the time range timerange
         - init_fxnhist():   Initializes the function state history fxnhist of the model mdl over the time range timerange
+        - init_faultmodes():Initializes the list of modes of each function used to encode the faults in the history
+        - prev_dtype():     Returns the data type of a state in a previous history
+        - get_tracked():    Returns the states of a flow/function to track given the track argument
+        - encode_faults():  Encodes a set of faults as an int bitmask
+        - init_histrow():   Initializes the history vector of a given state
+        - init_histblocks():Allocates the 2-D history blocks for the states of the model
+    - init_lanehist():      Initializes the history of a model with lanes from the history of the model without lanes
+        - get_lanehist():   Returns the history of one lane of the history of a model with lanes
+        - encode_lanefaults(): Encodes the faults of each lane of a function as int bitmasks
+    - get_rectimes():       Returns the times to record the model history at given the track argument
+    - get_recinds():        Returns the index in the history of each time in a timerange
 """
 
 import numpy as np
 import copy
+import heapq
+import uuid
+import pickle
+import networkx as nx
+import multiprocessing as mp
+import contextlib
+from time import perf_counter
+from collections.abc import MutableMapping
+from functools import partial
 import fmdtools.resultdisp.process as proc
+import fmdtools.faultsim.nomcache as nomcache
+from fmdtools.modeldef import Block, Flow, Timer, EndState, _nonstate_atts, _set_objstate, _changed
+
+# nominal results shared with the scenarios run in a worker process (set in each worker by fork_scenlist)
+_workerstate = {}
+# nominal results unpickled in a process of a pool (see exec_scen_pooled) with structure {'key', 'nomresults'}
+_poolstate = {}
+pool_chunks = 32 # number of chunks the scenarios are split into when run in a pool (see run_scenlist)
+# profiler recording the run (see use_profiler), or None if the run is not profiled
+_profiler = None
+_nosection = contextlib.nullcontext()
+# event stream the events of the run are sent to (see use_events), or None if the run has no event stream
+_events = None
 
 ## FAULT PROPAGATION
 
-def nominal(mdl, track=True, gtype='normal'):
+def nominal(mdl, track=True, gtype='normal', cache=False, profile=False, events=False):
     """
     Runs the model over time in the nominal scenario.
 
@@ -43,6 +109,15 @@ def nominal(mdl, track=True, gtype='normal'):
         Whether or not to track flows. The default is True.
     gtype : TYPE, optional
         The type of graph to return (normal or bipartite). The default is 'normal'.
+    cache : NominalCache or False, optional
+        Cache to load the nominal results from (or save them to, if not cached) so the nominal scenario is not 
+        re-simulated in repeated analyses of the same model (see nomcache.NominalCache). The default is False.
+    profile : Profiler or False, optional
+        Profiler to record the time spent in the functions and sections of the run in (see profiler.Profiler). 
+        Runs in worker processes (with pool/workers) are not recorded. The default is False (the run is not instrumented).
+    events : EventStream or False, optional
+        Stream to send the events of the run to (e.g. the start/end of scenarios, see eventstream.EventStream). 
+        Events in worker processes (with pool/workers) are not sent. The default is False.
 
     Returns
     -------
@@ -53,21 +128,24 @@ def nominal(mdl, track=True, gtype='normal'):
     mdlhist : Dict
         A dictionary with a history of modelstates
     """
-    mdl = mdl.__class__(params=mdl.params)
-    nomscen=construct_nomscen(mdl)
-    scen=nomscen.copy()
-    mdlhist, _ = prop_one_scen(mdl, nomscen, track=track, staged=False)
-    
-    resgraph = mdl.return_stategraph(gtype=gtype)   
-    endfaults, endfaultprops = mdl.return_faultmodes()
-    endclass=mdl.find_classification(resgraph, endfaultprops, construct_nomscen(mdl), scen, {'nominal': mdlhist, 'faulty':mdlhist})
+    with use_profiler(profile), use_events(events):
+        nomscen=construct_nomscen(mdl)
+        scen=nomscen.copy()
+        nomresults = run_nominal(mdl, nomscen, [], track=track, gtype=gtype, cache=cache)
+        mdlhist, resgraph = nomresults['nomhist'], nomresults['nomresgraph']
+        mdl = nomresults['mdl']
+        mdl.set_state(nomresults['endstate'])
+        endfaults, endfaultprops = mdl.return_faultmodes()
+        with profiled('classification', 'classify'):
+            if mdl.endstates is not None:   endclass = classify_endstate(mdl, scen, {'nominal': mdlhist, 'faulty':mdlhist})
+            else:                           endclass=mdl.find_classification(resgraph, endfaultprops, construct_nomscen(mdl), scen, {'nominal': mdlhist, 'faulty':mdlhist})
     
-    endresults={'faults': endfaults, 'classification':endclass}
+        endresults={'faults': endfaults, 'classification':endclass}
     
-    mdl.reset()
-    return endresults, resgraph, mdlhist
+        mdl.reset()
+        return endresults, resgraph, mdlhist
 
-def one_fault(mdl, fxnname, faultmode, time=1, track=True, staged=False, gtype = 'normal'):
+def one_fault(mdl, fxnname, faultmode, time=1, track=True, staged=False, gtype = 'normal', cache=False, profile=False, events=False):
     """
     Runs one fault in the model at a specified time.
 
@@ -81,12 +159,21 @@ def one_fault(mdl, fxnname, faultmode, time=1, track=True, staged=False, gtype =
         Name of the faultmode
     time : float, optional
         Time to inject fault. Must be in the range of model times (i.e. in range(0, end, mdl.tstep)). The default is 0.
-    track : bool, optional
-        Whether to track model states over time. The default is True.
+    track : bool or dict, optional
+        Whether to track model states over time, or a dict specifying which states to track and when (see init_mdlhist). The default is True.
     staged : bool, optional
         Whether to inject the fault in a copy of the nominal model at the fault time (True) or instantiate a new model for the fault (False). The default is False.
     gtype : str, optional
         The graph type to return ('bipartite' or 'normal'). The default is 'normal'.
+    cache : NominalCache or False, optional
+        Cache to load the nominal results from (or save them to, if not cached) so the nominal scenario is not 
+        re-simulated in repeated analyses of the same model (see nomcache.NominalCache). The default is False.
+    profile : Profiler or False, optional
+        Profiler to record the time spent in the functions and sections of the run in (see profiler.Profiler). 
+        Runs in worker processes (with pool/workers) are not recorded. The default is False (the run is not instrumented).
+    events : EventStream or False, optional
+        Stream to send the events of the run to (e.g. the start/end of scenarios, see eventstream.EventStream). 
+        Events in worker processes (with pool/workers) are not sent. The default is False.
 
     Returns
     -------
@@ -98,47 +185,44 @@ def one_fault(mdl, fxnname, faultmode, time=1, track=True, staged=False, gtype =
         A dictionary of the states of the model of each fault scenario over time.
 
     """
-    #run model nominally, get relevant results
-    mdl = mdl.__class__(params=mdl.params)
-    nomscen=construct_nomscen(mdl)
-    if staged:
-        nommdlhist, mdls = prop_one_scen(mdl, nomscen, track=track, staged=staged, ctimes=[time])
-        nomresgraph = mdl.return_stategraph(gtype)
-        mdl.reset()
-        mdl = mdls[time]
-    else:
-        nommdlhist, _ = prop_one_scen(mdl, nomscen, track=track, staged=staged)
-        nomresgraph = mdl.return_stategraph(gtype)
-        mdl.reset()
-        mdl = mdl.__class__(params=mdl.params)
-    #run with fault present, get relevant results
-    scen=nomscen.copy() #note: this is a shallow copy, so don't define it earlier
-    scen['faults'][fxnname]=faultmode
-    scen['properties']['type']='single fault'
-    scen['properties']['function']=fxnname
-    scen['properties']['fault']=faultmode
-    if mdl.fxns[fxnname].faultmodes[faultmode]['probtype']=='rate':
-        scen['properties']['rate']=mdl.fxns[fxnname].failrate*mdl.fxns[fxnname].faultmodes[faultmode]['dist']*eq_units(mdl.fxns[fxnname].faultmodes[faultmode]['units'], mdl.units)*(mdl.times[-1]-mdl.times[0]) # this rate is on a per-simulation basis
-    elif mdl.fxns[fxnname].faultmodes[faultmode]['probtype']=='prob':
-        scen['properties']['rate'] = mdl.fxns[fxnname].failrate*mdl.fxns[fxnname].faultmodes[faultmode]['dist']
-    scen['properties']['time']=time
+    with use_profiler(profile), use_events(events):
+        #run model nominally, get relevant results
+        nomscen=construct_nomscen(mdl)
+        nomresults = run_nominal(mdl, nomscen, [time], staged=staged, track=track, gtype=gtype, cache=cache)
+        nommdlhist, nomresgraph = nomresults['nomhist'], nomresults['nomresgraph']
+        mdl = nomresults['mdl'] # (reset to the initial state after the nominal run)
+        if staged:  mdl.set_state(nomresults['c_mdl'][time])
+        reset_schedule(mdl, nomresults['writes'])
+        #run with fault present, get relevant results
+        scen=nomscen.copy() #note: this is a shallow copy, so don't define it earlier
+        scen['faults'][fxnname]=faultmode
+        scen['properties']['type']='single fault'
+        scen['properties']['function']=fxnname
+        scen['properties']['fault']=faultmode
+        if mdl.fxns[fxnname].faultmodes[faultmode]['probtype']=='rate':
+            scen['properties']['rate']=mdl.fxns[fxnname].failrate*mdl.fxns[fxnname].faultmodes[faultmode]['dist']*eq_units(mdl.fxns[fxnname].faultmodes[faultmode]['units'], mdl.units)*(mdl.times[-1]-mdl.times[0]) # this rate is on a per-simulation basis
+        elif mdl.fxns[fxnname].faultmodes[faultmode]['probtype']=='prob':
+            scen['properties']['rate'] = mdl.fxns[fxnname].failrate*mdl.fxns[fxnname].faultmodes[faultmode]['dist']
+        scen['properties']['time']=time
     
-    faultmdlhist, _ = prop_one_scen(mdl, scen, track=track, staged=staged, prevhist=nommdlhist)
-    faultresgraph = mdl.return_stategraph(gtype)
+        faultmdlhist, _ = prop_one_scen(mdl, scen, track=track, staged=staged, prevhist=nommdlhist)
+        faultresgraph = mdl.return_stategraph(gtype)
     
-    #process model run
-    endfaults, endfaultprops = mdl.return_faultmodes()
-    endflows = proc.graphflows(faultresgraph, nomresgraph, gtype)
-    mdlhists={'nominal':nommdlhist, 'faulty':faultmdlhist}
-    endclass = mdl.find_classification(faultresgraph, endfaultprops, endflows, scen, mdlhists)
-    resgraph = proc.resultsgraph(faultresgraph, nomresgraph, gtype=gtype) 
+        #process model run
+        endfaults, endfaultprops = mdl.return_faultmodes()
+        endflows = proc.graphflows(faultresgraph, nomresgraph, gtype)
+        mdlhists={'nominal':nommdlhist, 'faulty':faultmdlhist}
+        with profiled('classification', 'classify'):
+            if mdl.endstates is not None:   endclass = classify_endstate(mdl, scen, mdlhists)
+            else:                           endclass = mdl.find_classification(faultresgraph, endfaultprops, endflows, scen, mdlhists)
+        resgraph = proc.resultsgraph(faultresgraph, nomresgraph, gtype=gtype) 
     
-    endresults={'flows': endflows, 'faults': endfaults, 'classification':endclass}  
+        endresults={'flows': endflows, 'faults': endfaults, 'classification':endclass}  
     
-    mdl.reset()
-    return endresults,resgraph, mdlhists
+        mdl.reset()
+        return endresults,resgraph, mdlhists
 
-def mult_fault(mdl, faultseq, track=True, rate=np.NaN, gtype='normal'):
+def mult_fault(mdl, faultseq, track=True, rate=np.NaN, gtype='normal', cache=False, profile=False, events=False):
     """
     Runs one fault in the model at a specified time.
 
@@ -148,12 +232,21 @@ def mult_fault(mdl, faultseq, track=True, rate=np.NaN, gtype='normal'):
         The model to inject the fault in.
     faultseq : dict
         Dict of times and modes defining the fault scenario {time:{fxns: [modes]},}
-    track : bool, optional
-        Whether to track model states over time. The default is True.
+    track : bool or dict, optional
+        Whether to track model states over time, or a dict specifying which states to track and when (see init_mdlhist). The default is True.
     rate : float, optional
         Input rate for the sequence (must be calculated elsewhere)
     gtype : str, optional
         The graph type to return ('bipartite' or 'normal'). The default is 'normal'.
+    cache : NominalCache or False, optional
+        Cache to load the nominal results from (or save them to, if not cached) so the nominal scenario is not 
+        re-simulated in repeated analyses of the same model (see nomcache.NominalCache). The default is False.
+    profile : Profiler or False, optional
+        Profiler to record the time spent in the functions and sections of the run in (see profiler.Profiler). 
+        Runs in worker processes (with pool/workers) are not recorded. The default is False (the run is not instrumented).
+    events : EventStream or False, optional
+        Stream to send the events of the run to (e.g. the start/end of scenarios, see eventstream.EventStream). 
+        Events in worker processes (with pool/workers) are not sent. The default is False.
 
     Returns
     -------
@@ -165,39 +258,39 @@ def mult_fault(mdl, faultseq, track=True, rate=np.NaN, gtype='normal'):
         A dictionary of the states of the model of each fault scenario over time.
 
     """
-    #run model nominally, get relevant results
-    mdl = mdl.__class__(params=mdl.params)
-    nomscen=construct_nomscen(mdl)
-    
-    nommdlhist, _ = prop_one_scen(mdl, nomscen, track=track, staged=False)
-    nomresgraph = mdl.return_stategraph(gtype)
-    mdl.reset()
-    
-    mdl = mdl.__class__(params=mdl.params)
-    #run with fault present, get relevant results
-    scen=nomscen.copy() #note: this is a shallow copy, so don't define it earlier
-    scen['faults']=list(faultseq.values())
-    scen['properties']['type']='sequence'
-    scen['properties']['sequence']=faultseq
-    scen['properties']['rate']=rate # this rate is on a per-simulation basis
-    scen['properties']['time']=list(faultseq.keys())
+    with use_profiler(profile), use_events(events):
+        #run model nominally, get relevant results
+        nomscen=construct_nomscen(mdl)
+        nomresults = run_nominal(mdl, nomscen, [], track=track, gtype=gtype, cache=cache)
+        nommdlhist, nomresgraph = nomresults['nomhist'], nomresults['nomresgraph']
+        mdl = nomresults['mdl'] # (reset to the initial state after the nominal run)
+        reset_schedule(mdl, nomresults['writes'])
+        #run with fault present, get relevant results
+        scen=nomscen.copy() #note: this is a shallow copy, so don't define it earlier
+        scen['faults']=list(faultseq.values())
+        scen['properties']['type']='sequence'
+        scen['properties']['sequence']=faultseq
+        scen['properties']['rate']=rate # this rate is on a per-simulation basis
+        scen['properties']['time']=list(faultseq.keys())
     
-    faultmdlhist, _ = prop_one_scen(mdl, scen, track=track, staged=False, prevhist=nommdlhist)
-    faultresgraph = mdl.return_stategraph(gtype)
+        faultmdlhist, _ = prop_one_scen(mdl, scen, track=track, staged=False, prevhist=nommdlhist)
+        faultresgraph = mdl.return_stategraph(gtype)
     
-    #process model run
-    endfaults, endfaultprops = mdl.return_faultmodes()
-    endflows = proc.graphflows(faultresgraph, nomresgraph, gtype)
-    mdlhists={'nominal':nommdlhist, 'faulty':faultmdlhist}
-    endclass = mdl.find_classification(faultresgraph, endfaultprops, endflows, scen, mdlhists)
-    resgraph = proc.resultsgraph(faultresgraph, nomresgraph, gtype=gtype) 
+        #process model run
+        endfaults, endfaultprops = mdl.return_faultmodes()
+        endflows = proc.graphflows(faultresgraph, nomresgraph, gtype)
+        mdlhists={'nominal':nommdlhist, 'faulty':faultmdlhist}
+        with profiled('classification', 'classify'):
+            if mdl.endstates is not None:   endclass = classify_endstate(mdl, scen, mdlhists)
+            else:                           endclass = mdl.find_classification(faultresgraph, endfaultprops, endflows, scen, mdlhists)
+        resgraph = proc.resultsgraph(faultresgraph, nomresgraph, gtype=gtype) 
     
-    endresults={'flows': endflows, 'faults': endfaults, 'classification':endclass}  
+        endresults={'flows': endflows, 'faults': endfaults, 'classification':endclass}  
     
-    mdl.reset()
-    return endresults,resgraph, mdlhists
+        mdl.reset()
+        return endresults,resgraph, mdlhists
 
-def single_faults(mdl, staged=False, track=True):
+def single_faults(mdl, staged=False, track=True, pool=False, reconv=False, workers=False, cache=False, checkpoints=False, prune=False, lanes=False, profile=False, events=False):
     """
     Creates and propagates a list of failure scenarios in a model
 
@@ -207,8 +300,42 @@ def single_faults(mdl, staged=False, track=True):
         The model to inject faults in
     staged : bool, optional
         Whether to inject the fault in a copy of the nominal model at the fault time (True) or instantiate a new model for the fault (False). Setting to True roughly halves execution time. The default is False.
-    track : bool, optional
-        Whether to track states over time. The default is True.
+    track : bool or dict, optional
+        Whether to track states over time, or a dict specifying which states to track and when (see init_mdlhist). The default is True.
+    pool : multiprocessing.Pool or False, optional
+        Process pool to run the scenarios in parallel (e.g. multiprocessing.Pool(4)). The default is False (scenarios are run serially).
+    reconv : bool, optional
+        Whether to stop simulating a scenario once it reconverges with the nominal scenario (see prop_one_scen), 
+        in which case the rest of the nominal history is used and the scenario is classified using the nominal 
+        end state. Requires track=True. Note that this stores a snapshot of the full nominal model state at each 
+        time-step to compare with. The default is False.
+    workers : int or False, optional
+        Number of worker processes to fork after the nominal run to run the scenarios in (see fork_scenlist). 
+        Forking only helps over using a pool when staged=True, since the workers then inherit the states of the 
+        nominal model at each fault time instead of having them sent. The default is False (pool is used instead).
+    cache : NominalCache or False, optional
+        Cache to load the nominal results from (or save them to, if not cached) so the nominal scenario is not 
+        re-simulated in repeated analyses of the same model (see nomcache.NominalCache). The default is False.
+    checkpoints : int, 'sqrt', or False, optional
+        Checkpoint policy for staged execution (see get_checkpoints). If given, the nominal model state is only kept every 
+        checkpoints time-steps (or every sqrt(number of time-steps) if 'sqrt') rather than at every scenario time, and each
+        scenario is started from the nearest earlier checkpoint by replaying the nominal scenario up to the fault time. 
+        This bounds the memory used by staged execution at the cost of the replay. The default is False.
+    prune : bool, optional
+        Whether to only run the functions in the cone of influence of the faults in each scenario (see prop_one_scen), 
+        copying the states of the others from the nominal scenario until a flow connected to them deviates. Note that 
+        this stores a snapshot of the full nominal model state at each time-step (as in reconv). The default is False.
+    lanes : int or False, optional
+        Number of scenarios to run at once in the lanes of one model (see prop_batch). If given, the scenarios injected at 
+        the same time are run in batches of up to lanes scenarios, which requires the behaviors of the functions to operate 
+        on arrays (see Model.init_lanes). Cannot be used with pool/workers, and reconv/prune are not used in the batches. 
+        The default is False (each scenario is run in the model separately).
+    profile : Profiler or False, optional
+        Profiler to record the time spent in the functions and sections of the run in (see profiler.Profiler). 
+        Runs in worker processes (with pool/workers) are not recorded. The default is False (the run is not instrumented).
+    events : EventStream or False, optional
+        Stream to send the events of the run to (e.g. the start/end of scenarios, see eventstream.EventStream). 
+        Events in worker processes (with pool/workers) are not sent. The default is False.
 
     Returns
     -------
@@ -218,36 +345,15 @@ def single_faults(mdl, staged=False, track=True):
         A dictionary with the history of all model states for each scenario (including the nominal)
     """
 
+    check_parallel(pool, workers, lanes)
     scenlist=list_init_faults(mdl)
-    #run model nominally, get relevant results
-    nomscen=construct_nomscen(mdl)
-    mdl = mdl.__class__(params=mdl.params)
-    if staged:
-        nomhist, c_mdl = prop_one_scen(mdl, nomscen, track=track, ctimes=mdl.times)
-    else:
-        nomhist, c_mdl = prop_one_scen(mdl, nomscen, track=track)
-    nomresgraph = mdl.return_stategraph()
-    mdl.reset()
-    
-    endclasses = {}
-    mdlhists = {}
-    mdlhists['nominal'] = nomhist
-    for i, scen in enumerate(scenlist):
-        #run model with fault scenario
-        if staged:
-            mdl=c_mdl[scen['properties']['time']].copy()
-            mdlhists[scen['properties']['name']], _ =prop_one_scen(mdl, scen, track=track, staged=True, prevhist=nomhist)
-        else:
-            mdl = mdl.__class__(params=mdl.params)
-            mdlhists[scen['properties']['name']], _ =prop_one_scen(mdl, scen, track=track)
-        endfaults, endfaultprops = mdl.return_faultmodes()
-        resgraph = mdl.return_stategraph()
-        endflows = proc.graphflows(resgraph, nomresgraph)
-        endclasses[scen['properties']['name']] = mdl.find_classification(resgraph, endfaultprops, endflows, scen, {'nominal':nomhist, 'faulty':mdlhists[scen['properties']['name']]})
-        
+    with use_profiler(profile), use_events(events):
+        #run model nominally, get relevant results
+        nomresults = run_nominal(mdl, construct_nomscen(mdl), mdl.times, staged=staged, track=track, reconv=reconv, cache=cache, checkpoints=checkpoints, prune=prune)
+        endclasses, mdlhists = run_scenlist(nomresults, scenlist, pool=pool, workers=workers, lanes=lanes)
     return endclasses, mdlhists
 
-def approach(mdl, app, staged=False, track=True):
+def approach(mdl, app, staged=False, track=True, pool=False, reconv=False, workers=False, cache=False, checkpoints=False, prune=False, lanes=False, profile=False, events=False):
     """
     Injects and propagates faults in the model defined by a given sample approach
 
@@ -259,8 +365,42 @@ def approach(mdl, app, staged=False, track=True):
         SampleApproach used to define the list of faults and sample time for the model.
     staged : bool, optional
         Whether to inject the fault in a copy of the nominal model at the fault time (True) or instantiate a new model for the fault (False). Setting to True roughly halves execution time. The default is False.
-    track : bool, optional
-        Whether to track states over time. The default is True.
+    track : bool or dict, optional
+        Whether to track states over time, or a dict specifying which states to track and when (see init_mdlhist). The default is True.
+    pool : multiprocessing.Pool or False, optional
+        Process pool to run the scenarios in parallel (e.g. multiprocessing.Pool(4)). The default is False (scenarios are run serially).
+    reconv : bool, optional
+        Whether to stop simulating a scenario once it reconverges with the nominal scenario (see prop_one_scen), 
+        in which case the rest of the nominal history is used and the scenario is classified using the nominal 
+        end state. Requires track=True. Note that this stores a snapshot of the full nominal model state at each 
+        time-step to compare with. The default is False.
+    workers : int or False, optional
+        Number of worker processes to fork after the nominal run to run the scenarios in (see fork_scenlist). 
+        Forking only helps over using a pool when staged=True, since the workers then inherit the states of the 
+        nominal model at each fault time instead of having them sent. The default is False (pool is used instead).
+    cache : NominalCache or False, optional
+        Cache to load the nominal results from (or save them to, if not cached) so the nominal scenario is not 
+        re-simulated in repeated analyses of the same model (see nomcache.NominalCache). The default is False.
+    checkpoints : int, 'sqrt', or False, optional
+        Checkpoint policy for staged execution (see get_checkpoints). If given, the nominal model state is only kept every 
+        checkpoints time-steps (or every sqrt(number of time-steps) if 'sqrt') rather than at every scenario time, and each
+        scenario is started from the nearest earlier checkpoint by replaying the nominal scenario up to the fault time. 
+        This bounds the memory used by staged execution at the cost of the replay. The default is False.
+    prune : bool, optional
+        Whether to only run the functions in the cone of influence of the faults in each scenario (see prop_one_scen), 
+        copying the states of the others from the nominal scenario until a flow connected to them deviates. Note that 
+        this stores a snapshot of the full nominal model state at each time-step (as in reconv). The default is False.
+    lanes : int or False, optional
+        Number of scenarios to run at once in the lanes of one model (see prop_batch). If given, the scenarios injected at 
+        the same time are run in batches of up to lanes scenarios, which requires the behaviors of the functions to operate 
+        on arrays (see Model.init_lanes). Cannot be used with pool/workers, and reconv/prune are not used in the batches. 
+        The default is False (each scenario is run in the model separately).
+    profile : Profiler or False, optional
+        Profiler to record the time spent in the functions and sections of the run in (see profiler.Profiler). 
+        Runs in worker processes (with pool/workers) are not recorded. The default is False (the run is not instrumented).
+    events : EventStream or False, optional
+        Stream to send the events of the run to (e.g. the start/end of scenarios, see eventstream.EventStream). 
+        Events in worker processes (with pool/workers) are not sent. The default is False.
 
     Returns
     -------
@@ -269,32 +409,411 @@ def approach(mdl, app, staged=False, track=True):
     mdlhists : dict
         A dictionary with the history of all model states for each scenario (including the nominal)
     """
+    check_parallel(pool, workers, lanes)
+    with use_profiler(profile), use_events(events):
+        nomresults = run_nominal(mdl, app.create_nomscen(mdl), app.times, staged=staged, track=track, reconv=reconv, cache=cache, checkpoints=checkpoints, prune=prune)
+        endclasses, mdlhists = run_scenlist(nomresults, app.scenlist, pool=pool, workers=workers, lanes=lanes)
+    return endclasses, mdlhists
+
+def iter_approach(mdl, app, staged=False, track=True, reconv=False, reducer=False, cache=False, checkpoints=False, prune=False, profile=False, events=False):
+    """
+    Injects and propagates faults in the model defined by a given sample approach, yielding the results of 
+    each scenario as it is run (rather than returning the results of all scenarios, as in approach), so only 
+    the results of one scenario need to be held in memory at a time. Scenarios are run serially.
+
+    Parameters
+    ----------
+    mdl : model
+        The model to inject faults in.
+    app : sampleapproach
+        SampleApproach used to define the list of faults and sample time for the model.
+    staged, track, reconv, cache, checkpoints, prune, profile, events : 
+        See approach
+    reducer : function, optional
+        Function to reduce the history of each scenario with (e.g. resultdisp.process.hist), which is called with
+        {'nominal':nomhist, 'faulty':mdlhist} and returns the value to yield in place of the history (which is then 
+        discarded). The default is False (the history is yielded).
+
+    Yields
+    ------
+    scenname : str
+        Name of the scenario
+    endclass : dict
+        The classification of the scenario (e.g. rate, cost, expected cost)
+    mdlhist : dict
+        The history of the model states in the scenario (or the output of reducer, if given)
+    """
+    with use_profiler(profile), use_events(events):
+        nomresults = run_nominal(mdl, app.create_nomscen(mdl), app.times, staged=staged, track=track, reconv=reconv, cache=cache, checkpoints=checkpoints, prune=prune)
+    for scen in app.scenlist:
+        with use_profiler(profile), use_events(events): # (only used while the scenario is run, not between yields)
+            endclass, mdlhist = exec_scen_shared(scen, nomresults)
+        if reducer: mdlhist = reducer({'nominal':nomresults['nomhist'], 'faulty':mdlhist})
+        yield scen['properties']['name'], endclass, mdlhist
+
+@contextlib.contextmanager
+def use_profiler(profile):
+    """ Profiles the runs in the context with the given Profiler (see profiler.Profiler), if one is given """
+    global _profiler
+    prevprofiler = _profiler
+    if profile: _profiler = profile
+    try:        yield
+    finally:    _profiler = prevprofiler
+def profiled(section, name):
+    """ Returns a context manager recording the time spent in its block as a call of (section, name) in the profiler (if any)"""
+    if _profiler:   return _profiler.section(section, name)
+    else:           return _nosection
+@contextlib.contextmanager
+def use_events(events):
+    """ Sends the events of the runs in the context to the given EventStream (see eventstream.EventStream), if one is given """
+    global _events
+    prevevents = _events
+    if events: _events = events
+    try:        yield
+    finally:    _events = prevevents
+
+def run_nominal(mdl, nomscen, ctimes, staged=False, track=True, reconv=False, gtype='normal', cache=False, checkpoints=False, prune=False):
+    """
+    Runs the nominal scenario and gathers the nominal results used to run the fault scenarios (see exec_scen_shared).
+
+    Parameters
+    ----------
+    mdl : model
+        The model to run (a new instance of its class/params is used)
+    nomscen : dict
+        The nominal scenario
+    ctimes : list
+        Times to capture the state of the model at (for use in staged execution)
+    staged, track, reconv, cache, checkpoints, prune : 
+        See approach
+    gtype : str, optional
+        The graph type of the nominal results graph ('bipartite' or 'normal'). The default is 'normal'.
+
+    Returns
+    -------
+    nomresults : dict
+        Nominal results/options shared by the scenarios, with structure {'mdl', 'c_mdl', 'nomresgraph', 'nomhist', 
+        'track', 'staged', 'nommdl', 'nomstates', 'prune', 'endstate', 'writes'} (see exec_scen), where endstate is the state 
+        of the model at the end of the nominal run (see Model.get_state), writes are the flows each function was found to
+        write to in the nominal run (see reset_schedule), and mdl is reset to the initial state
+    """
+    if staged: ctimes = get_checkpoints(mdl, ctimes, checkpoints)
+    if cache:
+        key = nomcache.get_key(mdl, nomscen=nomscen, ctimes=ctimes if staged else [], staged=staged, track=track, reconv=reconv, gtype=gtype, **({'prune':prune} if prune else {}))
+        nomresults = cache.get(key)
+        if nomresults: return nomresults
     mdl = mdl.__class__(params=mdl.params)
+    if (reconv and track) or prune: nomstates = {}
+    else:                           nomstates = False
     if staged:
-        nomhist, c_mdl = prop_one_scen(mdl, app.create_nomscen(mdl), track=track, ctimes=app.times)
+        nomhist, c_mdl = prop_one_scen(mdl, nomscen, track=track, ctimes=ctimes, statehist=nomstates)
     else:
-        nomhist, c_mdl = prop_one_scen(mdl, app.create_nomscen(mdl), track=track)
-    nomresgraph = mdl.return_stategraph()
-    mdl.reset()
-    
+        nomhist, c_mdl = prop_one_scen(mdl, nomscen, track=track, statehist=nomstates)
+    nomresgraph = mdl.return_stategraph(gtype)
+    with profiled('copy', 'copy'):
+        if reconv and track:    nommdl = mdl.copy()
+        else:                   nommdl = False
+        endstate = mdl.get_state()
+        mdl.reset()
+    writes = {fxnname:set(flownames) for fxnname, flownames in get_schedule(mdl)['writes'].items()}
+    nomresults = {'mdl':mdl, 'c_mdl':c_mdl, 'nomresgraph':nomresgraph, 'nomhist':nomhist, 'track':track, 'staged':staged, 
+                  'nommdl':nommdl, 'nomstates':nomstates, 'prune':prune, 'endstate':endstate, 'writes':writes}
+    if cache: cache.put(key, nomresults)
+    return nomresults
+
+def run_scenlist(nomresults, scenlist, pool=False, workers=False, lanes=False):
+    """
+    Runs a list of fault scenarios (serially or in a process pool) and gathers the results in scenario order.
+
+    Parameters
+    ----------
+    nomresults : dict
+        Nominal results/options shared by the scenarios (see run_nominal)
+    scenlist : list
+        List of fault scenarios to run
+    pool : multiprocessing.Pool or False, optional
+        Process pool to run the scenarios in (with a map method taking a chunksize, e.g. multiprocessing.Pool). 
+        The default is False (scenarios are run serially).
+    workers : int or False, optional
+        Number of worker processes to fork to run the scenarios in (see fork_scenlist). The default is False.
+    lanes : int or False, optional
+        Number of scenarios injected at the same time to run at once in the lanes of one model (see exec_batches). 
+        The default is False.
+
+    Returns
+    -------
+    endclasses : dict
+        A dictionary with the rate, cost, and expected cost of each scenario run with structure {scenname:{expected cost, cost, rate}}
+    mdlhists : dict
+        A dictionary with the history of all model states for each scenario (including the nominal)
+    """
+    check_parallel(pool, workers, lanes)
+    if lanes:
+        results = exec_batches(nomresults, scenlist, lanes)
+    elif workers:
+        results = fork_scenlist(nomresults, scenlist, processes=workers)
+    elif pool:
+        # the nominal results are pickled once (sent as bytes with each chunk and unpickled once per process, see 
+        # exec_scen_pooled) and the scenarios are sent in pool_chunks chunks, taken by each process as it finishes the last
+        shared = (uuid.uuid4().hex, pickle.dumps(nomresults, protocol=pickle.HIGHEST_PROTOCOL))
+        chunksize = max(1, -(-len(scenlist)//pool_chunks))
+        results = list(pool.map(exec_scen_pooled, [(shared, scen) for scen in scenlist], chunksize=chunksize))
+    else:
+        results = [exec_scen_shared(scen, nomresults) for scen in scenlist]
     endclasses = {}
     mdlhists = {}
-    mdlhists['nominal'] = nomhist
-    for i, scen in enumerate(app.scenlist):
-        #run model with fault scenario
-        if staged:
-            mdl=c_mdl[scen['properties']['time']].copy()
-            mdlhists[scen['properties']['name']], _ =prop_one_scen(mdl, scen, track=track, staged=True, prevhist=nomhist)
-        else:
-            mdl = mdl.__class__(params=mdl.params)
-            mdlhists[scen['properties']['name']], _ =prop_one_scen(mdl, scen, track=track)
+    mdlhists['nominal'] = nomresults['nomhist']
+    for scen, (endclass, mdlhist) in zip(scenlist, results):
+        endclasses[scen['properties']['name']] = endclass
+        mdlhists[scen['properties']['name']] = mdlhist
+    return endclasses, mdlhists
+
+def fork_scenlist(nomresults, scenlist, processes=2):
+    """
+    Runs a list of fault scenarios in worker processes forked after the nominal run.
+    
+    The nominal results and model states (c_mdl) are given to each worker when it is started (and stored in its
+    _workerstate), so with the 'fork' start method the workers inherit them through the (copy-on-write) memory pages 
+    of the parent process rather than having them pickled. Only the scenarios and their results are sent between 
+    processes. Where 'fork' is not available (e.g. Windows), the nominal results are pickled once per worker instead.
+    Since the parent process's state is not modified, this may be called re-entrantly (e.g. from multiple threads).
+    Each worker runs its scenarios in the same model, which is reset to the nominal schedule before each scenario 
+    (see reset_schedule), so the results do not depend on which scenarios are run in each worker.
+
+    Parameters
+    ----------
+    nomresults : dict
+        Nominal results/options shared by the scenarios (see run_scenlist)
+    scenlist : list
+        List of fault scenarios to run
+    processes : int, optional
+        Number of worker processes to fork. The default is 2.
+
+    Returns
+    -------
+    results : list
+        List of (endclass, mdlhist) for each scenario in scenlist
+    """
+    if 'fork' in mp.get_all_start_methods():    context = mp.get_context('fork')
+    else:                                       context = mp.get_context()
+    with context.Pool(processes, initializer=init_worker, initargs=(nomresults,)) as pool:
+        results = pool.map(exec_scen_forked, scenlist)
+    return results
+
+def init_worker(nomresults):
+    """ Stores the nominal results in a worker process started by fork_scenlist """
+    _workerstate.update(nomresults)
+
+def exec_scen_forked(scen):
+    """ Runs exec_scen on a scenario using the nominal results given to the worker process (see fork_scenlist)"""
+    return exec_scen_shared(scen, _workerstate)
+
+def check_parallel(pool, workers, lanes=False):
+    """ Checks that the pool, workers, and lanes arguments (see single_faults) are valid, raising an exception if not """
+    if pool and not hasattr(pool, 'map'):
+        raise Exception("Invalid pool argument: "+str(pool)+". pool should be a multiprocessing.Pool (or other object with a map method) or False. Use workers to give a number of processes to fork.")
+    if workers and (type(workers)!=int or workers<1):
+        raise Exception("Invalid workers argument: "+str(workers)+". workers should be a positive int number of processes or False.")
+    if pool and workers:
+        raise Exception("Only one of pool and workers may be given.")
+    if lanes and (type(lanes)!=int or lanes<1):
+        raise Exception("Invalid lanes argument: "+str(lanes)+". lanes should be a positive int number of scenarios or False.")
+    if lanes and (pool or workers):
+        raise Exception("lanes may not be given with pool or workers.")
+
+def exec_batches(nomresults, scenlist, lanes):
+    """
+    Runs a list of fault scenarios in batches of up to lanes scenarios injected at the same time (see exec_batch), 
+    returning the list of (endclass, mdlhist) for each scenario in scenlist. Scenarios with faults injected at 
+    multiple times are run separately (see exec_scen_shared).
+    """
+    results = [None]*len(scenlist)
+    batches = {}
+    for ind, scen in enumerate(scenlist):
+        if type(scen['properties']['time'])==list:  results[ind] = exec_scen_shared(scen, nomresults)
+        else:                                       batches.setdefault(scen['properties']['time'], []).append(ind)
+    for inds in batches.values():
+        for start in range(0, len(inds), lanes):
+            batch = inds[start:start+lanes]
+            for ind, result in zip(batch, exec_batch([scenlist[i] for i in batch], nomresults)): results[ind] = result
+    return results
+def exec_batch(scens, nomresults):
+    """
+    Runs a batch of fault scenarios injected at the same time in the lanes of a copy of the model (see prop_batch) 
+    and classifies each scenario by setting the model to the state of its lane (see Model.get_lanestates).
+
+    Parameters
+    ----------
+    scens : list
+        Fault scenarios to run (injected at the same time)
+    nomresults : dict
+        Nominal results/options shared by the scenarios (see run_nominal)
+
+    Returns
+    -------
+    results : list
+        List of (endclass, mdlhist) for each scenario in scens
+    """
+    mdl, time = nomresults['mdl'], scens[0]['properties']['time']
+    with profiled('copy', 'copy'): lanemdl = mdl.copy()
+    if nomresults['staged']:
+        statetime = max([t for t in nomresults['c_mdl'] if t<=time])
+        with profiled('copy', 'set_state'): lanemdl.set_state(nomresults['c_mdl'][statetime])
+        reset_schedule(lanemdl, nomresults['writes'])
+        if statetime<time: replay_nominal(lanemdl, statetime, time)
+    else:
+        with profiled('copy', 'reset'): lanemdl.reset()
+        reset_schedule(lanemdl, nomresults['writes'])
+    mdlhists, lanemdl = prop_batch(lanemdl, scens, track=nomresults['track'], staged=nomresults['staged'], prevhist=nomresults['nomhist'])
+    results = []
+    for scen, mdlhist, lanestate in zip(scens, mdlhists, lanemdl.get_lanestates()):
+        with profiled('copy', 'set_state'): mdl.set_state(lanestate)
+        results.append((classify_scen(mdl, scen, nomresults['nomresgraph'], nomresults['nomhist'], mdlhist), mdlhist))
+    return results
+
+def exec_scen_pooled(args):
+    """
+    Runs exec_scen on a scenario given a tuple of ((key, pickled nomresults), scen) (for use in pool.map, see 
+    run_scenlist). The nominal results are only unpickled for the first scenario of the run in each process. 
+    """
+    (key, pickled), scen = args
+    if _poolstate.get('key')!=key:
+        _poolstate.clear()
+        _poolstate.update(key=key, nomresults=pickle.loads(pickled))
+    return exec_scen_shared(scen, _poolstate['nomresults'])
+
+def exec_scen_shared(scen, nomresults):
+    """ Runs exec_scen on a scenario given a dict of the nominal results/options shared by the scenarios (see run_scenlist)"""
+    if nomresults['staged']:
+        # the scenario is started from the latest state captured at or before its time
+        statetime = max([t for t in nomresults['c_mdl'] if t<=scen['properties']['time']])
+        staged = nomresults['c_mdl'][statetime]
+    else: staged, statetime = False, None
+    return exec_scen(nomresults['mdl'], scen, nomresults['nomresgraph'], nomresults['nomhist'], track=nomresults['track'], 
+                     staged=staged, nommdl=nomresults['nommdl'], nomstates=nomresults['nomstates'], statetime=statetime, 
+                     prune=nomresults.get('prune', False), writes=nomresults['writes'])
+
+def exec_scen(mdl, scen, nomresgraph, nomhist, track=True, staged=False, nommdl=False, nomstates=False, statetime=None, prune=False, writes=False):
+    """
+    Runs one fault scenario and classifies the result.
+
+    Parameters
+    ----------
+    mdl : model
+        The model to run the scenario in (which is modified, so it may be reused between scenarios). If staged, the model 
+        is set to the given nominal state, otherwise it is reset to its initial state (see Model.reset) or, if its initial 
+        state was not captured, a new model of its class/params is instantiated.
+    scen : dict
+        The fault scenario to run. Has structure: {'faults':{fxn:fault}, 'properties':{rate, time, name, etc}}
+    nomresgraph : networkx graph
+        Graph of the end state of the nominal model
+    nomhist : dict
+        History of the nominal model
+    track : bool or dict, optional
+        Whether to track states over time, or a dict specifying which states to track and when (see init_mdlhist). The default is True.
+    staged : list or False, optional
+        State of the nominal model at the fault time (see Model.get_state) to start the scenario from. 
+        The default is False (the scenario is run from the start).
+    nommdl : model or False, optional
+        The nominal model at the end of the simulation. If given, the scenario is stopped when it reconverges 
+        with the nominal scenario and is then classified using this model (which is not modified). The default is False.
+    nomstates : dict or False, optional
+        Full states of the nominal model at each time (see get_fullstate) used to check reconvergence (if nommdl is 
+        given) and to prune the functions outside the cone of influence of the faults (if prune). The default is False.
+    statetime : float, optional
+        Time the staged state was captured at. If before the scenario time, the nominal scenario is replayed from this
+        time to the scenario time (see replay_nominal). The default is None (the state is at the scenario time).
+    prune : bool, optional
+        Whether to only run the functions in the cone of influence of the faults (see prop_one_scen). The default is False.
+    writes : dict or False, optional
+        Flows each function was found to write to in the nominal run, which the schedule of the scenario is planned 
+        from (see reset_schedule), so the scenario does not depend on the scenarios run in the model before it. 
+        The default is False (the schedule of the model is used as is).
+
+    Returns
+    -------
+    endclass : dict
+        The classification of the scenario (e.g. rate, cost, expected cost)
+    mdlhist : dict
+        The history of the model states in the scenario
+    """
+    reconv = nomstates if nommdl is not False else False
+    if prune: prune = nomstates
+    if staged is not False:
+        with profiled('copy', 'set_state'): mdl.set_state(staged)
+        if writes is not False: reset_schedule(mdl, writes)
+        if statetime is not None and statetime<scen['properties']['time']: 
+            replay_nominal(mdl, statetime, scen['properties']['time'])
+        mdlhist, _ =prop_one_scen(mdl, scen, track=track, staged=True, prevhist=nomhist, reconv=reconv, prune=prune)
+    else:
+        with profiled('copy', 'reset'):
+            if hasattr(mdl, '_initstate'):  mdl.reset()
+            else:                           mdl = mdl.__class__(params=mdl.params)
+        if writes is not False: reset_schedule(mdl, writes)
+        mdlhist, _ =prop_one_scen(mdl, scen, track=track, prevhist=nomhist, reconv=reconv, prune=prune)
+    if track and 'reconverged' in mdlhist: mdl = nommdl
+    return classify_scen(mdl, scen, nomresgraph, nomhist, mdlhist), mdlhist
+def classify_scen(mdl, scen, nomresgraph, nomhist, mdlhist):
+    """ Classifies a fault scenario given the model at the end of the scenario (see exec_scen), returning its endclass """
+    with profiled('classification', 'classify'):
+        if mdl.endstates is not None: # (the state graph and degraded flows are only constructed for find_classification)
+            return classify_endstate(mdl, scen, {'nominal':nomhist, 'faulty':mdlhist})
         endfaults, endfaultprops = mdl.return_faultmodes()
-        resgraph = mdl.return_stategraph()
-        
+        resgraph = mdl.return_stategraph(lazy=True) # (the networkx graph is only constructed if used in find_classification)
         endflows = proc.graphflows(resgraph, nomresgraph) #TODO: supercede this with something in faultprop?
-        endclasses[scen['properties']['name']] = mdl.find_classification(resgraph, endfaultprops, endflows, scen, {'nominal':nomhist, 'faulty':mdlhists[scen['properties']['name']]})
-        
-    return endclasses, mdlhists
+        return mdl.find_classification(resgraph, endfaultprops, endflows, scen, {'nominal':nomhist, 'faulty':mdlhist})
+def classify_endstate(mdl, scen, mdlhists):
+    """
+    Classifies a scenario with Model.classify given the end states the model declares (see Model.endstates), 
+    without constructing the state graph or degraded flows used by Model.find_classification.
+
+    Parameters
+    ----------
+    mdl : Model
+        Model at the end of the scenario
+    scen : dict
+        The fault scenario. Has structure: {'faults':{fxn:fault}, 'properties':{rate, time, name, etc}}
+    mdlhists : dict
+        Histories of the model in the nominal and faulty scenarios, with structure {'nominal':mdlhist, 'faulty':mdlhist}
+
+    Returns
+    -------
+    endclass : dict
+        Classification of the scenario
+    """
+    return mdl.classify(EndState(mdl, mdlhists, mdl.endstates), scen)
+
+def get_checkpoints(mdl, ctimes, checkpoints=False):
+    """
+    Returns the times to capture the state of the model at in the nominal run of staged execution.
+
+    Parameters
+    ----------
+    mdl : Model
+        The model
+    ctimes : list
+        Times the fault scenarios start at
+    checkpoints : int, 'sqrt', or False, optional
+        Checkpoint policy. If an int k, the state is captured every k time-steps. If 'sqrt', it is captured every 
+        sqrt(T) time-steps (where T is the number of time-steps), so at most ~sqrt(T) states are kept and at most 
+        ~sqrt(T) time-steps are replayed for each scenario. The default is False (the state is captured at each time in ctimes).
+
+    Returns
+    -------
+    ctimes : list
+        Times to capture the state of the model at
+    """
+    if not checkpoints or not len(ctimes): return ctimes
+    timerange = np.arange(mdl.times[0], mdl.times[-1]+1, mdl.tstep)
+    if checkpoints=='sqrt':                                     stride = int(np.ceil(np.sqrt(len(timerange))))
+    elif type(checkpoints)==int and checkpoints>0:              stride = checkpoints
+    else: raise Exception("Invalid checkpoints argument: "+str(checkpoints)+". checkpoints should be a positive int, 'sqrt', or False.")
+    return [t for t in timerange[::stride] if t<=max(ctimes)]
+def replay_nominal(mdl, starttime, endtime):
+    """ Runs the model in the nominal scenario from starttime up to (but not including) endtime (e.g. from a checkpoint) """
+    flowstates = {}
+    for t in np.arange(mdl.times[0], mdl.times[-1]+1, mdl.tstep):
+        if starttime<=t<endtime: flowstates = propagate(mdl, [], t, flowstates)
 
 def construct_nomscen(mdl):
     """
@@ -350,7 +869,7 @@ def list_init_faults(mdl):
                 faultlist.append(newscen)
     return faultlist
        
-def prop_one_scen(mdl, scen, track=True, staged=False, ctimes=[], prevhist={}):
+def prop_one_scen(mdl, scen, track=True, staged=False, ctimes=[], prevhist={}, reconv=False, statehist=False, prune=False):
     """
     Runs a fault scenario in the model over time
 
@@ -360,60 +879,355 @@ def prop_one_scen(mdl, scen, track=True, staged=False, ctimes=[], prevhist={}):
         The model to inject faults in.
     scen : Dict
         The fault scenario to run. Has structure: {'faults':{fxn:fault}, 'properties':{rate, time, name, etc}}
-    track : bool, optional
-        Whether to track states over time. The default is True.
+    track : bool or dict, optional
+        Whether to track states over time, or a dict specifying which states to track and when (see init_mdlhist). The default is True.
     staged : bool, optional
         Whether to inject the fault in a copy of the nominal model at the fault time (True) or instantiate a new model for the fault (False). Setting to True roughly halves execution time. The default is False.
     ctimes : list, optional
-        List of times to copy the model (for use in staged execution). The default is [].
+        List of times to capture the state of the model at (for use in staged execution). The default is [].
     prevhist : dict, optional
-        The previous results hist (for used in staged execution). The default is {}.
+        The previous results hist (for used in staged execution) or nominal hist (for use in checking reconvergence). The default is {}.
+        In staged execution, only the history from the scenario time onward is recorded and the returned mdlhist refers
+        to prevhist for the times before (see overlay_mdlhist), so prevhist should not be modified afterward.
+    reconv : dict or False, optional
+        Full states of the nominal model at each time with structure {time:state} (see get_fullstate). If given,
+        the simulation is stopped once all faults have been injected and the model matches the nominal model at 
+        the same time--both in the history (compared with prevhist) and in the attributes not recorded in the history 
+        (e.g. timers, components, and non-state attributes). The rest of mdlhist is then filled from prevhist and the 
+        time of reconvergence is recorded in mdlhist['reconverged']. Requires track=True and prevhist. The default is False.
+    statehist : dict or False, optional
+        Dict to record the full state of the model at each time in (e.g. for the nominal run, for use in reconv). The default is False.
+    prune : dict or False, optional
+        Full states of the nominal model at each time with structure {time:state} (see get_fullstate). If given, only
+        the functions in the cone of influence of the faults are run (see init_cone), which grows as flows connected 
+        to other functions deviate from the nominal scenario. The history of the functions and flows outside the cone is copied from prevhist 
+        and they are set to their nominal states at the end of the scenario. Requires prevhist if track=True. 
+        Should not be used with ctimes/statehist. The default is False.
+    
+    If the model is instantiated with modelparams['adaptive']=True, once a time-step does not change the state of the
+    model (and the time-step before did not either), the time-steps up to the next event (see get_events and 
+    FxnBlock.next_event_time) are skipped, since they would not change it either, and their history is filled by 
+    repeating the current state. Time-steps are not skipped when prune is given.
 
     Returns
     -------
     mdlhist : dict
         A dictionary with a history of modelstates.
     c_mdl : dict
-        A dictionary of models at each time given in ctimes with structure {time:model}
+        A dictionary of the states of the model (see Model.get_state) at each time given in ctimes with structure {time:state}
     """
-    #if staged, we want it to start a new run from the starting time of the scenario,
-    # using a copy of the input model (which is the nominal run) at this time
-    if staged:
-        timerange=np.arange(scen['properties']['time'], mdl.times[-1]+1, mdl.tstep)
-        shift = len(np.arange(mdl.times[0], scen['properties']['time'], mdl.tstep))
-        if track: 
-            if prevhist:    mdlhist = copy.deepcopy(prevhist)
-            else:           mdlhist = init_mdlhist(mdl, timerange)
-    else: 
-        timerange = np.arange(mdl.times[0], mdl.times[-1]+1, mdl.tstep)
-        shift = 0
-        if track:  mdlhist = init_mdlhist(mdl, timerange)
-    if not track: mdlhist={}
+    timerange, shift, mdlhist = init_scenhist(mdl, scen['properties']['time'], track, staged, prevhist)
+    if _profiler: _profiler.scen = scen['properties'].get('name', scen['properties']['type'])
+    if _events:
+        _events.scen = scen['properties'].get('name', scen['properties']['type'])
+        _events.emit('scenario start', timerange[0])
+        start = perf_counter()
+        if track and prevhist and 'flow degraded' in _events.kinds:   degraded = set()
+        else:                                                       degraded = False
     # run model through the time range defined in the object
     c_mdl=dict.fromkeys(ctimes)
     flowstates={}
+    if track: 
+        histrecord = init_histrecord(mdl, mdlhist)
+        rec_inds = get_recinds(timerange, mdlhist['time'], mdl.tstep)
     if type(scen['properties']['time'])==list:    singletime=False
     else:                                         singletime=True
-    for t_ind, t in enumerate(timerange):
+    if reconv and track and prevhist:
+        if singletime:  lastfaulttime = scen['properties']['time']
+        else:           lastfaulttime = max(scen['properties']['time'])
+    else:               reconv = False
+    if prune is not False and (prevhist or not track):  cone = init_cone(mdl, scen, prune)
+    else:                                               cone = False
+    adaptive = getattr(mdl, '_adaptive', False) and not cone
+    if adaptive: events, stepobjs, stepstate = get_events(mdl, scen, ctimes), get_stepobjs(mdl), None
+    t_ind = 0
+    while t_ind<len(timerange):
+       t = timerange[t_ind]
+       if adaptive: versions = sum(obj._version for obj in stepobjs)
        # inject fault when it occurs, track defined flow states and graph
        try:
            if singletime:
-               if t==scen['properties']['time']: flowstates = propagate(mdl, scen['faults'], t, flowstates)
-               else: flowstates = propagate(mdl,[],t, flowstates)
+               if t==scen['properties']['time']: flowstates = propagate(mdl, scen['faults'], t, flowstates, cone)
+               else: flowstates = propagate(mdl,[],t, flowstates, cone)
            else:
                if t in scen['properties']['time']:
                    ind = scen['properties']['time'].index(t)
-                   flowstates = propagate(mdl, scen['faults'][ind], t, flowstates)
-               else: flowstates = propagate(mdl,[],t, flowstates)
-           if track: update_mdlhist(mdl, mdlhist, t_ind+shift)
-           if t in ctimes: c_mdl[t]=mdl.copy()
-       except:
-            print("Error at t="+str(t))
+                   flowstates = propagate(mdl, scen['faults'][ind], t, flowstates, cone)
+               else: flowstates = propagate(mdl,[],t, flowstates, cone)
+           if track and rec_inds[t_ind]>=0: 
+               update_mdlhist(mdl, mdlhist, rec_inds[t_ind], histrecord)
+               if cone: fill_cone_hist(mdlhist, prevhist, rec_inds[t_ind], shift, cone)
+               if _events and degraded is not False:
+                   for flowname, atts in get_degraded(mdlhist, prevhist, rec_inds[t_ind], shift, degraded).items():
+                       degraded.add(flowname)
+                       _events.emit('flow degraded', t, flowname, atts)
+           if t in c_mdl: 
+               with profiled('copy', 'get_state'):      c_mdl[t]=mdl.get_state()
+           if statehist is not False: 
+               with profiled('copy', 'get_fullstate'):  statehist[t]=get_fullstate(mdl)
+           if reconv and t>=lastfaulttime and rec_inds[t_ind]>=0 and check_reconv(mdlhist, prevhist, rec_inds[t_ind], shift) \
+              and same_state(cone_state(get_fullstate(mdl), cone), cone_state(reconv[t], cone)):
+               splice_mdlhist(mdlhist, prevhist, rec_inds[t_ind]+1, shift)
+               mdlhist['reconverged'] = t
+               if _events: _events.emit('reconverged', t)
+               break
+       except Exception as e:
+            if _events: _events.emit('error', t, data={'error':repr(e)})
             raise
-            break
+       # if adaptive, skip the time-steps up to the next event once a time-step does not change the model
+       if adaptive and sum(obj._version for obj in stepobjs)==versions:
+           newstate = get_stepstate(mdl)
+           if stepstate is not None and same_stepstate(stepstate, newstate):
+               next_ind = get_next_event_ind(mdl, t, timerange, events)
+               for skip_ind in range(t_ind+1, next_ind):
+                   if track and rec_inds[skip_ind]>=0: update_mdlhist(mdl, mdlhist, rec_inds[skip_ind], histrecord)
+                   if statehist is not False: statehist[timerange[skip_ind]]=statehist[t]
+               t_ind = next_ind-1
+           stepstate = newstate
+       elif adaptive: stepstate = None
+       t_ind+=1
+    if cone: # functions/flows outside the cone are set to their nominal end state (e.g. for classification)
+        for fxnname in cone['frozen']:      set_nomstate(mdl.fxns[fxnname], prune[t]['functions'][fxnname], prune[t])
+        for flowname in cone['interior']:   set_nomstate(mdl.flows[flowname], prune[t]['flows'][flowname], prune[t])
+    if staged and track and prevhist: mdlhist = overlay_mdlhist(prevhist, mdlhist, shift)
+    if _events: _events.emit('scenario end', t, data={'elapsed':perf_counter()-start})
     return mdlhist, c_mdl
 
-def propagate(mdl, initfaults, time, flowstates={}):
+def init_scenhist(mdl, time, track=True, staged=False, prevhist={}):
+    """
+    Initializes the time range and history of a scenario run by prop_one_scen (or prop_batch) with the given options
+
+    Returns
+    -------
+    timerange : array
+        Times to run the scenario over (from the scenario time if staged, otherwise over the full time range)
+    shift : int
+        Index of the start of timerange in prevhist (or the full time range)
+    mdlhist : dict
+        History of the model states over timerange (see init_mdlhist), or {} if not tracked
+    """
+    #if staged, we want it to start a new run from the starting time of the scenario,
+    # using a copy of the input model (which is the nominal run) at this time
+    if staged:
+        timerange=np.arange(time, mdl.times[-1]+1, mdl.tstep)
+        shift = len(np.arange(mdl.times[0], time, mdl.tstep))
+        # only the history from the scenario time onward is recorded (see overlay_mdlhist)
+        if track and prevhist:  
+            shift = np.searchsorted(prevhist['time'], time)
+            mdlhist = init_mdlhist(mdl, prevhist['time'][shift:], prevhist, track)
+        elif track:             mdlhist = init_mdlhist(mdl, get_rectimes(mdl, timerange, track), track=track)
+    else: 
+        timerange = np.arange(mdl.times[0], mdl.times[-1]+1, mdl.tstep)
+        shift = 0
+        if track:  mdlhist = init_mdlhist(mdl, get_rectimes(mdl, timerange, track), track=track)
+    if not track: mdlhist={}
+    return timerange, shift, mdlhist
+
+def prop_batch(mdl, scens, track=True, staged=False, prevhist={}):
+    """
+    Runs a batch of fault scenarios injected at the same time in the lanes of one model (see Model.init_lanes), 
+    so the scenarios are simulated with one sequence of calls to the behaviors of the functions (which operate on the
+    arrays of the states of all the lanes) rather than one per scenario. Time-steps are not skipped (see Model
+    'adaptive') and the scenarios are run to the end (i.e., not stopped at reconvergence).
+
+    Parameters
+    ----------
+    mdl : model
+        The model to run the scenarios in, which is given a lane for each scenario (so its functions must operate on arrays)
+    scens : list
+        The fault scenarios to run, injected at the same (single) time. Each has structure: {'faults':{fxn:fault}, 'properties':{rate, time, name, etc}}
+    track, staged, prevhist : 
+        See prop_one_scen
+
+    Returns
+    -------
+    mdlhists : list
+        History of the model states in each scenario (the rows of one 2-D history of all the lanes, see init_lanehist)
+    mdl : model
+        The model with lanes at the end of the scenarios (see Model.get_lanestates)
+    """
+    times = [scen['properties']['time'] for scen in scens]
+    if any(type(t)==list or t!=times[0] for t in times):
+        raise Exception("Invalid batch of scenarios at times "+str(times)+". Scenarios in a batch should be injected at the same (single) time.")
+    timerange, shift, mdlhist = init_scenhist(mdl, times[0], track, staged, prevhist)
+    initfaults = {}
+    for lane, scen in enumerate(scens):
+        for fxnname, faults in scen['faults'].items():
+            for fault in (faults if type(faults)==list else [faults]):
+                initfaults.setdefault(fxnname, {}).setdefault(fault, np.zeros(len(scens), dtype=bool))[lane] = True
+    mdl.init_lanes(len(scens))
+    if _profiler: _profiler.scen = ', '.join(scen['properties']['name'] for scen in scens)
+    if _events:
+        for scen in scens:
+            _events.scen = scen['properties']['name']
+            _events.emit('scenario start', timerange[0])
+        _events.scen, start = ', '.join(scen['properties']['name'] for scen in scens), perf_counter()
+    flowstates={}
+    if track:
+        lanehist = init_lanehist(mdlhist, len(scens))
+        histrecord = init_histrecord(mdl, lanehist)
+        rec_inds = get_recinds(timerange, lanehist['time'], mdl.tstep)
+    for t_ind, t in enumerate(timerange):
+        try:
+            if t==times[0]: flowstates = propagate(mdl, initfaults, t, flowstates)
+            else:           flowstates = propagate(mdl, [], t, flowstates)
+            if track and rec_inds[t_ind]>=0: update_mdlhist(mdl, lanehist, rec_inds[t_ind], histrecord)
+        except Exception as e:
+            if _events: _events.emit('error', t, data={'error':repr(e)})
+            raise
+    if _events:
+        elapsed = perf_counter()-start
+        for scen in scens:
+            _events.scen = scen['properties']['name']
+            _events.emit('scenario end', t, data={'elapsed':elapsed})
+    if not track:                   return [{} for _ in scens], mdl
+    mdlhists = [get_lanehist(lanehist, lane) for lane in range(len(scens))]
+    if staged and prevhist:         mdlhists = [overlay_mdlhist(prevhist, mdlhist, shift) for mdlhist in mdlhists]
+    return mdlhists, mdl
+
+def get_events(mdl, scen, ctimes=[]):
+    """
+    Returns the times which are not skipped in adaptive time-stepping (see prop_one_scen), i.e. the times of the 
+    faults in the scenario, the start and end of the phases of the model, and the times to capture the model at.
+    """
+    if type(scen['properties']['time'])==list:  events = set(scen['properties']['time'])
+    else:                                       events = {scen['properties']['time']}
+    for phase in mdl.phases.values(): events.update([phase[0], phase[-1]+mdl.tstep])
+    events.update(ctimes)
+    return np.sort(list(events))
+def get_stepobjs(mdl):
+    """ Returns the flows, functions, and components of the model (whose versions are checked after each time-step) """
+    return [*mdl.flows.values(), *mdl.fxns.values(), *[comp for fxn in mdl.fxns.values() for comp in fxn.components.values()]]
+def get_stepstate(mdl):
+    """ Returns the state of the model (see Model.get_state) except for the times the functions were last run at """
+    layout, state = mdl.get_statelayout(), mdl.get_state()
+    return [val for (obj, att), val in zip(layout, state[1:]) if att!='time' or not isinstance(obj, Block)]+state[len(layout)+1:]
+def same_stepstate(state1, state2):
+    """ Checks whether two states from get_stepstate have the same values """
+    return len(state1)==len(state2) and not any(_changed(val1, val2) for val1, val2 in zip(state1, state2))
+def get_next_event_ind(mdl, time, timerange, events):
+    """ Returns the index in timerange of the next event after time (see get_events and FxnBlock.next_event_time) """
+    nexttimes = [fxn.next_event_time(time) for fxn in mdl.fxns.values()]
+    nexttime = min([t for t in nexttimes if t is not None and t>time]+[t for t in events if t>time], default=np.inf)
+    return int(np.searchsorted(timerange, nexttime))
+
+def check_reconv(mdlhist, nomhist, t_ind, shift=0):
+    """ Checks whether the flow states, function states, and faults in mdlhist at t_ind match those in nomhist at t_ind+shift """
+    for flowname, atts in mdlhist["flows"].items():
+        for att, hist in atts.items():
+            if hist[t_ind]!=nomhist["flows"][flowname][att][t_ind+shift]: return False
+    for fxnname, states in mdlhist["functions"].items():
+        for state, hist in states.items():
+            if hist[t_ind]!=nomhist["functions"][fxnname][state][t_ind+shift]: return False
+    return True
+def get_degraded(mdlhist, nomhist, t_ind, shift=0, exclude=()):
+    """ Returns the flows (other than those in exclude) with states in mdlhist at t_ind which differ from those in 
+    nomhist at t_ind+shift, with structure {flow:{att:value}} """
+    degraded = {}
+    for flowname, atts in mdlhist["flows"].items():
+        if flowname in exclude: continue
+        diffs = {att:hist[t_ind] for att, hist in atts.items() if hist[t_ind]!=nomhist["flows"][flowname][att][t_ind+shift]}
+        if diffs: degraded[flowname] = diffs
+    return degraded
+
+def get_fullstate(mdl):
+    """
+    Returns a snapshot of all the attributes of the flows and functions in the model (including timers, components, 
+    and attributes that are not states) with structure {'flows':{flow:{att:val}}, 'functions':{fxn:{att:val}}}
+    (and 'statevector':array for the attributes stored in the model's state vector, see Model.init_statevector). 
+    Used to check whether a fault scenario has reconverged with the nominal scenario.
+    """
+    fullstate = {'flows':{flowname:_objstate(flow) for flowname, flow in mdl.flows.items()},
+                 'functions':{fxnname:_objstate(fxn) for fxnname, fxn in mdl.fxns.items()}}
+    if getattr(mdl, '_use_statevector', False): fullstate['statevector'] = mdl._statevector.copy()
+    return fullstate
+def _objstate(obj):
+    """ Returns a copy of the attributes of a block, flow, or timer (excluding private attributes, labels, fault modes, and flows) """
+    return {att:_valstate(val) for att, val in vars(obj).items() 
+            if not att.startswith('_') and att not in _nonstate_atts and not isinstance(val, Flow)}
+def _valstate(val):
+    if isinstance(val, (Block, Timer)): return _objstate(val)
+    elif isinstance(val, dict):         return {key:_valstate(v) for key, v in val.items()}
+    else:                               return copy.deepcopy(val)
+def same_state(state1, state2):
+    """ Checks whether two states (e.g. from get_fullstate) have the same values """
+    if isinstance(state1, dict):
+        return isinstance(state2, dict) and state1.keys()==state2.keys() and all(same_state(val, state2[key]) for key, val in state1.items())
+    try:                return bool(state1==state2)
+    except ValueError:  
+        try:            return np.array_equal(state1, state2)
+        except:         return False
+
+def splice_mdlhist(mdlhist, nomhist, t_ind, shift=0):
+    """ Copies the states in nomhist from t_ind+shift onward into mdlhist from t_ind onward (e.g. when the scenario has reconverged) """
+    for flowname, atts in mdlhist["flows"].items():
+        for att, hist in atts.items():
+            hist[t_ind:] = nomhist["flows"][flowname][att][t_ind+shift:]
+    for fxnname, states in mdlhist["functions"].items():
+        for state, hist in states.items():
+            hist[t_ind:] = nomhist["functions"][fxnname][state][t_ind+shift:]
+
+def overlay_mdlhist(nomhist, mdlhist, shift):
+    """
+    Overlays the history of a staged scenario (recorded from the scenario time onward) on the nominal history 
+    (used before the scenario time) without copying the nominal history (see HistOverlay).
+
+    Parameters
+    ----------
+    nomhist : dict
+        History of the nominal model over the full time range
+    mdlhist : dict
+        History of the scenario from the scenario time onward
+    shift : int
+        Index of the scenario time in the nominal history
+
+    Returns
+    -------
+    mdlhist : dict
+        History of the scenario over the full time range
+    """
+    fullhist = {key:val for key, val in mdlhist.items() if key not in ["flows", "functions", "time"]}
+    fullhist["flows"] = {flowname:HistOverlay(nomhist["flows"][flowname], atts, shift) for flowname, atts in mdlhist["flows"].items()}
+    fullhist["functions"] = {fxnname:HistOverlay(nomhist["functions"][fxnname], states, shift) for fxnname, states in mdlhist["functions"].items()}
+    fullhist["time"] = np.concatenate([nomhist["time"][:shift], mdlhist["time"]])
+    return fullhist
+
+class HistOverlay(MutableMapping):
+    """
+    History of the states of a flow or function in a staged scenario, which refers to the nominal history for the 
+    times before the scenario time and only stores the states from the scenario time onward. The full history 
+    vector of a state is materialized (and stored) when it is first accessed, so it is only copied if used.
+    Behaves as a dict of state vectors; copies and pickles of it are dicts.
+    """
+    def __init__(self, nomhist, hist, shift):
+        self._nomhist = nomhist
+        self._hist = hist
+        self._shift = shift
+        self._full = {}
+    def __getitem__(self, key):
+        if key not in self._full:
+            self._full[key] = np.concatenate([self._nomhist[key][:self._shift], self._hist[key]])
+        return self._full[key]
+    def __setitem__(self, key, value):
+        self._full[key] = value
+        if key not in self._hist: self._hist[key] = None
+    def __delitem__(self, key):
+        del self._hist[key]
+        self._full.pop(key, None)
+    def __iter__(self):
+        return iter(self._hist)
+    def __len__(self):
+        return len(self._hist)
+    def __repr__(self):
+        return repr(dict(self))
+    def __copy__(self):
+        return dict(self)
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(self), memo)
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+def propagate(mdl, initfaults, time, flowstates={}, cone=False):
     """
     Injects and propagates faults through the graph at one time-step
 
@@ -422,38 +1236,62 @@ def propagate(mdl, initfaults, time, flowstates={}):
     mdl : model
         The model to propagate the fault in
     initfaults : dict
-        The faults to inject in the model with structure {fxn:fault}
+        The faults to inject in the model with structure {fxn:fault} (or {fxn:[faults]}, or, in a model with lanes, 
+        {fxn:{fault:lanes}} of the bool arrays of the lanes to inject each fault in, see Model.init_lanes)
     time : float
         The current timestep.
     flowstates : dict, optional
-        States of the model at the previous time-step (if used). The default is {}.
+        Versions (change counters) and states of each flow at the previous time-step (if used). The default is {}.
+    cone : dict or False, optional
+        Cone of influence of the faults (see init_cone). If given, functions outside the cone are not run. The default is False.
 
     Returns
     -------
     flowstates : dict
-        States of the model at the current time-step.
+        Versions (change counters) and states of each flow at the current time-step.
     """
+    if _profiler: start = perf_counter()
     #set up history of flows to see if any has changed
     activefxns=mdl.timelyfxns.copy()
-    nextfxns=set()
+    if cone: activefxns.difference_update(cone['frozen'])
     #Step 1: Find out what the current value of the flows are (if not generated in the last iteration)
     if not flowstates:
         for flowname, flow in mdl.flows.items():
-            flowstates[flowname]=flow.status()
+            flowstates[flowname]=(flow._version, flow.status())
+    if cone: startstate, startflowstates = mdl.get_state(), dict(flowstates)
     #Step 2: Inject faults if present
     if initfaults:
-        flowstates = prop_time(mdl, activefxns, nextfxns, flowstates, time, initfaults)
+        flowstates = prop_time(mdl, activefxns, flowstates, time, initfaults, cone)
     for fxnname in initfaults:
         fxn=mdl.fxns[fxnname]
-        if type(initfaults[fxnname])==list: fxn.updatefxn(faults=initfaults[fxnname], time=time)
-        else:                               fxn.updatefxn(faults=[initfaults[fxnname]], time=time)
+        if type(initfaults[fxnname]) in (list, dict):   faults = initfaults[fxnname]
+        else:                                           faults = [initfaults[fxnname]]
+        if _events and 'fault injected' in _events.kinds: _events.emit('fault injected', time, fxnname, {'faults':list(faults)})
+        if _profiler:   _profiler.updatefxn(fxn, time, faults)
+        else:           fxn.updatefxn(faults=faults, time=time)
         activefxns.update([fxnname])
     #Step 3: Propagate faults through graph
-    flowstates = prop_time(mdl, activefxns, nextfxns, flowstates, time, initfaults)
+    flowstates = prop_time(mdl, activefxns, flowstates, time, initfaults, cone)
+    #Step 4: If flows connected to functions outside the cone of influence deviate from the nominal scenario, re-run the
+    #time-step from its start with these functions in the cone (so they are run in the same order as without the cone)
+    if cone:
+        fxnnames = check_cone(mdl, cone, time)
+        if fxnnames:
+            mdl.set_state(startstate)
+            thaw_fxns(mdl, cone, fxnnames, startflowstates)
+            return propagate(mdl, initfaults, time, startflowstates, cone)
+        cone['prevtime'] = time
+    if _profiler: _profiler.add('propagation', 'propagate', perf_counter()-start)
     return flowstates
-def prop_time(mdl, activefxns, nextfxns, flowstates, time, initfaults):
+def prop_time(mdl, activefxns, flowstates, time, initfaults, cone=False):
     """
     Propagates faults through model graph.
+    
+    Functions are run in sweeps, where the active functions are run in the order given by the model's schedule (see 
+    get_schedule) and functions downstream of flows that change are run later in the same sweep, so feed-forward 
+    chains are evaluated in a single sweep. At the end of each sweep, the functions connected to flows which changed 
+    over the sweep (except those only reading them which have been run since) are run in the next sweep, so feedback 
+    loops iterate to convergence.
 
     Parameters
     ----------
@@ -461,47 +1299,261 @@ def prop_time(mdl, activefxns, nextfxns, flowstates, time, initfaults):
         Model to propagate faults in
     activefxns : set
         Set of functions that are active (must be checked, e.g. because a fault was injected)
-    nextfxns : set
-        Set of active functions for the next iteration.
     flowstates : dict
-        States of each flow in the model.
+        Versions (change counters) and states of each flow in the model.
     time : float
         Current time-step.
     initfaults : dict
         Faults to inject during this propagation step.
+    cone : dict or False, optional
+        Cone of influence of the faults (see init_cone). If given, functions outside the cone are not run. The default is False.
 
     Returns
     -------
     flowstates : dict
-        States of each flow in the model after propagation
+        Versions (change counters) and states of each flow in the model after propagation
     """
+    schedule = get_schedule(mdl)
+    levels, writes, seen = schedule['levels'], schedule['writes'], schedule['seen']
+    fxnsflows = schedule['fxnflows']
     n=0
     while activefxns:
-        for fxnname in list(activefxns).copy():
+        queue = [levels[fxnname] for fxnname in activefxns]
+        heapq.heapify(queue)
+        queued, runflows, nextfxns = set(activefxns), set(), set()
+        while queue:
+            fxnname = schedule['order'][heapq.heappop(queue)]
             #Update functions with new values, check to see if new faults or states
-            oldstates, oldfaults = mdl.fxns[fxnname].return_states()
-            mdl.fxns[fxnname].updatefxn(time=time)
-            newstates, newfaults = mdl.fxns[fxnname].return_states() 
-            if oldstates != newstates or oldfaults != newfaults: nextfxns.update([fxnname])
-        #Check to see what flows have new values and add connected functions
-        for flowname, flow in mdl.flows.items():
-            if flowstates[flowname]!=flow.status():
-                nextfxns.update(set([n for n in mdl.bipartite.neighbors(flowname)]))
-            flowstates[flowname]=flow.status()
-        activefxns=nextfxns.copy()
-        nextfxns.clear()
+            fxn, fxnflows = mdl.fxns[fxnname], fxnsflows[fxnname]
+            prevversions = [flow._version for _, flow in fxnflows]
+            fxn._check_change()
+            if _profiler:   _profiler.updatefxn(fxn, time)
+            else:           fxn.updatefxn(time=time)
+            if fxn._check_change():
+                nextfxns.add(fxnname)
+                if _events and 'function changed' in _events.kinds:
+                    states, faults = copy.deepcopy(fxn.return_states())
+                    _events.emit('function changed', time, fxnname, {'states':states, 'faults':faults})
+            #Run the downstream functions of flows written to with new values later in the sweep
+            #(status is only compared if the flow was written to, i.e. its change counter was incremented)
+            for (flowname, flow), prevversion in zip(fxnflows, prevversions):
+                if flow._version!=prevversion:
+                    if flowname not in writes[fxnname]: # (the schedule is re-planned on the next step)
+                        writes[fxnname].add(flowname)
+                        schedule['planned'] = False
+                    if _changed(flowstates[flowname][1], flow.status()):
+                        for nextfxn in mdl._flowfxns[flowname]:
+                            if cone and nextfxn in cone['frozen']: continue
+                            if levels[nextfxn]>levels[fxnname] and nextfxn not in queued:
+                                heapq.heappush(queue, levels[nextfxn])
+                                queued.add(nextfxn)
+                seen[fxnname][flowname] = flow._version
+            runflows.update([flowname for flowname, _ in fxnflows])
+        #Check to see what flows changed over the sweep and add the connected functions which write to them (since they 
+        #may read them) or have not been run since they changed
+        numchanged = 0
+        for flowname in runflows:
+            flow = mdl.flows[flowname]
+            version, flowstate = flowstates[flowname]
+            if flow._version!=version:
+                newflowstate = flow.status()
+                if _changed(flowstate, newflowstate):
+                    numchanged += 1
+                    nextfxns.update([fxnname for fxnname in mdl._flowfxns[flowname] 
+                                     if flowname in writes[fxnname] or seen[fxnname].get(flowname)!=flow._version])
+                flowstates[flowname]=(flow._version, newflowstate)
+        if cone: nextfxns.difference_update(cone['frozen'])
+        if _profiler: _profiler.add_sweep(time, numchanged)
+        activefxns=nextfxns
         n+=1
-        if n>1000: #break if this is going for too long
-            print("Undesired looping in function")
-            print(initfaults)
-            print(fxnname)
-            print(activefxns)
-            break
+        if n>max_sweeps: #stop if this is going for too long
+            error = ConvergenceError(mdl, time, initfaults, activefxns, n)
+            if _events: _events.emit('nonconvergence', time, data={'fxns':error.fxns, 'loops':error.loops, 'sweeps':n})
+            raise error
     return flowstates
 
+max_sweeps = 1000 # maximum number of sweeps of the functions in one propagation step (see prop_time)
+class ConvergenceError(Exception):
+    """
+    Error raised when the functions of a model do not converge within a propagation step (see prop_time)
+
+    Attributes
+    ----------
+    time : float
+        Time of the propagation step
+    initfaults : dict
+        Faults injected in the propagation step
+    fxns : list
+        Functions which were still active (i.e. had not converged) when propagation was stopped
+    loops : list
+        Feedback loops (strongly connected sets of functions, see get_schedule) containing the active functions
+    sweeps : int
+        Number of sweeps of the functions run in the propagation step
+    """
+    def __init__(self, mdl, time, initfaults, fxns, sweeps):
+        schedule = get_schedule(mdl)
+        self.time, self.initfaults, self.sweeps = time, initfaults, sweeps
+        self.fxns = sorted(fxns, key=schedule['levels'].get)
+        self.loops = [loop for loop in schedule['loops'] if set(loop).intersection(fxns)]
+        super().__init__("Functions "+str(self.fxns)+" did not converge at time "+str(time)+" (with faults "+str(initfaults)+
+                         ") after "+str(sweeps)+" sweeps. Feedback loops: "+str(self.loops))
+
+def get_schedule(mdl):
+    """
+    Returns the schedule used to order the evaluation of the functions of the model in propagation (see prop_time),
+    which is planned when first used and re-planned when functions are found to write to new flows.
+    
+    The schedule is a topological order of the functions, where a function precedes the functions connected to the 
+    flows it writes to (as observed in propagation), and otherwise functions are ordered as in mdl.timelyfxns (and
+    then mdl.fxns). Strongly connected sets of functions (i.e. feedback loops) are collapsed into one level, so they
+    are ordered only relative to the rest of the model (and internally in the order of mdl.timelyfxns).
+
+    Parameters
+    ----------
+    mdl : Model
+        The model
+
+    Returns
+    -------
+    schedule : dict
+        Schedule with structure {'order':[fxnnames], 'levels':{fxnname:index in order}, 'loops':[[fxnnames]] of the 
+        feedback loops, 'writes':{fxnname:{flownames}} of the flows each function writes to, 'seen':{fxnname:{flowname:
+        version}} of the versions of the flows when each function was last run, 'fxnflows':{fxnname:[(flowname, flow)]} 
+        of the flows of each function, 'planned':bool}
+    """
+    schedule = getattr(mdl, '_schedule', None)
+    if schedule is None:
+        schedule = mdl._schedule = {'writes':{fxnname:set() for fxnname in mdl.fxns}, 'seen':{fxnname:{} for fxnname in mdl.fxns}, 'planned':False,
+                                    'fxnflows':{fxnname:[(flowname, mdl.flows[flowname]) for flowname in mdl._fxninput[fxnname]['flows']] for fxnname in mdl.fxns}}
+    if not schedule['planned']:
+        fxnorder = list(mdl.timelyfxns)+[fxnname for fxnname in mdl.fxns if fxnname not in mdl.timelyfxns]
+        rank = {fxnname:i for i, fxnname in enumerate(fxnorder)}
+        depgraph = nx.DiGraph()
+        depgraph.add_nodes_from(fxnorder)
+        depgraph.add_edges_from([(fxnname, nextfxn) for fxnname, flownames in schedule['writes'].items() 
+                                 for flowname in flownames for nextfxn in mdl._flowfxns[flowname] if nextfxn!=fxnname])
+        sccgraph = nx.condensation(depgraph)
+        sccs = {scc:sorted(sccgraph.nodes[scc]['members'], key=rank.get) for scc in sccgraph}
+        order = [fxnname for scc in nx.lexicographical_topological_sort(sccgraph, key=lambda scc: rank[sccs[scc][0]]) for fxnname in sccs[scc]]
+        schedule.update({'order':order, 'levels':{fxnname:i for i, fxnname in enumerate(order)}, 
+                         'loops':[scc for scc in sccs.values() if len(scc)>1], 'planned':True})
+    return schedule
+def reset_schedule(mdl, writes):
+    """
+    Resets the schedule of the model (see get_schedule) to the one planned from the given flows each function writes 
+    to (e.g. as found in the nominal run) and clears the flow versions seen by the functions. Since the flows learned 
+    in a fault scenario are otherwise kept in the schedule of the model, this is called before each fault scenario run 
+    in a (shared) model, so the order the functions are run in does not depend on the scenarios run before it.
+    """
+    schedule = get_schedule(mdl)
+    if schedule['writes']!=writes:
+        schedule['writes'] = {fxnname:set(flownames) for fxnname, flownames in writes.items()}
+        schedule['planned'] = False
+    schedule['seen'] = {fxnname:{} for fxnname in mdl.fxns}
+
+def init_cone(mdl, scen, nomstates):
+    """
+    Initializes the cone of influence of the faults in a scenario, i.e., the functions which may deviate from the 
+    nominal scenario (and the functions which write to the flows they are connected to, which they depend on). 
+    Functions outside the cone are frozen (not run), since they follow the nominal scenario until a flow connected to 
+    them deviates from it at the end of a time-step, at which point they are added to the cone (see check_cone) and 
+    the time-step is re-run (see propagate). Flows only connected to frozen functions (interior flows) are likewise 
+    not updated. Which functions write to each flow is learned in the nominal run (see get_schedule), so frozen 
+    functions only read the (boundary) flows connected to the cone.
+
+    Parameters
+    ----------
+    mdl : Model
+        The model (in the nominal state at the start of the scenario)
+    scen : dict
+        The fault scenario. Has structure: {'faults':{fxn:fault}, 'properties':{rate, time, name, etc}}
+    nomstates : dict
+        Full states of the nominal model at each time (see get_fullstate)
+
+    Returns
+    -------
+    cone : dict
+        Cone of influence with structure {'nomstates':nomstates, 'frozen':{fxnnames}, 'interior':{flownames}, 
+        'boundary':[flownames] of the flows connected to both frozen and unfrozen functions, 'vecinds':array of the 
+        indices of the unfrozen attributes in the state vector (if used), 'prevtime':time of the last propagated 
+        time-step (or None)}
+    """
+    if type(scen['faults'])==list:  faultfxns = {fxnname for faults in scen['faults'] for fxnname in faults}
+    else:                           faultfxns = set(scen['faults'])
+    cone = {'nomstates':nomstates, 'frozen':set(mdl.fxns), 'interior':set(mdl.flows), 'prevtime':None}
+    thaw_fxns(mdl, cone, faultfxns)
+    return cone
+def update_cone(mdl, cone):
+    """ Updates the interior and boundary flows (and state vector indices) of the cone after functions are thawed """
+    cone['interior'] = {flowname for flowname, fxnnames in mdl._flowfxns.items() if cone['frozen'].issuperset(fxnnames)}
+    cone['boundary'] = [flowname for flowname, fxnnames in mdl._flowfxns.items() 
+                        if flowname not in cone['interior'] and cone['frozen'].intersection(fxnnames)]
+    if getattr(mdl, '_use_statevector', False):
+        frozenobjs = {id(obj) for fxnname in cone['frozen'] for obj in [mdl.fxns[fxnname], *mdl.fxns[fxnname].components.values()]}
+        frozenobjs.update([id(mdl.flows[flowname]) for flowname in cone['interior']])
+        cone['vecinds'] = np.array([ind for ind, obj in enumerate(mdl._slotobjs) if id(obj) not in frozenobjs], dtype=int)
+def thaw_fxns(mdl, cone, fxnnames, flowstates={}):
+    """
+    Adds frozen functions (and the frozen functions writing to the flows connected to them) to the cone of influence, 
+    setting them and the flows no longer interior to the cone to their nominal state at the start of the current 
+    time-step (i.e., after the previous time-step, if any). Returns the names of the functions added.
+    """
+    schedule = get_schedule(mdl)
+    writes = schedule['writes']
+    thawed, fxnnames = set(), [fxnname for fxnname in fxnnames if fxnname in cone['frozen']]
+    while fxnnames:
+        fxnname = fxnnames.pop()
+        cone['frozen'].remove(fxnname)
+        schedule['seen'][fxnname].clear()
+        thawed.add(fxnname)
+        fxnnames.extend([fxn for flowname in mdl._fxninput[fxnname]['flows'] for fxn in mdl._flowfxns[flowname] 
+                         if fxn in cone['frozen'] and fxn not in fxnnames and flowname in writes[fxn]])
+    interior = cone['interior']
+    update_cone(mdl, cone)
+    if cone['prevtime'] is not None:
+        nomstate = cone['nomstates'][cone['prevtime']]
+        for fxnname in thawed:  set_nomstate(mdl.fxns[fxnname], nomstate['functions'][fxnname], nomstate)
+        for flowname in interior.difference(cone['interior']):
+            flow = mdl.flows[flowname]
+            set_nomstate(flow, nomstate['flows'][flowname], nomstate)
+            if flowname in flowstates: flowstates[flowname] = (flow._version, flow.status())
+    return thawed
+def check_cone(mdl, cone, time):
+    """
+    Returns the frozen functions connected to the boundary flows of the cone of influence which deviate from the 
+    nominal scenario at the end of the time-step (which must be added to the cone, see thaw_fxns).
+    """
+    nomstate = cone['nomstates'][time]
+    deviated = [flowname for flowname in cone['boundary'] if _deviates(mdl.flows[flowname], nomstate['flows'][flowname], nomstate)]
+    return {fxnname for flowname in deviated for fxnname in mdl._flowfxns[flowname] if fxnname in cone['frozen']}
+def _deviates(obj, state, nomstate):
+    """ Checks whether a flow deviates from its state in a full state of the model (see get_fullstate) """
+    if not same_state({att:getattr(obj, att, None) for att in state}, state): return True
+    if 'statevector' in nomstate:
+        return any(getattr(obj, att)!=nomstate['statevector'][ind] for att, ind in vars(obj).get('_slots', {}).items())
+    return False
+def set_nomstate(obj, state, nomstate):
+    """ Sets a flow/function to its state in a full state of the model (see get_fullstate), including the state vector """
+    _set_objstate(obj, state)
+    if 'statevector' in nomstate:
+        for block in [obj, *getattr(obj, 'components', {}).values()]:
+            for att, ind in vars(block).get('_slots', {}).items(): setattr(block, att, nomstate['statevector'][ind])
+def cone_state(fullstate, cone):
+    """ Returns the part of a full state of the model (see get_fullstate) inside the cone of influence (if any) """
+    if not cone: return fullstate
+    state = {'flows':{flowname:val for flowname, val in fullstate['flows'].items() if flowname not in cone['interior']},
+             'functions':{fxnname:val for fxnname, val in fullstate['functions'].items() if fxnname not in cone['frozen']}}
+    if 'statevector' in fullstate: state['statevector'] = fullstate['statevector'][cone['vecinds']]
+    return state
+def fill_cone_hist(mdlhist, nomhist, t_ind, shift, cone):
+    """ Copies the history of the functions/flows outside the cone of influence at t_ind from the nominal history """
+    for objtype, names in [('functions', cone['frozen']), ('flows', cone['interior'])]:
+        for name in names.intersection(mdlhist[objtype]):
+            for att, hist in mdlhist[objtype][name].items(): hist[t_ind] = nomhist[objtype][name][att][t_ind+shift]
+
 #update_mdlhist
 # find a way to make faster (e.g. by automatically getting values by reference)
-def update_mdlhist(mdl, mdlhist, t_ind):
+def update_mdlhist(mdl, mdlhist, t_ind, histrecord=False):
     """
     Updates the model history at a given time.
 
@@ -513,64 +1565,271 @@ def update_mdlhist(mdl, mdlhist, t_ind):
         History of model states (a dict with a vector of each state)
     t_ind : float
         The time to update the model history at.
+    histrecord : tuple, optional
+        Layout of mdlhist compiled for mdl by init_histrecord (to not recompile it every timestep). The default is False.
     """
-    update_flowhist(mdl, mdlhist, t_ind)
-    update_fxnhist(mdl, mdlhist, t_ind)
-def update_flowhist(mdl, mdlhist, t_ind):
-    """ Updates the flows in the model history at t_ind """
-    for flowname, flow in mdl.flows.items():
-        atts=flow.status()
-        for att, val in atts.items():
-            try:
-                mdlhist["flows"][flowname][att][t_ind] = val
-            except:
-                print("Value too large to represent: "+att+"="+str(val))
-                raise
-def update_fxnhist(mdl, mdlhist, t_ind):
-    """ Updates the functions (faults and states) in the model history at t_ind """
-    for fxnname, fxn in mdl.fxns.items():
-        states, faults = fxn.return_states()
-        mdlhist["functions"][fxnname]["faults"][t_ind]=faults
-        for state, value in states.items():
-            mdlhist["functions"][fxnname][state][t_ind] = value 
+    if _profiler: start = perf_counter()
+    if not histrecord: histrecord = init_histrecord(mdl, mdlhist)
+    blocks, rows = histrecord
+    try:
+        for block, getters, vecslots in blocks:
+            if vecslots:    block[:, t_ind] = vecslots[0][vecslots[1]]
+            else:           block[:, t_ind] = [getter() for getter in getters]
+        for hist, getter in rows:
+            hist[t_ind] = getter()
+    except OverflowError:
+        # faults added with modes not in the history when it was initialized may not fit in its int64 bitmasks
+        if not widen_faulthist(mdlhist, histrecord): raise
+        update_mdlhist(mdl, mdlhist, t_ind, histrecord)
+    if _profiler: _profiler.add('history', 'update_mdlhist', perf_counter()-start)
 
-def init_mdlhist(mdl, timerange):
+def widen_faulthist(mdlhist, histrecord):
+    """
+    Converts the int64 fault bitmask histories in mdlhist of the functions with too many modes to fit in int64 
+    (because modes were appended by encode_faults after the history was initialized) to python ints.
+
+    Parameters
+    ----------
+    mdlhist : dict
+        History of model states
+    histrecord : tuple
+        Layout of mdlhist compiled by init_histrecord, which is updated to record the converted histories
+
+    Returns
+    -------
+    widened : bool
+        Whether any history was converted
+    """
+    blocks, rows = histrecord
+    widened = False
+    for fxnname, states in mdlhist["functions"].items():
+        hist = states.get("faults")
+        if hist is None or hist.dtype==object or faults_dtype(mdlhist["faultmodes"][fxnname])!=object: continue
+        states["faults"] = hist.astype(object)
+        for block, getters, vecslots in blocks:
+            if np.shares_memory(block, hist):
+                row = (hist.__array_interface__['data'][0] - block.__array_interface__['data'][0])//block.strides[0]
+                rows.append((states["faults"], getters[row]))
+                getters[row] = int # (the row in the block is no longer recorded)
+        rows[:] = [(states["faults"].T, getter) if np.shares_memory(rowhist, hist) else (rowhist, getter) 
+                   for rowhist, getter in rows]
+        widened = True
+    return widened
+
+def init_histrecord(mdl, mdlhist):
+    """
+    Compiles the layout used to record the states of the model mdl in the history mdlhist (see update_mdlhist).
+
+    Parameters
+    ----------
+    mdl : model
+        the Model object
+    mdlhist : dict
+        History of model states. If initialized by init_mdlhist, its vectors are rows of 2-D history blocks.
+
+    Returns
+    -------
+    histrecord : tuple
+        (blocks, rows), where blocks is a list of (block, getters, vecslots) for each 2-D history block (so each timestep
+        is recorded in one write per block) and rows is a list of (hist, getter) for each vector not in a block. If all
+        the states in a block are stored in the model's state vector (see Model.init_statevector), vecslots is 
+        (statevector, indices) so the block is recorded by indexing the state vector (otherwise it is False).
+    """
+    blocks, rows = {}, []
+    for flowname, atts in mdlhist["flows"].items():
+        flow = mdl.flows[flowname]
+        custom_status = type(flow).status is not Flow.status
+        for att, hist in atts.items():
+            if custom_status:   getter = lambda flow=flow, att=att: flow.status()[att]
+            else:               getter = partial(getattr, flow, att)
+            if not custom_status: getter = _vecgetter(flow, att, getter)
+            add_histrow(hist, getter, blocks, rows)
+    for fxnname, states in mdlhist["functions"].items():
+        fxn = mdl.fxns[fxnname]
+        for state, hist in states.items():
+            if state=="faults" and fxn._lanes:  getter = partial(encode_lanefaults, fxn, mdlhist["faultmodes"][fxnname])
+            elif state=="faults":               getter = lambda fxn=fxn, modes=mdlhist["faultmodes"][fxnname]: encode_faults(fxn.faults, modes)
+            else:                               getter = _vecgetter(fxn, state, partial(getattr, fxn, state))
+            add_histrow(hist, getter, blocks, rows)
+    blocklist = []
+    for block, getters in blocks.values():
+        if None in getters:
+            rows.extend([(block[row], getter) for row, getter in enumerate(getters) if getter])
+        elif all(isinstance(getter, _VecGetter) and getter.vec is getters[0].vec for getter in getters):
+            blocklist.append((block, getters, (getters[0].vec, np.array([getter.ind for getter in getters]))))
+        else:
+            blocklist.append((block, getters, False))
+    return blocklist, rows
+class _VecGetter(object):
+    """ Getter of a state stored in the state vector of a model (see Model.init_statevector) """
+    def __init__(self, vec, ind):
+        self.vec, self.ind = vec, ind
+    def __call__(self):
+        return self.vec[self.ind]
+def _vecgetter(obj, att, getter):
+    """ Returns a _VecGetter for the attribute att of obj if it is stored in a state vector, otherwise getter"""
+    slots = vars(obj).get('_slots', {})
+    if att in slots:    return _VecGetter(vars(obj)['_vec'], slots[att])
+    else:               return getter
+def add_histrow(hist, getter, blocks, rows):
+    """ Adds a history vector (and the getter of its value) to its 2-D history block in blocks (if any) or otherwise to rows"""
+    base = getattr(hist, 'base', None)
+    if isinstance(base, np.ndarray) and base.ndim==2 and hist.ndim==1 and base.flags.c_contiguous and hist.shape[0]==base.shape[1]:
+        row = (hist.__array_interface__['data'][0] - base.__array_interface__['data'][0])//base.strides[0]
+        blocks.setdefault(id(base), (base, [None]*base.shape[0]))[1][row] = getter
+    else:
+        rows.append((hist.T, getter)) # (2-D histories of models with lanes are recorded by column, see init_lanehist)
+
+def init_mdlhist(mdl, timerange, prevhist={}, track=True):
     """
     Initializes the model history over a given timerange
 
+    The state vectors of the history are rows of one contiguous 2-D (state x time) block per data type, so 
+    each timestep can be recorded with one write per block in update_mdlhist. The faults of each function 
+    are recorded as an int bitmask, where bit i is set if the function has the mode mdlhist['faultmodes'][fxn][i]
+    (see encode_faults and resultdisp.process.decode_faults).
+
     Parameters
     ----------
     mdl : model
         the Model object
     timerange : array
         Numpy array of times to initialize in the dictionary.
+    prevhist : dict, optional
+        History to take the data types of the states and the modes used to encode the faults from (e.g. the nominal 
+        history in staged execution, so the histories can be combined). The default is {} (uses those of the model).
+    track : bool or dict, optional
+        Which states to track. If True, all flow attributes and function states (and faults) are tracked. If a dict,
+        it may have the keys:
+            - 'flows' : list of the flows to track all the attributes of, or dict of the attributes to track 
+              for each flow {flowname:[atts]}. If not given, all flows are tracked.
+            - 'functions' : list of the functions to track all the states (and faults) of, or dict of the states 
+              to track for each function {fxnname:[states]} (where 'faults' tracks the faults). If not given, all functions are tracked.
+            - 'stride' : int n to record only every nth time-step, or 'phases' to only record the time-steps at 
+              the beginning and end of each phase (see get_rectimes). Used in prop_one_scen. 
+        The default is True.
 
     Returns
     -------
     mdlhist : dict
         A dictionary history of each model state over the given timerange.
     """
+    if _profiler: start = perf_counter()
     mdlhist={}
-    mdlhist["flows"]=init_flowhist(mdl, timerange)
-    mdlhist["functions"]=init_fxnhist(mdl, timerange)
+    histrows=[]
+    if prevhist:    mdlhist["faultmodes"]={fxnname:modes.copy() for fxnname, modes in prevhist["faultmodes"].items()}
+    else:           mdlhist["faultmodes"]=init_faultmodes(mdl)
+    mdlhist["flows"]=init_flowhist(mdl, timerange, histrows, prevhist.get("flows", {}), track)
+    mdlhist["functions"]=init_fxnhist(mdl, timerange, histrows, mdlhist["faultmodes"], prevhist.get("functions", {}), track)
     mdlhist["time"]=np.array([i for i in timerange])
+    init_histblocks(histrows, len(timerange))
+    if _profiler: _profiler.add('history', 'init_mdlhist', perf_counter()-start)
     return mdlhist
-def init_flowhist(mdl, timerange):
+def init_lanehist(mdlhist, numlanes):
+    """
+    Initializes the history of a model with numlanes lanes (see Model.init_lanes) from a history of the model without 
+    lanes (see init_mdlhist), where the history of each state is a 2-D (lane x time) array, so the states of all the 
+    lanes are recorded with one write per state in update_mdlhist and the history of each lane is a row (see get_lanehist).
+    """
+    lanehist = {key:val for key, val in mdlhist.items() if key not in ["flows", "functions"]}
+    for objtype in ["flows", "functions"]:
+        lanehist[objtype] = {name:{att:np.repeat(np.asarray(hist)[np.newaxis], numlanes, axis=0) for att, hist in atts.items()} 
+                             for name, atts in mdlhist[objtype].items()}
+    return lanehist
+def get_lanehist(lanehist, lane):
+    """ Returns the history of one lane from the history of a model with lanes (see init_lanehist) """
+    mdlhist = {key:copy.deepcopy(val) for key, val in lanehist.items() if key not in ["flows", "functions"]}
+    for objtype in ["flows", "functions"]:
+        mdlhist[objtype] = {name:{att:hist[lane] for att, hist in atts.items()} for name, atts in lanehist[objtype].items()}
+    return mdlhist
+def init_flowhist(mdl, timerange, histrows=False, prevhist={}, track=True):
     """ Initializes the flow history flowhist of the model mdl over the time range timerange"""
     flowhist={}
     for flowname, flow in mdl.flows.items():
+        tracked = get_tracked(track, "flows", flowname)
+        if not tracked: continue
         atts=flow.status()
         flowhist[flowname] = {}
         for att, val in atts.items():
-            flowhist[flowname][att] = np.full([len(timerange)], val)
+            if tracked=='all' or att in tracked:
+                init_histrow(flowhist[flowname], att, val, timerange, histrows, prev_dtype(prevhist, flowname, att))
     return flowhist
-def init_fxnhist(mdl, timerange):
+def init_fxnhist(mdl, timerange, histrows=False, faultmodes=False, prevhist={}, track=True):
     """Initializes the function state history fxnhist of the model mdl over the time range timerange"""
     fxnhist = {}
+    if not faultmodes: faultmodes = init_faultmodes(mdl)
     for fxnname, fxn in mdl.fxns.items():
+        tracked = get_tracked(track, "functions", fxnname)
+        if not tracked: continue
         states, faults = fxn.return_states()
         fxnhist[fxnname]={}
-        fxnhist[fxnname]["faults"]=[faults for i in timerange]
+        if tracked=='all' or 'faults' in tracked:
+            modes = faultmodes[fxnname]
+            mask = encode_faults(faults, modes)
+            dtype = prev_dtype(prevhist, fxnname, "faults")
+            if dtype is None or faults_dtype(modes)==object: dtype = faults_dtype(modes)
+            init_histrow(fxnhist[fxnname], "faults", mask, timerange, histrows, dtype)
         for state, value in states.items():
-            fxnhist[fxnname][state] = np.full([len(timerange)], value)
-    return fxnhist
\ No newline at end of file
+            if tracked=='all' or state in tracked:
+                init_histrow(fxnhist[fxnname], state, value, timerange, histrows, prev_dtype(prevhist, fxnname, state))
+    return fxnhist
+def get_tracked(track, objtype, name):
+    """ Returns the states of the flow/function name to track ('all' or a list) given the track argument, or False if it is not tracked (see init_mdlhist)"""
+    if type(track)!=dict or objtype not in track:   return 'all'
+    elif type(track[objtype])==dict:                return track[objtype].get(name, False)
+    elif name in track[objtype]:                    return 'all'
+    else:                                           return False
+def get_rectimes(mdl, timerange, track=True):
+    """ Returns the times in timerange to record the model history at given the track argument (see init_mdlhist)"""
+    if type(track)!=dict or len(timerange)==0:  return timerange
+    stride = track.get('stride', 1)
+    if stride=='phases':
+        bounds = np.array([t for phasetimes in mdl.phases.values() for t in phasetimes]+[timerange[0], timerange[-1]])
+        return np.array([t for t in timerange if np.any(np.abs(bounds-t)<mdl.tstep/2)])
+    else: 
+        return timerange[::stride]
+def get_recinds(timerange, rectimes, tstep):
+    """ Returns an array of the index in rectimes of each time in timerange (or -1 if the time is not recorded)"""
+    inds = np.minimum(np.searchsorted(rectimes, np.asarray(timerange)-tstep/2), max(len(rectimes)-1, 0))
+    if len(rectimes)==0: return np.full(len(timerange), -1)
+    return np.where(np.abs(np.asarray(rectimes)[inds]-timerange)<tstep/2, inds, -1)
+def prev_dtype(prevhist, name, att):
+    """ Returns the data type of the history of att of the flow/function name in prevhist (or None if not in prevhist)"""
+    if name in prevhist and att in prevhist[name]:  return np.asarray(prevhist[name][att]).dtype
+    else:                                           return None
+def init_faultmodes(mdl):
+    """ Initializes the list of modes of each function used to encode the faults in the history (with 'nom' as bit 0)"""
+    return {fxnname:['nom']+[mode for mode in fxn.faultmodes if mode!='nom'] for fxnname, fxn in mdl.fxns.items()}
+def encode_faults(faults, modes):
+    """ Encodes a set of faults as an int bitmask, where bit i is set if modes[i] is in faults (unlisted faults are appended to modes)"""
+    mask = 0
+    for fault in faults:
+        if fault not in modes: modes.append(fault)
+        mask |= 1 << modes.index(fault)
+    return mask
+def faults_dtype(modes):
+    """ Returns the data type of the fault bitmasks over modes (python ints if they may not fit in int64, see encode_faults)"""
+    if len(modes)<60:   return np.int64
+    else:               return object
+def encode_lanefaults(fxn, modes):
+    """ Encodes the faults of each lane of a function in a model with lanes as an array of int bitmasks (see encode_faults)"""
+    modes.extend([fault for fault in fxn._faultlanes if fault not in modes])
+    mask = np.zeros(fxn._lanes, dtype=faults_dtype(modes))
+    for fault, lanes in fxn._faultlanes.items():
+        mask[lanes] |= 1 << modes.index(fault)
+    return mask
+def init_histrow(hist, name, val, timerange, histrows=False, dtype=None):
+    """ Initializes the history vector of name in hist (or, if histrows is given, adds it to be allocated in a block by init_histblocks)"""
+    if dtype is None:                           dtype = np.array(val).dtype
+    if histrows is False or np.ndim(val)>0:     hist[name] = np.full([len(timerange)], val, dtype=dtype)
+    else:                                       histrows.append((hist, name, val, dtype))
+def init_histblocks(histrows, numtimes):
+    """ Allocates one 2-D block for each data type of the values in histrows and puts its rows in the histories """
+    dtypes = {}
+    for hist, name, val, dtype in histrows:
+        dtypes.setdefault(np.dtype(dtype), []).append((hist, name, val))
+    for dtype, rows in dtypes.items():
+        block = np.empty([len(rows), numtimes], dtype=dtype)
+        block[:] = np.array([[val] for _, _, val in rows], dtype=dtype)
+        for row, (hist, name, _) in enumerate(rows):
+            hist[name] = block[row]
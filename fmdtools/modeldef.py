@@ -7,7 +7,10 @@ Created: October 2019
 Description: A module to simplify model definition
 """
 import numpy as np
+import copy
 import itertools
+from types import MappingProxyType
+from collections import OrderedDict
 import networkx as nx
 from ordered_set import OrderedSet
 
@@ -32,7 +35,17 @@ class Block(object):
                 - dist : (float of % failures due to this fualt)
                 - oppvect : (list of relative probabilities of the fault occuring in each phase)
                 - rcost : cost of repairing the fault
+    _version : int
+        counter incremented whenever a state or the faults of the block change value (used to detect changes in propagation).
+        Note that in-place changes (e.g. self.faults.add(fault) or self.state[0]=value) do not increment the counter, 
+        so they are not detected in propagation, except for faults added/removed in place (which change len(faults)).
+        States and faults should be assigned (self.state=value) and faults changed using the add/remove/replace_fault methods.
+    _lanes : int
+        number of lanes (scenarios simulated at once) of the model the block is in (see Model.init_lanes), or 0 if none
+    _faultlanes : dict
+        (in a model with lanes) bool arrays of the lanes each fault in faults is present in, with structure {fault:lanes}
     """
+    _lanes = 0
     def __init__(self, states={}, timely=True):
         """
         Instance superclass. Called by FxnBlock and Component classes.
@@ -44,8 +57,11 @@ class Block(object):
         timely : bool, optional
             Whether or not the function is dependent on time (or just inputs/outputs). The default is True.
         """
+        self._version=0
+        self._tracked=set(states.keys()).union(['faults'])
+        self._checked=(-1, 0, None)
         self.timely=timely
-        self._states=states.keys()
+        self._states=list(states.keys())
         self._initstates=states.copy()
         self.failrate = getattr(self, 'failrate', 1.0)
         for state in states.keys():
@@ -54,6 +70,22 @@ class Block(object):
         if timely: self.time=0.0
     def __repr__(self):
         return self.name+' '+self.__class__.__name__+' '+self.type+': '+str(self.return_states())
+    def __setattr__(self, name, value):
+        """ Sets the attribute, incrementing _version if a state (or the fault set) changes value """
+        if name in self.__dict__.get('_tracked', ()) and name in self.__dict__ and _changed(self.__dict__[name], value):
+            self.__dict__['_version']+=1
+        object.__setattr__(self, name, value)
+    def _check_change(self):
+        """
+        Checks whether the states or faults of the block have changed value since the last call (used in propagation). 
+        Changes flagged by _version (or the number of faults) are confirmed by comparing the states with the states 
+        at the last call, so the states are only copied if the block was written to.
+        """
+        if self._version==self._checked[0] and len(self.faults)==self._checked[1]: return False
+        states = self.return_states()
+        changed = _changed(states, self._checked[2])
+        self._checked = (self._version, len(self.faults), states)
+        return changed
     def add_he_rate(self,gtp,EPCs={'na':[1,0]}):
         """
         Calculates self.failrate based on a human error probability model.
@@ -110,31 +142,73 @@ class Block(object):
             else:
                 raise Exception("Invalid mode definition")                            
     def has_fault(self,fault): 
-        """Check if the block has fault (a str)"""
+        """Check if the block has fault (a str). In a model with lanes, returns a bool array of the lanes with the fault."""
+        if self._lanes: return self._faultlanes.get(fault, np.zeros(self._lanes, dtype=bool))
         return self.faults.intersection(set([fault]))
     def has_faults(self,faults): 
-        """Check if the block has any in the list of faults"""
+        """Check if the block has any in the list of faults. In a model with lanes, returns a bool array of the lanes with any of the faults."""
+        if self._lanes: return self._anylanes(faults)
         return self.faults.intersection(set(faults))
     def any_faults(self):
-        """check if the block has any fault modes"""
+        """check if the block has any fault modes. In a model with lanes, returns a bool array of the lanes with any fault modes."""
+        if self._lanes: return self._anylanes(self.faults.difference({'nom'}))
         return any(self.faults.difference({'nom'}))
-    def add_fault(self,fault): 
-        """Adds fault (a str) to the block"""
-        self.faults.update([fault])
-    def add_faults(self,faults): 
-        """Adds list of faults to the block"""
-        self.faults.update(faults)
-    def replace_fault(self, fault_to_replace,fault_to_add): 
-        """Replaces fault_to_replace with fault_to_add in the set of faults"""
-        self.faults.add(fault_to_add)
-        self.faults.remove(fault_to_replace)
-    def remove_fault(self, fault_to_remove):
-        """Removes fault in the set of faults"""
-        self.faults.discard(fault_to_remove)
+    def add_fault(self,fault, lanes=None): 
+        """Adds fault (a str) to the block (in the lanes given by a bool array, or if lanes is True, if the model has no lanes)"""
+        if self._lanes: self._set_faultlanes(fault, self.has_fault(fault) | self._lanemask(lanes))
+        elif fault not in self.faults and (lanes is None or lanes):
+            self.faults.add(fault)
+            self._version+=1
+    def add_faults(self,faults, lanes=None): 
+        """Adds list of faults to the block (in the given lanes, see add_fault), or a dict of the lanes to add each fault in {fault:lanes}"""
+        if type(faults)==dict:
+            for fault, faultlanes in faults.items(): self.add_fault(fault, faultlanes)
+        elif self._lanes:
+            for fault in faults: self.add_fault(fault, lanes)
+        elif lanes is None or lanes:
+            numfaults = len(self.faults)
+            self.faults.update(faults)
+            if len(self.faults)!=numfaults: self._version+=1
+    def replace_fault(self, fault_to_replace,fault_to_add, lanes=None): 
+        """Replaces fault_to_replace with fault_to_add in the set of faults (in the given lanes, see add_fault)"""
+        if self._lanes:
+            replaced = self.has_fault(fault_to_replace) & self._lanemask(lanes)
+            self._set_faultlanes(fault_to_replace, self.has_fault(fault_to_replace) & ~replaced)
+            self._set_faultlanes(fault_to_add, self.has_fault(fault_to_add) | replaced)
+        elif lanes is None or lanes:
+            self.faults.add(fault_to_add)
+            self.faults.remove(fault_to_replace)
+            if fault_to_add!=fault_to_replace: self._version+=1
+    def remove_fault(self, fault_to_remove, lanes=None):
+        """Removes fault in the set of faults (in the given lanes, see add_fault)"""
+        if self._lanes: self._set_faultlanes(fault_to_remove, self.has_fault(fault_to_remove) & ~self._lanemask(lanes))
+        elif fault_to_remove in self.faults and (lanes is None or lanes):
+            self.faults.remove(fault_to_remove)
+            self._version+=1
+    def _lanemask(self, lanes):
+        """ Returns a bool array of the given lanes (all lanes if None) """
+        if lanes is None:   return np.ones(self._lanes, dtype=bool)
+        else:               return np.broadcast_to(np.asarray(lanes, dtype=bool), (self._lanes,))
+    def _anylanes(self, faults):
+        """ Returns a bool array of the lanes with any of the given faults """
+        mask = np.zeros(self._lanes, dtype=bool)
+        for fault in faults: mask = mask | self.has_fault(fault)
+        return mask
+    def _set_faultlanes(self, fault, lanes):
+        """ Sets the lanes the fault is present in (in a model with lanes), incrementing _version if they change """
+        if np.array_equal(lanes, self.has_fault(fault)): return
+        if lanes.any():
+            self._faultlanes[fault] = lanes
+            self.faults.add(fault)
+        else:
+            self._faultlanes.pop(fault, None)
+            self.faults.discard(fault)
+        self._version+=1
     def reset(self):            #reset requires flows to be cleared first
         """ Resets the block to the initial state with no faults. Used (only for components) when resetting the model"""
         self.faults.clear()
         self.faults.add('nom')
+        self._version+=1
         for state in self._initstates.keys():
             setattr(self, state,self._initstates[state])
         self.time=0
@@ -147,11 +221,12 @@ class Block(object):
         states : dict
             States (variables) of the block
         faults : set
-            Faults present in the block
+            Faults present in the block (or, in a model with lanes, a dict of the lanes each fault is present in {fault:lanes})
         """
         states={}
         for state in self._states:
             states[state]=getattr(self,state)
+        if self._lanes: return states, dict(self._faultlanes)
         return states, self.faults.copy()
 
 #Function superclass 
@@ -232,12 +307,21 @@ class FxnBlock(Block):
     def behavior(self,time):
         """ Placeholder for function behavior methods """
         return 0        
+    def next_event_time(self, time):
+        """
+        Placeholder for function next_event_time methods, which return the next time (after time) at which the 
+        behavior of the function changes without a change in its states, timers, or flows (e.g. because of a time 
+        threshold in condfaults/behavior). Used in adaptive time-stepping (see Model) to not skip over the time-steps 
+        at which the behavior changes. The default is None (the behavior only changes with its states and flows).
+        """
+        return None
     def reset(self):            
         """
         Resets the internal states and faults of the function to the intial state. Used when reseting the model. Requires associated flows to be cleared first.
         """
         self.faults.clear()
         self.faults.add('nom')
+        self._version+=1
         for state in self._initstates.keys():
             setattr(self, state,self._initstates[state])
         for name, component in self.components.items():
@@ -281,16 +365,16 @@ class FxnBlock(Block):
         time : float, optional
             Model time. The default is 0.
         """
-        self.faults.update(faults)  #if there is a fault, it is instantiated in the function
+        self.add_faults(faults)  #if there is a fault, it is instantiated in the function
         self.condfaults(time)           #conditional faults and behavior are then run
         if self.components:     # propogate faults from function level to component level
             for fault in self.faults:
                 if fault in self.compfaultmodes:
-                    self.components[self.compfaultmodes[fault]].add_fault(fault)
+                    self.components[self.compfaultmodes[fault]].add_fault(fault, self._faultlanes[fault] if self._lanes else None)
         self.behavior(time)
         if self.components:     # propogate faults from component level to function level
             for compname, comp in self.components.items():
-                self.faults.update(comp.faults) 
+                self.add_faults(dict(comp._faultlanes) if comp._lanes else comp.faults) 
         self.time=time
         return
 class GenericFxn(FxnBlock):
@@ -326,6 +410,13 @@ class Component(Block):
 class Flow(object):
     """
     Superclass for flows. Instanced by Model.add_flow but can also be used as a flow superclass if flow attributes are not easily definable as a dict.
+    
+    Attributes
+    ----------
+    _version : int
+        counter incremented whenever an attribute of the flow changes value (used to detect changes in propagation).
+        Note that in-place changes (e.g. self.Dir.traj[0]=value) do not increment the counter and are thus not detected 
+        in propagation--attributes should instead be assigned (e.g. self.Dir.x=value).
     """
     def __init__(self, attributes, name):
         """
@@ -338,14 +429,21 @@ class Flow(object):
         name : str
             name of the flow
         """
+        self._version=0
+        self._tracked=set(attributes.keys())
         self.type='flow'
         self.name=name
         self._initattributes=attributes.copy()
-        self._attributes=attributes.keys()
+        self._attributes=list(attributes.keys())
         for attribute in self._attributes:
             setattr(self, attribute, attributes[attribute])
     def __repr__(self):
         return self.name+' '+self.type+': '+str(self.status())
+    def __setattr__(self, name, value):
+        """ Sets the attribute, incrementing _version if a flow attribute changes value """
+        if name in self.__dict__.get('_tracked', ()) and name in self.__dict__ and _changed(self.__dict__[name], value):
+            self.__dict__['_version']+=1
+        object.__setattr__(self, name, value)
     def reset(self):
         """ Resets the flow to the initial state"""
         for attribute in self._initattributes:
@@ -365,7 +463,7 @@ class Flow(object):
         attributes={}
         for attribute in self._attributes:
             attributes[attribute]=getattr(self,attribute)
-        if self.__class__==Flow:
+        if getattr(self, '_slotbase', self.__class__)==Flow:
             copy = self.__class__(attributes, self.name)
         else:
             copy = self.__class__()
@@ -391,15 +489,29 @@ class Model(object):
     timelyfxns : set
         set of functions that are timely (depend on time, not just input/output)
     bipartite : networkx graph
-        bipartite graph view of the functions and flows
+        bipartite graph view of the functions and flows (shared between copies of the model)
+    multgraph : networkx graph
+        multigraph view of functions and flows (shared between copies of the model)
     graph : networkx graph
-        multigraph view of functions and flows
+        graph view of functions and flows (built when first used)
+    endstates : dict or None
+        End states used to classify scenarios (see classify). If given (in the class or instance), scenarios are 
+        classified by classify (given an EndState with these states) instead of find_classification, so the state graph 
+        and degraded flows are not constructed. Has structure {'flows':{flowname:[atts]}, 'fxns':{fxnname:[states]}, 
+        'hist':{'flows':{flowname:[atts]}, 'fxns':{fxnname:[states]}}}, where 'hist' specifies the history columns to 
+        provide, and lists of names (e.g. 'flows':[flownames]) may be given to include all the states of the objects. 
+        The default is None (scenarios are classified by find_classification).
     """
+    endstates = None
     def __init__(self, params={},modelparams={}):
         """
         Instantiates internal model attributes with predetermined:
             - params (design variables of he model), and
-            - modelparams (dictionary of phases, times, and timestep to run the model with)
+            - modelparams (dictionary of phases, times, and timestep to run the model with, and optionally
+              'statevector':True to store the float states of the model in one array (see init_statevector) and
+              'adaptive':True to skip the time-steps in which the model would not change in simulation, i.e., after
+              a time-step in which no state changed, up to the next fault, phase boundary, or time returned by the 
+              next_event_time methods of the functions (see propagate.prop_one_scen))
         """
         self.type='model'
         self.flows={}
@@ -411,6 +523,8 @@ class Model(object):
         self.times=modelparams.get('times',[1])
         self.tstep = modelparams.get('tstep', 1.0)
         self.units = modelparams.get('units', 'hr')
+        self._use_statevector = modelparams.get('statevector', False)
+        self._adaptive = modelparams.get('adaptive', False)
         
         self.timelyfxns=OrderedSet() #set is ordered and executed in the order specified in the model
         self._fxnflows=[]
@@ -469,34 +583,132 @@ class Model(object):
         return [self.flows[flowname] for flowname in flownames]
     def construct_graph(self, graph_pos={}, bipartite_pos={}):
         """
-        Creates and returns a graph representation of the model
+        Creates and returns the graph representations of the model. The topology of the model (the bipartite graph, 
+        the projected graphs, and the indices of which functions/flows are connected) does not change in simulation, 
+        so it is computed once for each model structure and shared (frozen) between copies of the model (see 
+        get_topology). Copies of the model (see copy) only build the graph view with the flow objects as edge 
+        attributes (graph) when it is first used.
+
+        Parameters
+        ----------
+        graph_pos : dict, optional
+            Positions of the functions to use when plotting the graph. The default is {}.
+        bipartite_pos : dict, optional
+            Positions of the functions and flows to use when plotting the bipartite graph. The default is {}.
 
         Returns
         -------
         graph : networkx graph
-            multgraph representation of the model functions and flows
-        """
-        self.bipartite=nx.Graph()
-        self.bipartite.add_nodes_from(self.fxns, bipartite=0)
-        self.bipartite.add_nodes_from(self.flows, bipartite=1)
-        self.bipartite.add_edges_from(self._fxnflows)
-        self.multgraph = nx.projected_graph(self.bipartite, self.fxns,multigraph=True)
-        self.graph = nx.projected_graph(self.bipartite, self.fxns)
-        attrs={}
-        #do we still need to do this for the objects? maybe not--I don't think we use the info anymore
-        for edge in self.graph.edges:
-            midedges=list(self.multgraph.subgraph(edge).edges)
-            flows= [midedge[2] for midedge in midedges]
-            flowdict={}
-            for flow in flows:
-                flowdict[flow]=self.flows[flow]
-            attrs[edge]=flowdict
-        nx.set_edge_attributes(self.graph, attrs)
-        
-        nx.set_node_attributes(self.graph, self.fxns, 'obj')
+            Graph view of the functions, with the flows between them as edge attributes (see Model.graph)
+        """
+        self._init_topology(graph_pos, bipartite_pos)
+        return self.graph
+    def _init_topology(self, graph_pos={}, bipartite_pos={}):
+        """ Sets up the (shared) topology of the model and its state capture (see construct_graph), without building the graph view """
+        self._topology = get_topology(self.fxns, self.flows, self._fxnflows)
+        self._flowfxns = self._topology['flowfxns'] #index of the functions connected to each flow (used in propagation)
+        self._graph = None
         self.graph_pos=graph_pos
         self.bipartite_pos=bipartite_pos
-        return self.graph
+        if getattr(self, '_use_statevector', False): self.init_statevector()
+        # the initial state is captured when the model is first constructed (see reset)
+        if not hasattr(self, '_initstate'): self._initstate = self._get_objstates()
+        if hasattr(self, '_resetlayout'): del self._resetlayout
+    def _get_objstates(self):
+        """ Returns the states of the flows and functions of the model with structure {'flows':{flow:{att:val}}, 'fxns':{fxn:{att:val}}} (see _objstate)"""
+        return {'flows':{flowname:_objstate(flow) for flowname, flow in self.flows.items()},
+                'fxns':{fxnname:_objstate(fxn) for fxnname, fxn in self.fxns.items()}}
+    def init_statevector(self):
+        """
+        Stores the float attributes of the flows and the float states of the functions and components of the model in 
+        one array (_statevector), so the model state can be copied, compared, and recorded with single array operations.
+        The attributes are then accessed through descriptors (see _VecSlot), so they are still read and set as usual 
+        (e.g. self.EEout.voltage=1.0), but should only be set to numbers, and are always read as (Python) floats. Only 
+        attributes which are initially floats are stored (int, bool, and other numpy scalar types keep their type, 
+        since they are not stored in the state vector). Called by construct_graph if the model is instantiated with 
+        modelparams['statevector']=True.
+        """
+        self._use_statevector = True
+        slots = []
+        for flow in self.flows.values():
+            slots.extend([(flow, att) for att in flow._attributes if _isfloat(getattr(flow, att))])
+        for fxn in self.fxns.values():
+            for block in [fxn, *fxn.components.values()]:
+                slots.extend([(block, state) for state in block._states if _isfloat(getattr(block, state))])
+        self._statevector = np.array([getattr(obj, att) for obj, att in slots], dtype=float)
+        self._slotobjs = [obj for obj, _ in slots]
+        objslots = {}
+        for ind, (obj, att) in enumerate(slots): objslots.setdefault(id(obj), (obj, {}))[1][att] = ind
+        for obj, attinds in objslots.values(): _bind_slots(obj, attinds, self._statevector)
+        if hasattr(self, '_statelayout'): del self._statelayout
+    def init_lanes(self, numlanes):
+        """
+        Gives the model numlanes lanes, so it simulates numlanes scenarios at once (e.g. with different faults, see 
+        propagate.prop_batch). The (numeric, bool, and str) attributes of the flows, states of the functions and 
+        components, and times of the timers are then arrays with one value for each lane, and the faults of each 
+        function/component are kept as bool arrays of the lanes they are present in (see Block.has_fault), while the 
+        other attributes are shared between the lanes. The behaviors of the functions should thus operate on arrays 
+        (e.g. using np.where rather than if statements) and give the lanes to change faults/timers in (e.g. 
+        self.add_fault(fault, lanes=self.In.x>1.0)). Since the functions are run when the flows of any lane change, they 
+        should give the same result when re-run at the same time (e.g. only incrementing timers when time>self.time).
+        A model with lanes cannot be copied, reset, or use the state vector.
+
+        Parameters
+        ----------
+        numlanes : int
+            Number of lanes to give the model
+        """
+        if getattr(self, '_use_statevector', False): raise Exception("Lanes cannot be used in a model with a state vector")
+        self._lanes = numlanes
+        laneatts = [(flow, att) for flow in self.flows.values() for att in flow._attributes]
+        for fxn in self.fxns.values():
+            for block in [fxn, *fxn.components.values()]:
+                laneatts.extend([(block, state) for state in block._states])
+                block._lanes = numlanes
+                block._faultlanes = {fault:np.ones(numlanes, dtype=bool) for fault in block.faults}
+            laneatts.extend([(getattr(fxn, timername), 'time') for timername in fxn.timers])
+        self._laneatts = set()
+        for obj, att in laneatts:
+            val = getattr(obj, att)
+            if isinstance(val, (bool, int, float, str, np.number, np.bool_)) or (isinstance(val, np.ndarray) and val.ndim==0):
+                setattr(obj, att, np.full(numlanes, val, dtype=object if isinstance(val, str) else None))
+                self._laneatts.add((id(obj), att))
+    def get_lanestates(self):
+        """
+        Returns the state (see get_state) of each lane of a model with lanes (see init_lanes), which can be set on a 
+        model without lanes of the same class/params with set_state (e.g. to classify the scenario run in the lane).
+
+        Returns
+        -------
+        lanestates : list
+            States of the model in each lane
+        """
+        layout, state = self.get_statelayout(), self.get_state()
+        lanestates = [list(state) for _ in range(self._lanes)]
+        for ind, (obj, att) in enumerate(layout, 1):
+            if (id(obj), att) in self._laneatts:
+                for lanestate, val in zip(lanestates, state[ind].tolist()):     lanestate[ind] = val
+            elif att=='faults' and isinstance(obj, Block):
+                for lane, lanestate in enumerate(lanestates):                   
+                    lanestate[ind] = {fault for fault, lanes in obj._faultlanes.items() if lanes[lane]}
+        return lanestates
+    @property
+    def bipartite(self):
+        """ Bipartite graph view of the functions and flows (frozen, since it is shared between copies of the model) """
+        return self._topology['bipartite']
+    @property
+    def multgraph(self):
+        """ Multigraph view of the functions and flows (frozen, since it is shared between copies of the model) """
+        return self._topology['multgraph']
+    @property
+    def graph(self):
+        """ Graph view of the functions, with the flows between them (dicts of flow objects) as edge attributes """
+        if self._graph is None:
+            self._graph = self._topology['graph'].copy()
+            edgeattrs = {edge:{flow:self.flows[flow] for flow in flows} for edge, flows in self._topology['edgeflows'].items()}
+            nx.set_edge_attributes(self._graph, edgeattrs)
+            nx.set_node_attributes(self._graph, self.fxns, 'obj')
+        return self._graph
     def return_paramgraph(self):
         """ Returns a graph representation of the flows in the model, where flows are nodes and edges are 
         associations in functions """
@@ -520,7 +732,7 @@ class Model(object):
         g.add_nodes_from(self.fxns[fxnname].components, bipartite=1)
         g.add_edges_from([(fxnname, component) for component in self.fxns[fxnname].components])        
         return g
-    def return_stategraph(self, gtype='normal'):
+    def return_stategraph(self, gtype='normal', lazy=False):
         """
         Returns a graph representation of the current state of the model.
 
@@ -528,56 +740,18 @@ class Model(object):
         ----------
         gtype : str, optional
             Type of graph to return (normal, bipartite, or component). The default is 'normal'.
+        lazy : bool, optional
+            Whether to return a StateGraph, which captures the current state of the model but only constructs the 
+            networkx graph when it is used. The default is False.
 
         Returns
         -------
         graph : networkx graph
             Graph representation of the system with the modes and states added as attributes.
         """
-        if gtype=='normal':
-            graph=nx.projected_graph(self.bipartite, self.fxns)
-        elif gtype=='bipartite':
-            graph=self.bipartite.copy()
-        elif gtype=='component':
-            graph=self.bipartite.copy()
-            for fxnname, fxn in self.fxns.items():
-                graph.add_nodes_from(fxn.components, bipartite=1)
-                graph.add_edges_from([(fxnname, component) for component in fxn.components])     
-        edgevals, fxnmodes, fxnstates, flowstates, compmodes, compstates, comptypes ={}, {}, {}, {}, {}, {}, {}
-        if gtype=='normal': #set edge values for normal graph
-            for edge in graph.edges:
-                midedges=list(self.multgraph.subgraph(edge).edges)
-                flows= [midedge[2] for midedge in midedges]
-                flowdict={}
-                for flow in flows: 
-                    flowdict[flow]=self.flows[flow].status()
-                edgevals[edge]=flowdict
-            nx.set_edge_attributes(graph, edgevals) 
-        elif gtype=='bipartite' or gtype=='component': #set flow node values for bipartite graph
-            for flowname, flow in self.flows.items():
-                flowstates[flowname]=flow.status()
-            nx.set_node_attributes(graph, flowstates, 'states')
-        #set node values for functions
-        for fxnname, fxn in self.fxns.items():
-            fxnstates[fxnname], fxnmodes[fxnname] = fxn.return_states()
-            if gtype=='normal': del graph.nodes[fxnname]['bipartite']
-            if gtype=='component':
-                for mode in fxnmodes[fxnname].copy():
-                    for compname, comp in fxn.components.items():
-                        compstates[compname]={}
-                        comptypes[compname]=True
-                        if mode in comp.faultmodes:
-                            compmodes[compname]=compmodes.get(compname, set())
-                            compmodes[compname].update([mode])
-                            fxnmodes[fxnname].remove(mode)
-                            fxnmodes[fxnname].update(['Comp_Fault'])
-        nx.set_node_attributes(graph, fxnstates, 'states')
-        nx.set_node_attributes(graph, fxnmodes, 'modes')
-        if gtype=='component': 
-            nx.set_node_attributes(graph,compstates, 'states')
-            nx.set_node_attributes(graph, compmodes, 'modes') 
-            nx.set_node_attributes(graph, comptypes, 'iscomponent')
-        return graph
+        stategraph = StateGraph(self, gtype)
+        if lazy:    return stategraph
+        else:       return stategraph.graph
     def return_faultmodes(self):
         """
         Returns faultmodes present in the model
@@ -617,17 +791,311 @@ class Model(object):
             flows = copy.get_flows(flownames)
             if fparams=='None':     copy.fxns[fxnname]=fxn.copy(flows)
             else:                   copy.fxns[fxnname]=fxn.copy(flows, fparams)
-        _ = copy.construct_graph(graph_pos=self.graph_pos, bipartite_pos=self.bipartite_pos)
+        copy._use_statevector = getattr(self, '_use_statevector', False)
+        copy._adaptive = getattr(self, '_adaptive', False)
+        copy._init_topology(graph_pos=self.graph_pos, bipartite_pos=self.bipartite_pos)
         return copy
+    def get_state(self):
+        """
+        Returns a snapshot of the current state of the model, which can be restored onto the model (or onto another
+        instance of the same class/params) using set_state. Faster than copying the model, since no new model is built.
+
+        Returns
+        -------
+        state : list
+            Flat list of the keys of the attributes in the model's state layout (see get_statelayout), followed by the
+            values of the attributes of the flows and functions (including states, faults, times, timers, and 
+            components) in the order of the layout and a copy of the model's state vector (if used, see init_statevector)
+        """
+        layout = self.get_statelayout()
+        state = [self._statekeys]
+        state.extend([_copyval(getattr(obj, att)) for obj, att in layout])
+        if getattr(self, '_use_statevector', False): state.append(self._statevector.copy())
+        return state
+    def set_state(self, state):
+        """
+        Sets the model to a state captured by get_state (in place, so the flows and functions are not re-instantiated).
+
+        Parameters
+        ----------
+        state : list
+            State of the model returned by get_state
+        """
+        layout = self.get_statelayout()
+        keys, values = state[0], state[1:]
+        if getattr(self, '_use_statevector', False): 
+            values, vector = values[:-1], values[-1]
+            changed = ~((self._statevector==vector) | (np.isnan(self._statevector) & np.isnan(vector))) # (NaN is unchanged by NaN)
+            for ind in np.flatnonzero(changed): self._slotobjs[ind]._version+=1
+            self._statevector[:] = vector
+        if keys is not self._statekeys:
+            # states captured with a different layout (e.g. in another instance) are set by key
+            if keys==self._statekeys:   self._statekeys = keys
+            else:                       return self._set_state_bykey(keys, values)
+        for (obj, att), val in zip(layout, values):
+            setattr(obj, att, _copyval(val))
+    def _set_state_bykey(self, keys, values):
+        """ Sets the model to a state with the given keys/values, removing attributes which are not in the state """
+        layout = dict(zip(self._statekeys, self._statelayout))
+        for key in set(layout).difference(keys): delattr(*layout[key])
+        for (path, att), val in zip(keys, values):
+            obj = getattr(self, path[0])[path[1]]
+            for step in path[2:]:
+                if type(step)==tuple:   obj = getattr(obj, step[0])[step[1]]
+                else:                   obj = getattr(obj, step)
+            setattr(obj, att, _copyval(val))
+        del self._statelayout # (recompiled when next used)
+    def get_spec(self):
+        """
+        Returns a compact, versioned specification of the model and its current state, from which an identical model 
+        can be rebuilt using model_from_spec (used to pickle the model, e.g. to send it to worker processes). Models of 
+        a Model subclass are rebuilt by instantiating the class with the params, while instances of Model itself are 
+        rebuilt from the flow and function definitions given to add_flow/add_fxn.
+
+        Returns
+        -------
+        spec : dict
+            Specification of the model with structure {'version', 'class', 'params', 'graph_pos', 'bipartite_pos', 
+            'state':{'flows':{flow:{att:val}}, 'fxns':{fxn:{att:val}}}}, and, for instances of Model, 'modelparams',
+            'flows':{flow:(flowclass, attributes)}, 'fxns':{fxn:(fxnclass, flownames, fparams)} and 'fxnorder'
+        """
+        spec = {'version':_specversion, 'class':type(self), 'params':getattr(self, 'params', {}), 
+                'graph_pos':getattr(self, 'graph_pos', {}), 'bipartite_pos':getattr(self, 'bipartite_pos', {}),
+                'state':self._get_objstates()}
+        if type(self)==Model:
+            spec['modelparams'] = {'phases':self.phases, 'times':self.times, 'tstep':self.tstep, 'units':self.units, 
+                                   'statevector':getattr(self, '_use_statevector', False), 'adaptive':getattr(self, '_adaptive', False)}
+            spec['flows'] = {flowname:(_baseclass(flow), flow._initattributes) for flowname, flow in self.flows.items()}
+            spec['fxns'] = {fxnname:(_baseclass(self.fxns[fxnname]), fxninput['flows'], fxninput['fparams']) 
+                            for fxnname, fxninput in self._fxninput.items()}
+            spec['fxnorder'] = list(self.timelyfxns)
+        return spec
+    def __reduce__(self):
+        """ Pickles the model using its specification (see get_spec) """
+        return (model_from_spec, (self.get_spec(),))
+    def get_statelayout(self):
+        """
+        Returns the list of the (object, attribute) pairs of the model captured by get_state. The layout includes all the 
+        non-private attributes of the flows, functions, components, and timers except for labels, fault modes, 
+        associated flows, and attributes stored in the state vector. It is compiled on the first call (and when the 
+        attributes are changed by set_state/reset), so attributes added to the model afterward are not included.
+        The keys of the attributes (used to set states captured with other layouts) are kept in _statekeys.
+        """
+        if not hasattr(self, '_statelayout'):
+            atts = [att for flowname, flow in self.flows.items() for att in _stateatts(flow, ('flows', flowname))]
+            atts.extend([att for fxnname, fxn in self.fxns.items() for att in _stateatts(fxn, ('fxns', fxnname))])
+            self._statelayout = [(obj, att) for obj, att, _ in atts]
+            self._statekeys = tuple(key for _, _, key in atts)
+        return self._statelayout
     def reset(self):
-        """Resets the model to the initial state (with no faults, etc)"""
-        for flowname, flow in self.flows.items():
-            flow.reset()
-        for fxnname, fxn in self.fxns.items():
-            fxn.reset()
+        """
+        Resets the model to the initial state (with no faults, etc). If the state of the model was captured when it was
+        constructed (see construct_graph), the attributes of the flows and functions are set to this state in bulk, 
+        so the model is in the same state as a new instance (without running the behaviors of the functions), and
+        attributes added to the flows and functions since they were constructed are removed. Otherwise, each flow 
+        and function is reset (see FxnBlock.reset).
+        """
+        if hasattr(self, '_initstate'):
+            if not hasattr(self, '_resetlayout'):
+                items = [item for objtype, objs in [('flows', self.flows), ('fxns', self.fxns)] 
+                         for name, obj in objs.items() for item in _objstate_items(obj, self._initstate[objtype][name])]
+                objatts = {}
+                for obj, att, _ in items: objatts.setdefault(id(obj), (obj, set()))[1].add(att)
+                self._resetlayout = (items, list(objatts.values()))
+            items, objatts = self._resetlayout
+            for obj, atts in objatts:
+                added = [att for att in _stateatts_of(obj) if att not in atts]
+                for att in added: delattr(obj, att)
+                if added and hasattr(self, '_statelayout'): del self._statelayout
+            for obj, att, val in items: setattr(obj, att, _copyval(val))
+        else:
+            for flowname, flow in self.flows.items():
+                flow.reset()
+            for fxnname, fxn in self.fxns.items():
+                fxn.reset()
     def find_classification(self,resgraph, endfaults, endflows, scen, mdlhists):
         """Placeholder for model find_classification methods (for running nominal models)"""
         return {'rate':scen['properties']['rate'], 'cost': 1, 'expected cost': 1}
+    def classify(self, endstate, scen):
+        """
+        Placeholder for model classify methods, which classify scenarios given the states declared in endstates.
+
+        Parameters
+        ----------
+        endstate : EndState
+            Read-only view of the end state of the model (and the history columns) declared in endstates
+        scen : dict
+            The fault scenario. Has structure: {'faults':{fxn:fault}, 'properties':{rate, time, name, etc}}
+
+        Returns
+        -------
+        endclass : dict
+            Classification of the scenario (e.g. with 'rate', 'cost', and 'expected cost')
+        """
+        return {'rate':scen['properties']['rate'], 'cost': 1, 'expected cost': 1}
+
+_specversion = 1 # version of the model specification given by Model.get_spec
+def model_from_spec(spec):
+    """
+    Rebuilds a model from a specification given by Model.get_spec.
+
+    Parameters
+    ----------
+    spec : dict
+        Specification of the model (see Model.get_spec)
+
+    Returns
+    -------
+    mdl : Model
+        Model with the structure, parameters, and state given in the specification
+    """
+    if spec.get('version')!=_specversion:
+        raise Exception("Invalid model spec version: "+str(spec.get('version'))+". Only version "+str(_specversion)+" is supported.")
+    if 'flows' in spec:
+        mdl = spec['class'](params=spec['params'], modelparams=spec['modelparams'])
+        for flowname, (flowclass, attributes) in spec['flows'].items():
+            if flowclass==Flow:     mdl.add_flow(flowname, attributes)
+            else:                   mdl.add_flow(flowname, flowclass())
+        for fxnname, (fclass, flownames, fparams) in spec['fxns'].items():
+            mdl.add_fxn(fxnname, flownames, fclass=fclass, fparams=fparams)
+        mdl.set_fxnorder(spec['fxnorder'])
+        mdl._init_topology()
+    else:
+        mdl = spec['class'](params=spec['params'])
+    mdl.graph_pos, mdl.bipartite_pos = spec['graph_pos'], spec['bipartite_pos']
+    for flowname, state in spec['state']['flows'].items():  _set_objstate(mdl.flows[flowname], state)
+    for fxnname, state in spec['state']['fxns'].items():    _set_objstate(mdl.fxns[fxnname], state)
+    return mdl
+
+class StateGraph(object):
+    """
+    Representation of the state of a model (see Model.return_stategraph) which only constructs the corresponding 
+    networkx graph when it is used (e.g., in find_classification or to display results). Attributes and methods of
+    the graph (e.g. nodes, edges) may be accessed directly from the StateGraph.
+    
+    Attributes
+    ----------
+    gtype : str
+        Type of graph (normal, bipartite, or component)
+    flowstates : dict
+        States of the flows with structure {flowname:{state:value}}. For normal graphs, only includes the flows 
+        on the edges of the graph (i.e. between functions).
+    fxnstates : dict
+        States of the functions with structure {fxnname:{state:value}}
+    fxnmodes : dict
+        Fault modes present in the functions with structure {fxnname:{modes}}
+    """
+    def __init__(self, mdl, gtype='normal'):
+        """
+        Parameters
+        ----------
+        mdl : Model
+            Model to capture the state of
+        gtype : str, optional
+            Type of graph to represent (normal, bipartite, or component). The default is 'normal'.
+        """
+        self.gtype = gtype
+        self._topology = mdl._topology
+        if gtype=='normal':     self.flowstates = {flowname:mdl.flows[flowname].status() for flowname in self._topology['edgeflownames']}
+        else:                   self.flowstates = {flowname:flow.status() for flowname, flow in mdl.flows.items()}
+        self.fxnstates, self.fxnmodes = {}, {}
+        for fxnname, fxn in mdl.fxns.items():
+            self.fxnstates[fxnname], self.fxnmodes[fxnname] = fxn.return_states()
+        if gtype=='component':  self._compmodes = {fxnname:{compname:comp.faultmodes for compname, comp in fxn.components.items()} for fxnname, fxn in mdl.fxns.items()}
+        self._graph = None
+    @property
+    def graph(self):
+        """ networkx graph of the state (constructed on first use) """
+        if self._graph is None: self._graph = self.construct_graph()
+        return self._graph
+    def construct_graph(self):
+        """ Constructs the networkx graph of the state, with the modes and states added as attributes. """
+        if self.gtype=='normal':
+            graph = nx.Graph(self._topology['graph'])
+            edgevals = {edge:{flowname:self.flowstates[flowname].copy() for flowname in flownames} for edge, flownames in self._topology['edgeflows'].items()}
+            nx.set_edge_attributes(graph, edgevals)
+            for fxnname in graph.nodes: del graph.nodes[fxnname]['bipartite']
+        else:
+            graph = nx.Graph(self._topology['bipartite'])
+            if self.gtype=='component':
+                for fxnname, comps in self._compmodes.items():
+                    graph.add_nodes_from(comps, bipartite=1)
+                    graph.add_edges_from([(fxnname, compname) for compname in comps])
+            nx.set_node_attributes(graph, {flowname:states.copy() for flowname, states in self.flowstates.items()}, 'states')
+        fxnmodes = {fxnname:modes.copy() for fxnname, modes in self.fxnmodes.items()}
+        if self.gtype=='component':
+            compmodes, compstates, comptypes = {}, {}, {}
+            for fxnname, comps in self._compmodes.items():
+                for mode in fxnmodes[fxnname].copy():
+                    for compname, faultmodes in comps.items():
+                        compstates[compname]={}
+                        comptypes[compname]=True
+                        if mode in faultmodes:
+                            compmodes[compname]=compmodes.get(compname, set())
+                            compmodes[compname].update([mode])
+                            fxnmodes[fxnname].remove(mode)
+                            fxnmodes[fxnname].update(['Comp_Fault'])
+        nx.set_node_attributes(graph, {fxnname:states.copy() for fxnname, states in self.fxnstates.items()}, 'states')
+        nx.set_node_attributes(graph, fxnmodes, 'modes')
+        if self.gtype=='component': 
+            nx.set_node_attributes(graph, compstates, 'states')
+            nx.set_node_attributes(graph, compmodes, 'modes') 
+            nx.set_node_attributes(graph, comptypes, 'iscomponent')
+        return graph
+    def __getattr__(self, att):
+        if att.startswith('_') or att=='graph': raise AttributeError(att)
+        return getattr(self.graph, att)
+    def __iter__(self):             return iter(self.graph)
+    def __len__(self):              return len(self.graph)
+    def __contains__(self, node):   return node in self.graph
+    def __getitem__(self, node):    return self.graph[node]
+
+class EndState(object):
+    """
+    Read-only view of the end state of a model in a scenario with the states declared in Model.endstates, given to
+    Model.classify.
+
+    Attributes
+    ----------
+    flows : mapping
+        Declared flow states, with structure {flowname:{att:value}}
+    fxns : mapping
+        Declared function states, with structure {fxnname:{state:value}}
+    faults : mapping
+        Fault modes present in the model, with structure {fxnname:[modes]} (see Model.return_faultmodes)
+    faultprops : mapping
+        Properties of the fault modes present, with structure {fxnname:{mode:properties}}
+    hists : mapping
+        Declared history columns in the nominal and faulty histories, with structure 
+        {'nominal'/'faulty':{'flows'/'functions':{name:{att:array}}, 'time':array}}
+    """
+    def __init__(self, mdl, mdlhists, endstates):
+        """
+        Parameters
+        ----------
+        mdl : Model
+            Model at the end of the scenario
+        mdlhists : dict
+            Histories of the model in the nominal and faulty scenarios, with structure {'nominal':mdlhist, 'faulty':mdlhist}
+        endstates : dict
+            End states/history columns to include (see Model.endstates)
+        """
+        self.flows = _readonly({flowname:{att:_copyval(getattr(mdl.flows[flowname], att)) for att in atts}
+                                for flowname, atts in _declared(endstates.get('flows', {}), mdl.flows, '_attributes')})
+        self.fxns = _readonly({fxnname:{state:_copyval(getattr(mdl.fxns[fxnname], state)) for state in states}
+                               for fxnname, states in _declared(endstates.get('fxns', {}), mdl.fxns, '_states')})
+        faults, faultprops = mdl.return_faultmodes()
+        self.faults, self.faultprops = _readonly(faults), _readonly(faultprops)
+        histspec, hists = endstates.get('hist', {}), {}
+        for histname, mdlhist in mdlhists.items():
+            hists[histname] = {'time':_readonly(mdlhist['time'])}
+            for objtype, histtype, objs, statelist in [('flows', 'flows', mdl.flows, '_attributes'), ('fxns', 'functions', mdl.fxns, '_states')]:
+                hists[histname][histtype] = {name:{att:_readonly(mdlhist[histtype][name][att]) for att in atts}
+                                             for name, atts in _declared(histspec.get(objtype, {}), objs, statelist)}
+        self.hists = _readonly(hists)
+    def __setattr__(self, att, val):
+        if hasattr(self, att): raise AttributeError("EndState is read-only")
+        super().__setattr__(att, val)
 
 class Timer():
     """class for model timers used in functions (e.g. for conditional faults) """
@@ -637,12 +1105,14 @@ class Timer():
     def t(self):
         """ Returns the time elapsed """
         return self.time
-    def inc(self, tstep):
-        """ Increments the time elapsed by tstep"""
-        self.time+=tstep
-    def reset(self):
-        """ Resets the time to zero"""
-        self.time=0
+    def inc(self, tstep, lanes=None):
+        """ Increments the time elapsed by tstep (in the lanes given by a bool array, or if lanes is True, if the model has no lanes)"""
+        if np.ndim(lanes)>0:            self.time = np.where(lanes, self.time+tstep, self.time)
+        elif lanes is None or lanes:    self.time+=tstep
+    def reset(self, lanes=None):
+        """ Resets the time to zero (in the given lanes, see inc)"""
+        if np.ndim(lanes)>0:            self.time = np.where(lanes, 0, self.time)
+        elif lanes is None or lanes:    self.time=0
 
 class SampleApproach():
     """
@@ -996,6 +1466,157 @@ class SampleApproach():
         return {(fxn, mode): sum(self.rates[fxn,mode].values()) for (fxn, mode) in self.rates.keys()}
         
     
+def _changed(old, new):
+    """ Checks whether a value has changed (with the same semantics as comparing dicts of states, i.e. identical values are unchanged)"""
+    if old is new: return False
+    try:                return not (old == new)
+    except ValueError:  # arrays (or dicts/tuples of arrays, e.g. the states of blocks in a model with lanes)
+        if isinstance(old, dict) and isinstance(new, dict):     
+            return old.keys()!=new.keys() or any(_changed(val, new[key]) for key, val in old.items())
+        elif isinstance(old, tuple) and isinstance(new, tuple): 
+            return len(old)!=len(new) or any(_changed(val1, val2) for val1, val2 in zip(old, new))
+        return not np.array_equal(old, new)
+    
+_topologies = OrderedDict() # topologies of the model structures constructed most recently (see get_topology)
+_maxtopologies = 64 # maximum number of topologies kept in _topologies (the least recently used are removed)
+def get_topology(fxns, flows, fxnflows):
+    """
+    Returns the (frozen) topology of a model with the given functions, flows, and (function, flow) connections. 
+    Topologies are cached, so models with the same structure (e.g. copies of a model) share the same topology. 
+    Only the _maxtopologies most recently used topologies are kept in the cache (models keep their own topology).
+
+    Returns
+    -------
+    topology : dict
+        Dict with structure {'bipartite':bipartite graph, 'multgraph': projected multigraph, 'graph':projected graph
+        (without attributes), 'edgeflows':{edge:(flows)} of the flows between the functions on each edge of graph, 
+        'edgeflownames':(flows) on the edges of graph (in order), 'flowfxns':{flow:(fxns)} of the functions connected to each flow}
+    """
+    key = (tuple(fxns), tuple(flows), tuple(fxnflows))
+    if key in _topologies:
+        _topologies.move_to_end(key)
+    else:
+        bipartite=nx.Graph()
+        bipartite.add_nodes_from(fxns, bipartite=0)
+        bipartite.add_nodes_from(flows, bipartite=1)
+        bipartite.add_edges_from(fxnflows)
+        multgraph = nx.projected_graph(bipartite, fxns, multigraph=True)
+        graph = nx.projected_graph(bipartite, fxns)
+        edgeflows = {edge: tuple(midedge[2] for midedge in multgraph.subgraph(edge).edges) for edge in graph.edges}
+        flowfxns = {flowname:[] for flowname in flows}
+        for fxnname, flowname in fxnflows: flowfxns[flowname].append(fxnname)
+        flowfxns = {flowname:tuple(fxnnames) for flowname, fxnnames in flowfxns.items()}
+        _topologies[key] = {'bipartite':nx.freeze(bipartite), 'multgraph':nx.freeze(multgraph), 'graph':nx.freeze(graph),
+                            'edgeflows':edgeflows, 'flowfxns':flowfxns,
+                            'edgeflownames':tuple(dict.fromkeys(f for flownames in edgeflows.values() for f in flownames))}
+        if len(_topologies)>_maxtopologies: _topologies.popitem(last=False)
+    return _topologies[key]
+
+class _VecSlot(object):
+    """
+    Descriptor of a float attribute stored in the state vector of a model (see Model.init_statevector), which is read
+    as a float. Objects that are not bound to a state vector (e.g. while being instantiated in a copy) store the 
+    attribute in their __dict__.
+    """
+    def __init__(self, att):
+        self.att = att
+    def __get__(self, obj, objtype=None):
+        if obj is None: return self
+        slots = obj.__dict__.get('_slots')
+        if slots and self.att in slots:     return float(obj.__dict__['_vec'][slots[self.att]])
+        try:                                return obj.__dict__[self.att]
+        except KeyError:                    raise AttributeError(self.att)
+    def __set__(self, obj, value):
+        slots = obj.__dict__.get('_slots')
+        if slots and self.att in slots:
+            vec, ind = obj.__dict__['_vec'], slots[self.att]
+            old = vec[ind]
+            if not (old==value or (old!=old and value!=value)): obj.__dict__['_version']+=1 # (NaN is unchanged by NaN)
+            vec[ind] = value
+        else: obj.__dict__[self.att] = value
+_slotclasses = {}
+def _slotclass(base, atts):
+    """ Returns a subclass of base with the attributes atts stored in the state vector (see _VecSlot) """
+    key = (base, tuple(sorted(atts)))
+    if key not in _slotclasses:
+        namespace = {att:_VecSlot(att) for att in atts}
+        namespace.update({'_slotbase':base, '__module__':base.__module__, '__qualname__':base.__qualname__,
+                          '__reduce__':lambda self: (_new_slotobj, (base, key[1]), self.__dict__.copy())})
+        _slotclasses[key] = type(base.__name__, (base,), namespace)
+    return _slotclasses[key]
+def _new_slotobj(base, atts):
+    """ Instantiates an (empty) object with attributes stored in the state vector (used when unpickling) """
+    return object.__new__(_slotclass(base, atts))
+def _bind_slots(obj, slots, vec):
+    """ Stores the attributes of a flow/block in the state vector vec, given a dict of their indices {att:ind} """
+    obj.__class__ = _slotclass(_baseclass(obj), slots)
+    for att in slots: obj.__dict__.pop(att, None)
+    obj.__dict__['_vec'] = vec
+    obj.__dict__['_slots'] = slots
+def _isfloat(val):
+    """ Checks whether a value can be stored in the state vector (i.e., is a float, so it is read back with the same type) """
+    return isinstance(val, float)
+
+_nonstate_atts = ['name', 'type', 'flows', 'faultmodes', 'compfaultmodes']
+def _stateatts(obj, path):
+    """ 
+    Returns the (object, attribute, key) of the state of a flow, block, or timer (recursing into components and timers),
+    where the key is (path, attribute) and path is the path to the object from the model (e.g. ('fxns', fxnname, timername))
+    """
+    atts = []
+    for att, val in vars(obj).items():
+        if att.startswith('_') or att in _nonstate_atts or isinstance(val, Flow): continue
+        elif isinstance(val, (Block, Timer)):   atts.extend(_stateatts(val, path+(att,)))
+        elif att=='components':                 atts.extend([a for cname, comp in val.items() for a in _stateatts(comp, path+(('components', cname),))])
+        else:                                   atts.append((obj, att, (path, att)))
+    return atts
+def _objstate(obj):
+    """ Returns a dict of the state of a flow, block, or timer (including the attributes in the state vector) """
+    state = {}
+    for att, val in vars(obj).items():
+        if att.startswith('_') or att in _nonstate_atts or isinstance(val, Flow): continue
+        elif isinstance(val, (Block, Timer)):   state[att] = _objstate(val)
+        elif att=='components':                 state[att] = {compname:_objstate(comp) for compname, comp in val.items()}
+        else:                                   state[att] = _copyval(val)
+    for att in vars(obj).get('_slots', {}):     state[att] = getattr(obj, att)
+    return state
+def _set_objstate(obj, state):
+    """ Sets the state of a flow, block, or timer to a state given by _objstate """
+    for obj, att, val in _objstate_items(obj, state): setattr(obj, att, _copyval(val))
+def _objstate_items(obj, state):
+    """ Returns a list of the (object, attribute, value) to set to set an object to a state given by _objstate """
+    items = []
+    for att, val in state.items():
+        if isinstance(getattr(obj, att, None), (Block, Timer)): items.extend(_objstate_items(getattr(obj, att), val))
+        elif att=='components':     
+            for compname, compstate in val.items():             items.extend(_objstate_items(obj.components[compname], compstate))
+        else:                                                   items.append((obj, att, val))
+    return items
+def _baseclass(obj):
+    """ Returns the class of a flow/block (rather than the subclass used to store attributes in the state vector) """
+    return getattr(type(obj), '_slotbase', type(obj))
+def _stateatts_of(obj):
+    """ Returns the names of the attributes of a flow/block/timer which are part of its state (see _objstate) """
+    return [att for att, val in vars(obj).items() if not att.startswith('_') and att not in _nonstate_atts 
+            and not isinstance(val, (Flow, Block, Timer)) and att!='components']
+def _declared(spec, objs, statelist):
+    """ Returns the (name, states) of the objects declared in an endstates spec (a list of names or dict {name:[states]})"""
+    if type(spec)==dict:    return [(name, states) for name, states in spec.items()]
+    else:                   return [(name, getattr(objs[name], statelist)) for name in spec]
+def _readonly(val):
+    """ Returns a read-only view of a nested structure of dicts and arrays """
+    if type(val)==dict:
+        return MappingProxyType({k:_readonly(v) for k, v in val.items()})
+    elif isinstance(val, np.ndarray):
+        val = val.view()
+        val.flags.writeable = False
+    return val
+def _copyval(val):
+    """ Copies a state value (without deepcopying immutable values) """
+    if val is None or isinstance(val, (int, float, str, np.number)):  return val
+    elif isinstance(val, (set, np.ndarray)):                            return val.copy()
+    else:                                                               return copy.deepcopy(val)
+    
 def phases(times, names=[]):
     """ Creates named phases from a set of times defining the edges of hte intervals """
     if not names: names = range(len(times)-1)
@@ -10,7 +10,11 @@ Uses methods:
     - hist:                     Compares model history with the nominal model history over time to make a history of degradation.
         - fxnhist:              Compares the history of function states in mdlhist over time.
         - flowhist:             Compares the history of flow states in mdlhist over time.
+    - decode_faults:            Decodes the fault history (int bitmasks) of a function in a model history into sets of fault names
+    - num_faults:               Returns the number of faults present in a function at each time in a model history
+    - has_fault:                Returns whether a function has a given fault at each time in a model history
     - graphflows:               Extracts non-nominal flows by comparing the a results graph with a nominal results graph.
+    - get_flowstates:           Returns the states of the flows in a results graph
     - resultsgraph:        Makes a dict history of results graphs given a dict history of the nominal and faulty graphs
     - resultsgraphs:       Makes a dict history of results graphs given a dict history of the nominal and faulty graphs
 
@@ -117,7 +121,7 @@ def fxnhist(mdlhist, returndiff=True):
     diff = {}
     for fxnname in mdlhist['nominal']['functions']:
         fhist = copy.copy(mdlhist['faulty']['functions'][fxnname])
-        del fhist['faults']
+        fhist.pop('faults', None) # faults may not be tracked (see propagate.init_mdlhist)
         fxnshist[fxnname] = {}
         diff[fxnname]={}
         for state in fhist:
@@ -126,10 +130,11 @@ def fxnhist(mdlhist, returndiff=True):
             fxnshist[fxnname][state] = 1* (faulty == nominal)
             diff[fxnname][state] = nominal - faulty
         if fxnshist[fxnname]: status = np.prod(np.array(list(fxnshist[fxnname].values())), axis = 0) 
-        else: status = np.ones(len(mdlhist['faulty']['functions'][fxnname]['faults']), dtype=int) #should empty be given 1 or nothing?
-        fxnshist[fxnname]['faults']=mdlhist['faulty']['functions'][fxnname]['faults']
-        faults = mdlhist['faulty']['functions'][fxnname]['faults']
-        fxnshist[fxnname]['numfaults']=np.array(list(map(lambda f: len(f.difference(['nom'])), faults)))
+        else: status = np.ones(len(mdlhist['faulty']['time']), dtype=int) #should empty be given 1 or nothing?
+        if 'faults' in mdlhist['faulty']['functions'][fxnname]:
+            fxnshist[fxnname]['faults']=decode_faults(mdlhist['faulty'], fxnname)
+            fxnshist[fxnname]['numfaults']=num_faults(mdlhist['faulty'], fxnname)
+        else: fxnshist[fxnname]['numfaults']=np.zeros(len(mdlhist['faulty']['time']), dtype=int)
         faulty = 1 - 1*(fxnshist[fxnname]['numfaults']>0)
         fxnshist[fxnname]['status'] = status*faulty
         faulthist[fxnname]=fxnshist[fxnname]['numfaults']
@@ -138,15 +143,53 @@ def fxnhist(mdlhist, returndiff=True):
     numfaults = np.sum(np.array(list(faulthist.values())), axis=0)
     numdegfxns   = len(deghist) - np.sum(np.array(list(deghist.values())), axis=0)
     return fxnshist, numfaults, degfxns, numdegfxns, diff
+def decode_faults(mdlhist, fxnname, t_ind=None):
+    """
+    Decodes the fault history of a function in a model history (which is recorded as an int bitmask 
+    over the modes in mdlhist['faultmodes'][fxnname]) into sets of fault names.
+
+    Parameters
+    ----------
+    mdlhist : dict
+        History of model states for a single scenario
+    fxnname : str
+        Name of the function
+    t_ind : int, optional
+        Index of the time to decode the faults at. The default is None (faults are decoded at every time).
+
+    Returns
+    -------
+    faults : list or set
+        List of the sets of faults present in the function at each time (or the set of faults at t_ind)
+    """
+    modes = mdlhist['faultmodes'][fxnname]
+    masks = mdlhist['functions'][fxnname]['faults']
+    decode = lambda mask: {mode for i, mode in enumerate(modes) if (int(mask)>>i)&1}
+    if t_ind is None:   return [decode(mask) for mask in masks]
+    else:               return decode(masks[t_ind])
+def num_faults(mdlhist, fxnname):
+    """ Returns an array of the number of faults (not counting 'nom') present in a function at each time in mdlhist """
+    modes = mdlhist['faultmodes'][fxnname]
+    masks = mdlhist['functions'][fxnname]['faults']
+    numfaults = np.zeros(len(masks), dtype=int)
+    for i, mode in enumerate(modes):
+        if mode!='nom': numfaults += ((masks>>i)&1).astype(int)
+    return numfaults
+def has_fault(mdlhist, fxnname, fault):
+    """ Returns a boolean array of whether a function has the given fault at each time in mdlhist """
+    modes = mdlhist['faultmodes'][fxnname]
+    masks = mdlhist['functions'][fxnname]['faults']
+    if fault not in modes:  return np.zeros(len(masks), dtype=bool)
+    else:                   return ((masks>>modes.index(fault))&1).astype(bool)
 def graphflows(g, nomg, gtype='normal'):
     """
     Extracts non-nominal flows by comparing the a results graph with a nominal results graph.
 
     Parameters
     ----------
-    g : networkx graph
+    g : networkx graph or StateGraph
         The graph in the given fault scenario
-    nomg : networkx graph
+    nomg : networkx graph or StateGraph
         The graph in the nominal fault scenario
     gtype : str, optional
         The type of graph to return ('normal' or 'bipartite') The default is 'normal'.
@@ -157,25 +200,25 @@ def graphflows(g, nomg, gtype='normal'):
         A dictionary of degraded flows.
     """
     endflows=dict()
+    flowstates, nomflowstates = get_flowstates(g, gtype), get_flowstates(nomg, gtype)
+    for flow, vals in flowstates.items():
+        if vals!=nomflowstates[flow]:
+            endflows[flow]={val:vals[val] for val in vals if vals[val]!=nomflowstates[flow][val]}
+    return endflows
+def get_flowstates(g, gtype='normal'):
+    """
+    Returns the states of the flows in a results graph (networkx graph or StateGraph), with structure {flow:{state:value}}.
+    For normal graphs, only includes the flows on the edges of the graph (i.e. between functions).
+    """
+    if hasattr(g, 'flowstates'): return g.flowstates
+    flowstates = dict()
     if gtype=='normal':
         for edge in g.edges:
-            flows=g.get_edge_data(edge[0],edge[1])
-            nomflows=nomg.get_edge_data(edge[0],edge[1])
-            for flow in flows:
-                if flows[flow]!=nomflows[flow]:
-                    endflows[flow]={}
-                    vals=flows[flow]
-                    for val in vals:
-                        if vals[val]!=nomflows[flow][val]: endflows[flow][val]=flows[flow][val]
+            for flow, vals in g.get_edge_data(edge[0],edge[1]).items(): flowstates.setdefault(flow, vals)
     elif gtype=='bipartite':
         for node in g.nodes:
-            if g.nodes[node]['bipartite']==1: #only flow states
-                if g.nodes[node]['states']!=nomg.nodes[node]['states']:
-                    endflows[node]={}
-                    vals=g.nodes[node]['states']
-                    for val in vals:
-                        if vals[val]!=nomg.nodes[node]['states'][val]: endflows[node][val]=vals[val]     
-    return endflows
+            if g.nodes[node]['bipartite']==1: flowstates[node]=g.nodes[node]['states'] #only flow states
+    return flowstates
 def resultsgraph(g, nomg, gtype='normal'):
     """
     Makes a graph of nominal/non-nominal states by comparing the nominal graph states with the non-nominal graph states
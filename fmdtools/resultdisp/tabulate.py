@@ -28,6 +28,7 @@ Also used for FMEA-like tables:
 """
 import pandas as pd
 import numpy as np
+from fmdtools.resultdisp.process import decode_faults
 
 #makehisttable
 # put history in a tabular format
@@ -54,12 +55,10 @@ def objtab(hist, objtype):
         for att, val in atts.items():
             label=(fxn, att)
             labels=labels+[label]
-            df[label]=val
-        if objtype =='functions':
-            if hist[objtype][fxn].get('faults'):
-                label=(fxn, 'faults')
-                labels+=[label]
-                df[label]=hist[objtype][fxn]['faults']
+            if objtype=='functions' and att=='faults' and 'faultmodes' in hist: 
+                df[label]=decode_faults(hist, fxn)
+            else:
+                df[label]=val
     index = pd.MultiIndex.from_tuples(labels)
     df = df.reindex(index, axis="columns")
     return df
@@ -34,7 +34,8 @@ plot_xy(mdlhist_split['faulty'], endresults_split)
 
 
 fhist=mdlhist_med['faulty']
-faulttime = sum([any([fhist['functions'][f]['faults'][t]!={'nom'} for f in fhist['functions']]) for t in range(len(fhist['time'])) if fhist['flows']['DOFs']['elev'][t]])
+faulty = np.any([rd.process.num_faults(fhist, f)>0 for f in fhist['functions']], axis=0)
+faulttime = sum([faulty[t] for t in range(len(fhist['time'])) if fhist['flows']['DOFs']['elev'][t]])
 
 app_med = SampleApproach(mdl_med, faults='single-component', phases={'forward'})
 endclasses_med, mdlhists = propagate.approach(mdl_med, app_med, staged=True)
@@ -7,6 +7,7 @@ Description: A fault model of a multi-rotor drone.
 """
 import numpy as np
 from fmdtools.modeldef import *
+from fmdtools.resultdisp.process import num_faults
 
 #Define specialized flows
 class Direc(Flow):
@@ -385,7 +386,8 @@ class Drone(Model):
         viewed_value = sum([0.5+2*view for k,view in viewed.items() if view!='unviewed'])
         
         fhist=mdlhist['faulty']
-        faulttime = sum([any([fhist['functions'][f]['faults'][t]!={'nom'} for f in fhist['functions']]) for t in range(len(fhist['time'])) if fhist['flows']['DOFs']['elev'][t]])
+        faulty = np.any([num_faults(fhist, f)>0 for f in fhist['functions']], axis=0)
+        faulttime = sum([faulty[t] for t in range(len(fhist['time'])) if fhist['flows']['DOFs']['elev'][t]])
         
         Env=self.flows['DOFs']
         if  inrange(self.start_area, Env.x, Env.y):     landloc = 'nominal' # nominal landing
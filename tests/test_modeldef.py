@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the model definition classes in fmdtools.modeldef
+
+- checks that the change counters (_version) of blocks and flows are only incremented
+  when the states/attributes/faults used in propagation change value
+- checks that model states captured by get_state are restored by set_state
+- checks that copies of a model share the same topology
+- checks that models are pickled/rebuilt from their specifications with the same state
+- checks that Model.reset restores the state of a new instance of the model
+- checks that lazy state graphs only construct the graph when used
+- checks that the faults and timers of models with lanes are set per lane and split into the states of each lane
+"""
+import sys
+import pickle
+import numpy as np
+sys.path.append('../')
+import fmdtools.modeldef as modeldef
+from fmdtools.modeldef import FxnBlock, Flow, Model, StateGraph, model_from_spec
+import fmdtools.faultsim.propagate as propagate
+from tests.test_propagate import Pump, LatchModel
+
+class Traj(Flow):
+    def __init__(self):
+        super().__init__({'x':0.0}, 'Traj')
+        self.traj=np.array([0.0, 0.0])
+        self._tracked.add('traj')
+
+class Move(FxnBlock):
+    def __init__(self, flows):
+        super().__init__(['Traj'], flows, {'speed':1.0, 'pos':np.array([0.0, 0.0])})
+        self.assoc_modes({'stuck':[1.0, [1,1,1], 0], 'slow':[1.0, [1,1,1], 0]})
+
+def test_flow_version():
+    flow = Flow({'x':1.0, 'y':2.0}, 'flow')
+    v0 = flow._version
+    flow.x = 1.0
+    assert flow._version == v0
+    flow.x = 3.0
+    assert flow._version == v0+1
+    flow.x = 3.0
+    flow.y = 2.0
+    assert flow._version == v0+1
+    flow.y = 0.0
+    assert flow._version == v0+2
+
+def test_flow_array_version():
+    flow = Traj()
+    v0 = flow._version
+    flow.traj = np.array([0.0, 0.0])
+    assert flow._version == v0
+    flow.traj = np.array([1.0, 0.0])
+    assert flow._version == v0+1
+    flow.traj[0] = 2.0 # in-place changes are not counted
+    assert flow._version == v0+1
+
+def test_block_version():
+    fxn = Move([Traj()])
+    v0 = fxn._version
+    fxn.speed = 1.0
+    fxn.pos = np.array([0.0, 0.0])
+    fxn.time = 10.0
+    fxn.Traj = Traj()
+    assert fxn._version == v0
+    fxn.speed = 2.0
+    assert fxn._version == v0+1
+    fxn.pos = np.array([1.0, 0.0])
+    assert fxn._version == v0+2
+
+def test_fault_version():
+    fxn = Move([Traj()])
+    v0 = fxn._version
+    fxn.add_fault('nom')
+    fxn.add_faults(['nom'])
+    fxn.remove_fault('stuck')
+    fxn.replace_fault('nom', 'nom')
+    assert fxn._version == v0
+    fxn.add_fault('stuck')
+    assert fxn._version == v0+1
+    fxn.add_faults(['stuck', 'slow'])
+    assert fxn._version == v0+2
+    fxn.add_faults(['stuck', 'slow'])
+    assert fxn._version == v0+2
+    fxn.replace_fault('slow', 'stuck')
+    assert fxn._version == v0+3
+    fxn.remove_fault('stuck')
+    assert fxn._version == v0+4
+
+def test_check_change():
+    fxn = Move([Traj()])
+    fxn._check_change()
+    assert not fxn._check_change()
+    fxn.speed = 2.0
+    fxn.speed = 1.0
+    assert not fxn._check_change()
+    fxn.speed = 2.0
+    assert fxn._check_change()
+    fxn.faults.add('stuck') # in-place fault adds are detected by the number of faults
+    assert fxn._check_change()
+
+def test_mdl_versions():
+    mdl = Model()
+    mdl.add_flow('Traj', {'x':0.0})
+    mdl.add_fxn('Move', ['Traj'], fclass=Move)
+    mdl.construct_graph()
+    for fxn in mdl.fxns.values():
+        assert fxn._version == 0
+    for flow in mdl.flows.values():
+        assert flow._version == 0
+
+def test_flowfxns():
+    for mdl in [Pump(), Pump().copy()]:
+        assert set(mdl._flowfxns) == set(mdl.flows)
+        for flowname in mdl.flows:
+            assert sorted(mdl._flowfxns[flowname]) == sorted(mdl.bipartite.neighbors(flowname))
+
+def test_get_set_state():
+    mdl = LatchModel()
+    scen = propagate.construct_nomscen(mdl)
+    scen['faults']['Latch'] = 'glitch'
+    scen['properties']['time'] = 10
+    _, c_mdl = propagate.prop_one_scen(mdl, scen, ctimes=[15])
+    state = c_mdl[15]
+    newmdl = LatchModel()
+    newmdl.set_state(state)
+    assert newmdl.fxns['Latch'].faulttimer.time == 1 and newmdl.fxns['Latch'].faults == {'nom'}
+    assert propagate.same_state(propagate.get_fullstate(newmdl), propagate.get_fullstate(mdl)) is False
+    mdl.set_state(state)
+    assert propagate.same_state(propagate.get_fullstate(newmdl), propagate.get_fullstate(mdl))
+    newmdl.fxns['Latch'].faults.add('latched') # values are copied when set, so the state is not modified
+    mdl.set_state(state)
+    assert mdl.fxns['Latch'].faults == {'nom'}
+    v0 = newmdl.flows['Sig']._version
+    newmdl.flows['Sig'].v = 5.0
+    newmdl.set_state(state)
+    assert newmdl.flows['Sig'].v == 1.0 and newmdl.flows['Sig']._version == v0+2
+
+def test_shared_topology():
+    mdl = Pump()
+    mdlcopy = mdl.copy()
+    assert mdlcopy.bipartite is mdl.bipartite and mdlcopy._flowfxns is mdl._flowfxns
+    assert mdlcopy._graph is None and mdl.construct_graph() is mdl.graph
+    for edge in mdlcopy.graph.edges:
+        for flowname, flow in mdlcopy.graph.edges[edge].items():
+            assert flow is mdlcopy.flows[flowname] and flow is not mdl.flows[flowname]
+    assert set(mdlcopy.graph.edges) == set(mdl.graph.edges)
+    try:
+        mdl.bipartite.add_node('new')
+        assert False
+    except Exception as e: assert 'Frozen' in str(e)
+    for i in range(modeldef._maxtopologies+1): # (the cache of topologies is bounded)
+        mdl = Model()
+        mdl.add_flow('Traj'+str(i), {'x':0.0})
+        mdl.add_fxn('Move', ['Traj'+str(i)], fclass=Move)
+        mdl.construct_graph()
+    assert len(modeldef._topologies) == modeldef._maxtopologies
+
+def test_statevector():
+    mdl = Model(modelparams={'statevector':True})
+    mdl.add_flow('Traj', {'x':0.0, 'n':1})
+    mdl.add_fxn('Move', ['Traj'], fclass=Move)
+    mdl.construct_graph()
+    assert list(mdl._statevector) == [0.0, 1.0] # only float attributes/states are stored in the state vector
+    flow, fxn = mdl.flows['Traj'], mdl.fxns['Move']
+    assert isinstance(flow, Flow) and isinstance(fxn, Move) and type(fxn).__name__ == 'Move'
+    v0 = flow._version
+    flow.x = 0.0
+    flow.x = 2.0
+    fxn.speed = 3.0
+    assert list(mdl._statevector) == [2.0, 3.0] and flow.x == 2.0 and flow._version == v0+1
+    state = mdl.get_state()
+    mdlcopy = mdl.copy()
+    assert list(mdlcopy._statevector) == [2.0, 3.0] and mdlcopy.flows['Traj']._vec is mdlcopy._statevector
+    flow.x = 4.0
+    mdl.set_state(state)
+    assert flow.x == 2.0 and flow._version == v0+3
+    assert type(flow.n) == int and flow.n == 1 # (non-float attributes keep their type)
+    flow.x = np.nan
+    flow.x = np.nan
+    assert np.isnan(flow.x) and flow._version == v0+4 # (NaN is not a change from NaN)
+
+def test_model_spec():
+    mdl = LatchModel()
+    scen = propagate.construct_nomscen(mdl)
+    scen['faults']['Latch'] = 'glitch'
+    scen['properties']['time'] = 10
+    propagate.prop_one_scen(mdl, scen)
+    newmdl = pickle.loads(pickle.dumps(mdl))
+    assert type(newmdl) == LatchModel and 'graph' not in newmdl.get_spec()
+    assert newmdl.fxns['Latch'].faults == {'nom', 'latched'} and newmdl.fxns['Latch'].faulttimer.time == 1
+    assert propagate.same_state(propagate.get_fullstate(newmdl), propagate.get_fullstate(mdl))
+    mdl = Model(modelparams={'statevector':True, 'times':[0, 5]})
+    mdl.add_flow('Traj', Traj())
+    mdl.add_fxn('Move', ['Traj'], fclass=Move)
+    mdl.construct_graph()
+    mdl.fxns['Move'].speed = 2.0
+    mdl.flows['Traj'].traj = np.array([1.0, 1.0])
+    newmdl = pickle.loads(pickle.dumps(mdl))
+    assert newmdl.times == [0, 5] and list(newmdl._statevector) == [0.0, 2.0]
+    assert isinstance(newmdl.flows['Traj'], Traj) and list(newmdl.flows['Traj'].traj) == [1.0, 1.0]
+    spec = mdl.get_spec()
+    spec['version'] = 0
+    try:
+        model_from_spec(spec)
+        assert False
+    except Exception as e:
+        assert 'Invalid model spec version' in str(e)
+
+def test_bulk_reset():
+    mdl = LatchModel()
+    scen = propagate.construct_nomscen(mdl)
+    scen['faults']['Latch'] = 'glitch'
+    scen['properties']['time'] = 10
+    propagate.prop_one_scen(mdl, scen)
+    mdl.fxns['Latch'].behavior = None # behaviors are not run when resetting
+    mdl.fxns['Latch'].added = 1.0
+    mdl.reset()
+    assert 'behavior' not in vars(mdl.fxns['Latch']) and not hasattr(mdl.fxns['Latch'], 'added')
+    assert mdl.fxns['Latch'].faults == {'nom'} and mdl.fxns['Latch'].faulttimer.time == 0
+    assert propagate.same_state(propagate.get_fullstate(mdl), propagate.get_fullstate(LatchModel()))
+    mdl = Pump().copy()
+    propagate.prop_one_scen(mdl, propagate.construct_nomscen(mdl))
+    mdl.reset()
+    assert propagate.same_state(propagate.get_fullstate(mdl), propagate.get_fullstate(Pump()))
+    state = mdl.get_state() # states are set by key when captured with a different layout
+    newmdl = Pump()
+    newmdl.fxns['ImportEE'].effstate = 2.0
+    newmdl.get_state()
+    newmdl.set_state(state)
+    assert not hasattr(newmdl.fxns['ImportEE'], 'effstate')
+    assert propagate.same_state(propagate.get_fullstate(newmdl), propagate.get_fullstate(mdl))
+
+def test_lazy_stategraph():
+    mdl = Pump()
+    nomgraph = mdl.return_stategraph()
+    mdl.flows['EE_1'].current = 2.0
+    mdl.fxns['MoveWater'].add_fault('mech_break')
+    stategraph = mdl.return_stategraph(lazy=True)
+    assert isinstance(stategraph, StateGraph) and stategraph._graph is None
+    assert propagate.proc.graphflows(stategraph, nomgraph) == {'EE_1':{'current':2.0}}
+    assert stategraph._graph is None
+    assert 'mech_break' in stategraph.nodes['MoveWater']['modes'] and 'MoveWater' in stategraph
+    graph = mdl.return_stategraph()
+    assert list(stategraph.edges(data=True)) == list(graph.edges(data=True))
+
+def test_lanes():
+    mdl = LatchModel()
+    mdl.fxns['Latch'].add_fault('glitch', lanes=False) # (conditions are given as bools in models without lanes)
+    assert mdl.fxns['Latch'].faults == {'nom'}
+    mdl.init_lanes(3)
+    fxn = mdl.fxns['Latch']
+    assert list(fxn.has_fault('nom')) == [True]*3 and list(mdl.flows['Sig'].v) == [1.0]*3
+    v0 = fxn._version
+    fxn.add_fault('glitch', lanes=np.array([True, False, False]))
+    fxn.add_fault('glitch', lanes=np.array([True, False, False]))
+    assert fxn._version == v0+1 and list(fxn.has_fault('glitch')) == [True, False, False]
+    fxn.replace_fault('glitch', 'latched', lanes=np.array([True, True, False]))
+    assert list(fxn.has_faults(['glitch', 'latched'])) == [True, False, False] and 'glitch' not in fxn.faults
+    fxn.faulttimer.inc(1.0, lanes=fxn.has_fault('latched'))
+    lanestates = mdl.get_lanestates()
+    newmdl = LatchModel()
+    newmdl.set_state(lanestates[0])
+    assert newmdl.fxns['Latch'].faults == {'nom', 'latched'} and newmdl.fxns['Latch'].faulttimer.time == 1.0
+    newmdl.set_state(lanestates[1])
+    assert newmdl.fxns['Latch'].faults == {'nom'} and newmdl.fxns['Latch'].faulttimer.time == 0.0
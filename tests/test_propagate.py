@@ -0,0 +1,591 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the fault propagation methods in fmdtools.faultsim.propagate
+
+- uses a simple pump model (adapted from the pump example) to check that the different
+  execution options give the same results as the default serial execution
+"""
+import os
+import sys
+import copy
+import pickle
+import tempfile
+import multiprocessing as mp
+import numpy as np
+sys.path.append('../')
+from fmdtools.modeldef import FxnBlock, Model, SampleApproach, EndState
+import fmdtools.faultsim.propagate as propagate
+from fmdtools.faultsim.nomcache import NominalCache, get_key
+from fmdtools.faultsim.profiler import Profiler
+from fmdtools.faultsim.eventstream import EventStream, EventLog, read_eventlog
+import fmdtools.resultdisp.process as proc
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'eps example'))
+from eps import EPS
+
+class ImportEE(FxnBlock):
+    def __init__(self,flows):
+        super().__init__(['EEout'],flows)
+        self.failrate=1e-5
+        self.assoc_modes({'no_v':[0.80,[0,1,0], 10000], 'inf_v':[0.20, [0,1,0], 5000]})
+    def condfaults(self,time):
+        if self.EEout.current>15.0: self.add_fault('no_v')
+    def behavior(self,time):
+        if self.has_fault('no_v'):      self.effstate=0.0
+        elif self.has_fault('inf_v'):   self.effstate=100.0
+        else:                           self.effstate=1.0
+        self.EEout.voltage=self.effstate * 500
+
+class ImportWater(FxnBlock):
+    def __init__(self,flows):
+        super().__init__(['Watout'],flows, timers={'clogtimer'})
+        self.failrate=1e-5
+        self.assoc_modes({'no_wat':[1.0, [1,1,1], 1000], 'clog':[0.5, [1,1,1], 0]})
+    def condfaults(self,time):
+        # clogs are transient faults which clear after two timesteps
+        if self.has_fault('clog'):
+            if time>self.time:              self.clogtimer.inc(self.tstep)
+            if self.clogtimer.time>=2:
+                self.remove_fault('clog')
+                self.clogtimer.reset()
+    def behavior(self,time):
+        if self.has_fault('no_wat'):    self.Watout.level=0.0
+        elif self.has_fault('clog'):    self.Watout.level=0.5
+        else:                           self.Watout.level=1.0
+
+class ExportWater(FxnBlock):
+    def __init__(self,flows):
+        super().__init__(['Watin'], flows)
+        self.failrate=1e-5
+        self.assoc_modes({'block':[1.0, [1.5, 1.0, 1.0], 5000]})
+    def behavior(self,time):
+        if self.has_fault('block'): self.Watin.area=0.01
+
+class ImportSig(FxnBlock):
+    def __init__(self,flows):
+        super().__init__(['Sigout'],flows)
+        self.failrate=1e-6
+        self.assoc_modes({'no_sig':[1.0, [1.5, 1.0, 1.0], 10000]})
+    def behavior(self, time):
+        if self.has_fault('no_sig'): self.Sigout.power=0.0
+        else:
+            if time<5:      self.Sigout.power=0.0
+            elif time<50:   self.Sigout.power=1.0
+            else:           self.Sigout.power=0.0
+
+class MoveWat(FxnBlock):
+    def __init__(self,flows, delay):
+        self.delay=delay
+        super().__init__(['EEin', 'Sigin', 'Watin', 'Watout'],flows,{'eff':1.0}, timers={'timer'})
+        self.failrate=1e-5
+        self.assoc_modes({'mech_break':[0.6, [0.1, 1.2, 0.1], 5000], 'short':[1.0, [1.5, 1.0, 1.0], 10000]})
+    def condfaults(self, time):
+        if self.Watout.pressure>15.0:
+            if time>self.time:                  self.timer.inc(self.tstep)
+            if self.timer.time>self.delay:      self.add_fault('mech_break')
+    def behavior(self, time):
+        if self.has_fault('short'):
+            self.EEin.current=500*10/5000*self.Sigin.power*self.EEin.voltage
+            self.eff=0.0
+        elif self.has_fault('mech_break'):
+            self.EEin.current=0.2*10/5000*self.Sigin.power*self.EEin.voltage
+            self.eff=0.0
+        else:
+            self.EEin.current=10/5000*self.Sigin.power*self.EEin.voltage*min(13.0, self.Watout.pressure)
+            self.eff=1.0
+        self.Watout.pressure = 10/500 * self.Sigin.power*self.eff*min(1000, self.EEin.voltage)*self.Watin.level/self.Watout.area
+        self.Watout.flowrate = 0.3/500 * self.Sigin.power*self.eff*min(1000, self.EEin.voltage)*self.Watin.level*self.Watout.area
+        self.Watin.pressure=self.Watout.pressure
+        self.Watin.flowrate=self.Watout.flowrate
+
+class Pump(Model):
+    def __init__(self, params={'delay':10}):
+        super().__init__(params=params, modelparams = {'phases':{'start':[0,5], 'on':[5, 50], 'end':[50,55]}, 'times':[0,20, 55], 'tstep':1,
+                                                       'adaptive':params.get('adaptive', False)})
+        self.add_flow('EE_1', {'current':1.0, 'voltage':1.0})
+        self.add_flow('Sig_1',  {'power':1.0})
+        self.add_flow('Wat_1', {'flowrate':1.0, 'pressure':1.0, 'area':1.0, 'level':1.0})
+        self.add_flow('Wat_2', {'flowrate':1.0, 'pressure':1.0, 'area':1.0, 'level':1.0})
+        self.add_fxn('ImportEE',['EE_1'],fclass=ImportEE)
+        self.add_fxn('ImportWater',['Wat_1'],fclass=ImportWater)
+        self.add_fxn('ImportSignal',['Sig_1'],fclass=ImportSig)
+        self.add_fxn('MoveWater', ['EE_1', 'Sig_1', 'Wat_1', 'Wat_2'],fclass=MoveWat, fparams = params['delay'])
+        self.add_fxn('ExportWater', ['Wat_2'], fclass=ExportWater)
+        self.construct_graph()
+    def find_classification(self,resgraph, endfaults, endflows, scen, mdlhists):
+        modes, modeprops = self.return_faultmodes()
+        repcost = sum([ c['rcost'] for f,m in modeprops.items() for a, c in m.items()])
+        lostwat = sum(mdlhists['nominal']['flows']['Wat_2']['flowrate'] - mdlhists['faulty']['flows']['Wat_2']['flowrate'])
+        totcost = repcost + 750 * lostwat  * self.tstep
+        if scen['properties']['type']=='nominal':   rate=1.0
+        else:                                       rate=scen['properties']['rate']
+        return {'rate':rate, 'cost': totcost, 'expected cost': rate*1e5*totcost}
+
+def check_same_hists(hist1, hist2):
+    """checks that two model histories have the same values"""
+    for objtype in ['flows', 'functions']:
+        for name, atts in hist1[objtype].items():
+            for att, vals in atts.items():
+                if att=='faults':   assert list(vals)==list(hist2[objtype][name][att])
+                else:               assert np.all(vals == hist2[objtype][name][att])
+
+def check_same_results(res1, res2):
+    """checks that two sets of (endclasses, mdlhists) have the same values"""
+    endclasses1, mdlhists1 = res1
+    endclasses2, mdlhists2 = res2
+    assert list(endclasses1)==list(endclasses2)
+    assert endclasses1==endclasses2
+    assert list(mdlhists1)==list(mdlhists2)
+    for scen in mdlhists1:
+        check_same_hists(mdlhists1[scen], mdlhists2[scen])
+
+def test_pool_single_faults():
+    mdl = Pump()
+    with mp.Pool(2) as pool:
+        for staged in [False, True]:
+            check_same_results(propagate.single_faults(mdl, staged=staged),
+                               propagate.single_faults(mdl, staged=staged, pool=pool))
+
+def test_pool_loops():
+    mdl = EPS() # (a model with feedback loops, where the schedule learned in the scenarios differs from the nominal one)
+    endclasses, mdlhists = propagate.single_faults(mdl)
+    with mp.Pool(3) as pool:
+        for staged in [False, True]:
+            check_same_results((endclasses, mdlhists), propagate.single_faults(mdl, staged=staged, pool=pool))
+
+def test_pool_approach():
+    mdl = Pump()
+    app = SampleApproach(mdl, defaultsamp={'samp':'evenspacing','numpts':3})
+    with mp.Pool(2) as pool:
+        for staged in [False, True]:
+            check_same_results(propagate.approach(mdl, app, staged=staged),
+                               propagate.approach(mdl, app, staged=staged, pool=pool))
+
+def test_forked_staged():
+    mdl = Pump()
+    app = SampleApproach(mdl, defaultsamp={'samp':'evenspacing','numpts':3})
+    for staged in [False, True]:
+        check_same_results(propagate.approach(mdl, app, staged=staged),
+                           propagate.approach(mdl, app, staged=staged, workers=2))
+    assert not propagate._workerstate
+
+def test_forked_loops():
+    mdl = EPS()
+    scenlist = propagate.list_init_faults(mdl)
+    for staged in [False, True]:
+        nomresults = propagate.run_nominal(mdl, propagate.construct_nomscen(mdl), mdl.times, staged=staged)
+        serial = propagate.run_scenlist(nomresults, scenlist)
+        for workers in [2, 3]: # (each split of the scenarios between workers gives the serial results)
+            check_same_results(serial, propagate.run_scenlist(nomresults, scenlist, workers=workers))
+
+def test_reconv():
+    mdl = Pump()
+    for staged in [False, True]:
+        endclasses, mdlhists = propagate.single_faults(mdl, staged=staged)
+        endclasses_rc, mdlhists_rc = propagate.single_faults(mdl, staged=staged, reconv=True)
+        check_same_results((endclasses, mdlhists), (endclasses_rc, mdlhists_rc))
+        assert mdlhists_rc['ImportWater clog, t=20']['reconverged'] == 22
+        assert 'reconverged' not in mdlhists_rc['MoveWater short, t=20']
+
+class Latch(FxnBlock):
+    def __init__(self,flows):
+        super().__init__(['Sig'],flows, timers={'faulttimer'})
+        self.assoc_modes({'glitch':[1.0, [1,1,1], 0], 'latched':[1.0, [1,1,1], 0]})
+    def condfaults(self,time):
+        # glitches clear after one timestep, but leave the (unrecorded) timer set, latching a fault at t=30
+        if self.has_fault('glitch'):
+            if time>self.time:  self.faulttimer.inc(self.tstep)
+            if self.faulttimer.time>=1: self.remove_fault('glitch')
+        if time>=30 and self.faulttimer.time>0: self.add_fault('latched')
+    def behavior(self,time):
+        if self.has_fault('latched') or self.has_fault('glitch'):  self.Sig.v=5.0
+        else:                                                       self.Sig.v=1.0
+    def next_event_time(self, time):
+        if time<30: return 30
+
+class LatchModel(Model):
+    def __init__(self, params={}):
+        super().__init__(params=params, modelparams = {'phases':{'on':[0, 40]}, 'times':[0,10, 40], 'tstep':1, 
+                                                       'adaptive':params.get('adaptive', False)})
+        self.add_flow('Sig', {'v':1.0})
+        self.add_fxn('Latch',['Sig'],fclass=Latch)
+        self.construct_graph()
+    def find_classification(self,resgraph, endfaults, endflows, scen, mdlhists):
+        return {'rate':1.0, 'cost': float('latched' in self.fxns['Latch'].faults), 'expected cost': 1.0}
+
+def test_reconv_hidden_state():
+    mdl = LatchModel()
+    for staged in [False, True]:
+        endclasses, mdlhists = propagate.single_faults(mdl, staged=staged)
+        endclasses_rc, mdlhists_rc = propagate.single_faults(mdl, staged=staged, reconv=True)
+        check_same_results((endclasses, mdlhists), (endclasses_rc, mdlhists_rc))
+        assert 'reconverged' not in mdlhists_rc['Latch glitch, t=10']
+        assert mdlhists_rc['Latch glitch, t=10']['flows']['Sig']['v'][30] == 5.0
+        assert endclasses_rc['Latch glitch, t=10']['cost'] == 1.0
+
+def test_invalid_pool():
+    mdl = Pump()
+    for pool in [True, 2, 'pool']:
+        try:
+            propagate.single_faults(mdl, pool=pool)
+            assert False
+        except Exception as e:
+            assert 'Invalid pool argument' in str(e)
+    for workers in [True, 2.0, -1]:
+        try:
+            propagate.single_faults(mdl, workers=workers)
+            assert False
+        except Exception as e:
+            assert 'Invalid workers argument' in str(e)
+
+def test_mdlhist_blocks():
+    mdl = Pump()
+    mdlhist = propagate.init_mdlhist(mdl, np.arange(0, 3))
+    assert mdlhist['flows']['EE_1']['current'].base is mdlhist['functions']['MoveWater']['eff'].base
+    blocks, rows = propagate.init_histrecord(mdl, mdlhist)
+    assert len(blocks)==2 and not rows # float states and int fault bitmasks
+    mdl.flows['EE_1'].current = 5.0
+    mdl.fxns['MoveWater'].eff = 0.5
+    mdl.fxns['MoveWater'].add_fault('short')
+    propagate.update_mdlhist(mdl, mdlhist, 1)
+    assert list(mdlhist['flows']['EE_1']['current']) == [1.0, 5.0, 1.0]
+    assert list(mdlhist['functions']['MoveWater']['eff']) == [1.0, 0.5, 1.0]
+    assert proc.decode_faults(mdlhist, 'MoveWater', 1) == {'nom', 'short'}
+    assert list(proc.num_faults(mdlhist, 'MoveWater')) == [0, 1, 0]
+    assert list(proc.has_fault(mdlhist, 'MoveWater', 'short')) == [False, True, False]
+
+def test_staged_overlay():
+    mdl = Pump()
+    endclasses, mdlhists = propagate.single_faults(mdl, staged=True)
+    endclasses_ns, mdlhists_ns = propagate.single_faults(mdl, staged=False)
+    check_same_results((endclasses, mdlhists), (endclasses_ns, mdlhists_ns))
+    _, mdlhists = propagate.single_faults(mdl, staged=True)
+    hist = mdlhists['MoveWater short, t=20']['flows']['EE_1']
+    assert isinstance(hist, propagate.HistOverlay) and not hist._full # not materialized until used
+    assert len(hist['current']) == len(mdlhists['nominal']['time'])
+    assert list(hist) == ['current', 'voltage'] and list(hist._full) == ['current']
+    assert type(copy.copy(hist))==dict and type(pickle.loads(pickle.dumps(hist)))==dict
+
+def test_iter_approach():
+    mdl = Pump()
+    app = SampleApproach(mdl, defaultsamp={'samp':'evenspacing','numpts':3})
+    for staged in [False, True]:
+        endclasses, mdlhists = propagate.approach(mdl, app, staged=staged)
+        iter_results = list(propagate.iter_approach(mdl, app, staged=staged))
+        assert [scenname for scenname, _, _ in iter_results] == list(endclasses)
+        for scenname, endclass, mdlhist in iter_results:
+            assert endclass == endclasses[scenname]
+            check_same_hists(mdlhist, mdlhists[scenname])
+        for scenname, endclass, reshist in propagate.iter_approach(mdl, app, staged=staged, reducer=proc.hist):
+            assert list(reshist[0]['stats']['total faults']) == list(proc.hist(mdlhists[scenname], mdlhists['nominal'])[0]['stats']['total faults'])
+
+def test_track_spec():
+    mdl = Pump()
+    _, _, fullhist = propagate.one_fault(mdl, 'MoveWater', 'short', time=20)
+    track = {'flows':{'Wat_2':['flowrate']}, 'functions':['MoveWater'], 'stride':5}
+    for staged in [False, True]:
+        mdlhist, _ = propagate.prop_one_scen(mdl, propagate.construct_nomscen(mdl), track=track)
+        assert list(mdlhist['flows']) == ['Wat_2'] and list(mdlhist['flows']['Wat_2']) == ['flowrate']
+        assert list(mdlhist['functions']) == ['MoveWater']
+        assert list(mdlhist['time']) == list(range(0, 56, 5))
+        endresults, mdlhists = propagate.single_faults(mdl, staged=staged, track=track)
+        faulty = mdlhists['MoveWater short, t=20']
+        assert list(faulty['time']) == list(range(0, 56, 5))
+        assert all(faulty['flows']['Wat_2']['flowrate'] == fullhist['faulty']['flows']['Wat_2']['flowrate'][::5])
+        assert all(faulty['functions']['MoveWater']['faults'] == fullhist['faulty']['functions']['MoveWater']['faults'][::5])
+    mdlhist, _ = propagate.prop_one_scen(mdl, propagate.construct_nomscen(mdl), track={'functions':{'MoveWater':['eff']}, 'stride':'phases'})
+    assert list(mdlhist['time']) == [0, 5, 50, 55] and list(mdlhist['functions']['MoveWater']) == ['eff']
+    assert proc.fxnhist({'nominal':mdlhist, 'faulty':mdlhist})[2] == []
+
+class VecPump(Pump):
+    def __init__(self, params={'delay':10}):
+        super().__init__(params=params)
+        self.init_statevector()
+
+def test_statevector():
+    mdl = VecPump()
+    assert vars(mdl.flows['EE_1'])['_vec'] is mdl._statevector and 'voltage' not in vars(mdl.flows['EE_1'])
+    blocks, _ = propagate.init_histrecord(mdl, propagate.init_mdlhist(mdl, np.arange(0, 3)))
+    assert [vecslots is not False for _, _, vecslots in blocks] == [True, False] # float states and int fault bitmasks
+    endclasses, mdlhists = propagate.single_faults(Pump())
+    for staged in [False, True]:
+        check_same_results((endclasses, mdlhists), propagate.single_faults(mdl, staged=staged, reconv=True))
+    with mp.Pool(2) as pool:
+        check_same_results((endclasses, mdlhists), propagate.single_faults(mdl, pool=pool))
+
+def test_nominal_cache():
+    mdl = Pump()
+    with tempfile.TemporaryDirectory() as cachedir:
+        cache = NominalCache(cachedir)
+        for staged in [False, True]:
+            results = propagate.single_faults(mdl, staged=staged)
+            check_same_results(results, propagate.single_faults(mdl, staged=staged, cache=cache))
+            key = get_key(mdl, nomscen=propagate.construct_nomscen(mdl), ctimes=mdl.times if staged else [], staged=staged, track=True, reconv=False, gtype='normal')
+            assert isinstance(cache.get(key)['nomhist']['flows']['EE_1']['current'].base, np.memmap)
+            check_same_results(results, propagate.single_faults(mdl, staged=staged, cache=cache))
+        endresults, _, mdlhist = propagate.nominal(mdl)
+        for _ in range(2):
+            endresults_c, _, mdlhist_c = propagate.nominal(mdl, cache=cache)
+            assert endresults == endresults_c
+            check_same_hists(mdlhist, mdlhist_c)
+        endresults, _, mdlhists = propagate.one_fault(mdl, 'MoveWater', 'short', time=20, staged=True)
+        endresults_c, _, mdlhists_c = propagate.one_fault(mdl, 'MoveWater', 'short', time=20, staged=True, cache=cache)
+        assert endresults == endresults_c
+        check_same_hists(mdlhists['faulty'], mdlhists_c['faulty'])
+        assert get_key(Pump(params={'delay':10})) == get_key(mdl) != get_key(Pump(params={'delay':20}))
+        cache = NominalCache(cachedir, maxsize=30000) # least-recently-used entries are removed to fit in maxsize
+        cache.put('a', {'x':np.ones(2000)})
+        cache.put('b', {'x':np.ones(2000)})
+        assert cache.get('b') and not cache.get('a')
+
+def test_checkpoints():
+    mdl = Pump()
+    results = propagate.single_faults(mdl, staged=True)
+    app = SampleApproach(mdl, defaultsamp={'samp':'evenspacing','numpts':4})
+    app_results = propagate.approach(mdl, app, staged=True)
+    for checkpoints in [5, 'sqrt']:
+        check_same_results(results, propagate.single_faults(mdl, staged=True, checkpoints=checkpoints))
+        check_same_results(app_results, propagate.approach(mdl, app, staged=True, checkpoints=checkpoints, reconv=True))
+    assert propagate.get_checkpoints(mdl, mdl.times, 'sqrt') == [0, 8, 16, 24, 32, 40, 48]
+    nomresults = propagate.run_nominal(mdl, propagate.construct_nomscen(mdl), [20], staged=True, checkpoints=8)
+    assert list(nomresults['c_mdl']) == [0, 8, 16]
+
+class EndStatePump(Pump):
+    endstates = {'fxns':{'MoveWater':['eff']}, 'hist':{'flows':{'Wat_2':['flowrate']}}}
+    def find_classification(self,resgraph, endfaults, endflows, scen, mdlhists):
+        raise Exception("Models which declare endstates should be classified using classify")
+    def classify(self, endstate, scen):
+        repcost = sum([ c['rcost'] for f,m in endstate.faultprops.items() for a, c in m.items()])
+        lostwat = sum(endstate.hists['nominal']['flows']['Wat_2']['flowrate'] - endstate.hists['faulty']['flows']['Wat_2']['flowrate'])
+        totcost = repcost + 750 * lostwat  * self.tstep
+        if scen['properties']['type']=='nominal':   rate=1.0
+        else:                                       rate=scen['properties']['rate']
+        return {'rate':rate, 'cost': totcost, 'expected cost': rate*1e5*totcost}
+
+def test_classify_endstate():
+    mdl = EndStatePump()
+    for staged in [False, True]:
+        check_same_results(propagate.single_faults(Pump(), staged=staged), propagate.single_faults(mdl, staged=staged))
+    endresults, _, _ = propagate.one_fault(mdl, 'MoveWater', 'short', time=20)
+    assert endresults['classification'] == propagate.one_fault(Pump(), 'MoveWater', 'short', time=20)[0]['classification']
+    endstate = EndState(mdl, {'faulty':propagate.nominal(mdl)[2]}, mdl.endstates)
+    assert dict(endstate.fxns['MoveWater']) == {'eff':1.0} and not endstate.flows and not endstate.faults
+    for change in [lambda: endstate.hists['faulty']['flows']['Wat_2'].update({'flowrate':[]}), 
+                   lambda: endstate.hists['faulty']['flows']['Wat_2']['flowrate'].fill(0.0),
+                   lambda: setattr(endstate, 'fxns', {})]:
+        try:
+            change()
+            assert False
+        except (TypeError, ValueError, AttributeError): pass
+
+class Source(FxnBlock):
+    def __init__(self, flows):
+        super().__init__(['Out'], flows)
+    def behavior(self, time):
+        self.Out.x = time + 1.0
+class Relay(FxnBlock):
+    def __init__(self, flows):
+        super().__init__(['In', 'Out'], flows)
+        self.assoc_modes({'stuck':[1.0, [1], 0]})
+    def behavior(self, time):
+        if not self.has_fault('stuck'): self.Out.x = self.In.x + 1.0
+class Flip(FxnBlock):
+    def __init__(self, flows):
+        super().__init__(['In', 'Out'], flows)
+    def behavior(self, time):
+        if self.In.x > 0.0: self.Out.x = 1.0 - self.Out.x
+
+class ChainModel(Model):
+    def __init__(self, params={'flip':False}):
+        super().__init__(params=params, modelparams = {'times':[0, 3], 'tstep':1})
+        for i in range(4): self.add_flow('S'+str(i), {'x':0.0})
+        for i in range(3, 0, -1): # functions are added downstream-first
+            self.add_fxn('Relay'+str(i), ['S'+str(i-1), 'S'+str(i)], fclass=Flip if params['flip'] and i==3 else Relay)
+        self.add_fxn('Source', ['S0'], fclass=Source)
+        self.construct_graph()
+
+def test_schedule():
+    mdl = ChainModel()
+    evals = []
+    mdl.fxns['Relay3'].behavior = lambda time, fxn=mdl.fxns['Relay3']: evals.append(time) or Relay.behavior(fxn, time)
+    mdlhist, _ = propagate.prop_one_scen(mdl, propagate.construct_nomscen(mdl))
+    assert list(mdlhist['flows']['S3']['x']) == [4.0, 5.0, 6.0, 7.0]
+    assert propagate.get_schedule(mdl)['order'] == ['Source', 'Relay1', 'Relay2', 'Relay3']
+    assert evals[-2:] == [3, 3] # once the schedule is planned, each function is run once (and re-run once to check its outputs)
+    mdl = ChainModel(params={'flip':True})
+    try:
+        propagate.prop_one_scen(mdl, propagate.construct_nomscen(mdl))
+        assert False
+    except propagate.ConvergenceError as e:
+        assert e.time == 0 and e.fxns == ['Relay3'] and e.sweeps > propagate.max_sweeps
+
+def test_prune():
+    mdl = Pump()
+    for staged in [False, True]:
+        for reconv in [False, True]:
+            check_same_results(propagate.single_faults(mdl, staged=staged, reconv=reconv),
+                               propagate.single_faults(mdl, staged=staged, reconv=reconv, prune=True))
+    check_same_results(propagate.single_faults(VecPump()), propagate.single_faults(VecPump(), prune=True))
+    mdl, nomstates = ChainModel(), {}
+    nomhist, _ = propagate.prop_one_scen(mdl, propagate.construct_nomscen(mdl), statehist=nomstates)
+    mdl.reset() # (the functions writing to each flow are learned in the nominal run)
+    scen = propagate.construct_nomscen(mdl)
+    scen['faults']['Relay2'] = 'stuck'
+    scen['properties']['time'] = 2
+    evals = []
+    mdl.fxns['Relay3'].behavior = lambda time, fxn=mdl.fxns['Relay3']: evals.append(time) or Relay.behavior(fxn, time)
+    mdlhist, _ = propagate.prop_one_scen(mdl, scen, prevhist=nomhist, prune=nomstates)
+    check_same_hists(mdlhist, propagate.prop_one_scen(ChainModel(), scen)[0])
+    assert list(mdlhist['flows']['S3']['x']) == [4.0, 5.0, 6.0, 6.0]
+    assert min(evals) == 3 # functions downstream of the fault are only run once the flows connected to them deviate
+
+def test_adaptive():
+    for staged in [False, True]:
+        check_same_results(propagate.single_faults(LatchModel(), staged=staged), 
+                           propagate.single_faults(LatchModel({'adaptive':True}), staged=staged))
+        check_same_results(propagate.single_faults(Pump(), staged=staged, reconv=True), 
+                           propagate.single_faults(Pump({'delay':10, 'adaptive':True}), staged=staged, reconv=True))
+    mdl = LatchModel({'adaptive':True})
+    evals = []
+    mdl.fxns['Latch'].behavior = lambda time, fxn=mdl.fxns['Latch']: evals.append(time) or Latch.behavior(fxn, time)
+    mdlhist, _ = propagate.prop_one_scen(mdl, propagate.construct_nomscen(mdl))
+    assert evals == [0, 1, 30] # steps are skipped once the model does not change, up to next_event_time
+    assert list(mdlhist['flows']['Sig']['v']) == [1.0]*41
+
+class Inlet(FxnBlock):
+    def __init__(self, flows):
+        super().__init__(['Wat'], flows)
+        self.assoc_modes({'clog':[1.0, [1], 0], 'surge':[1.0, [1], 0]})
+    def behavior(self, time):
+        self.Wat.rate = np.where(self.has_fault('clog'), 0.0, np.where(self.has_fault('surge'), 2.0, 1.0))
+class Reservoir(FxnBlock):
+    def __init__(self, flows):
+        super().__init__(['In', 'Out'], flows, states={'level':5.0}, timers={'drytimer'})
+        self.assoc_modes({'leak':[1.0, [1], 0], 'dry':[1.0, [1], 0]})
+    def condfaults(self, time):
+        if time>self.time: self.add_fault('dry', lanes=self.drytimer.time>=2)
+    def behavior(self, time):
+        if time>self.time:
+            self.level = np.clip(self.level + self.In.rate - self.Out.rate - np.where(self.has_fault('leak'), 0.5, 0.0), 0.0, 10.0)
+            self.drytimer.inc(self.tstep, lanes=self.level<=0.0)
+        self.Out.avail = np.where(self.has_fault('dry'), 0.0, self.level)
+class Outlet(FxnBlock):
+    def __init__(self, flows):
+        super().__init__(['Wat'], flows)
+        self.assoc_modes({'block':[1.0, [1], 0]})
+    def behavior(self, time):
+        self.Wat.rate = np.where(self.has_fault('block'), 0.0, np.minimum(1.0, self.Wat.avail))
+
+class LaneTank(Model):
+    """ Tank model with behaviors which operate on arrays, so it can be run with lanes (see Model.init_lanes) """
+    def __init__(self, params={}):
+        super().__init__(params=params, modelparams = {'times':[0, 5, 10, 20], 'tstep':1})
+        self.add_flow('In', {'rate':1.0})
+        self.add_flow('Out', {'rate':1.0, 'avail':5.0})
+        self.add_fxn('Inlet', ['In'], fclass=Inlet)
+        self.add_fxn('Reservoir', ['In', 'Out'], fclass=Reservoir)
+        self.add_fxn('Outlet', ['Out'], fclass=Outlet)
+        self.construct_graph()
+    def find_classification(self,resgraph, endfaults, endflows, scen, mdlhists):
+        cost = 10.0 - float(self.fxns['Reservoir'].level) + len(self.fxns['Reservoir'].faults)
+        return {'rate':scen['properties']['rate'], 'cost': cost, 'expected cost': scen['properties']['rate']*cost}
+
+def test_lanes():
+    mdl = LaneTank()
+    for staged in [False, True]:
+        check_same_results(propagate.single_faults(mdl, staged=staged), propagate.single_faults(mdl, staged=staged, lanes=3))
+    endclasses, mdlhists = propagate.single_faults(mdl, lanes=8)
+    assert endclasses['Inlet clog, t=5']['cost'] == 12.0 and proc.decode_faults(mdlhists['Inlet clog, t=5'], 'Reservoir', 20) == {'nom', 'dry'}
+    scens = [scen for scen in propagate.list_init_faults(mdl) if scen['properties']['time']==5]
+    evals = []
+    mdl.fxns['Inlet'].behavior = lambda time, fxn=mdl.fxns['Inlet']: evals.append(time) or Inlet.behavior(fxn, time)
+    mdlhists, lanemdl = propagate.prop_batch(mdl, scens)
+    assert sorted(set(evals)) == list(range(21)) and len(evals) < 2*len(set(evals)) # one run of the behavior for all the lanes
+    assert list(lanemdl.fxns['Inlet'].has_fault('clog')) == [scen['faults'] == {'Inlet':'clog'} for scen in scens]
+    assert [hist['flows']['In']['rate'][10] for hist in mdlhists] == [0.0, 2.0, 1.0, 1.0, 1.0]
+    try:
+        propagate.prop_batch(LaneTank(), propagate.list_init_faults(mdl)[:10])
+        assert False
+    except Exception as e: assert 'Invalid batch of scenarios' in str(e)
+
+class Wearing(FxnBlock):
+    def __init__(self, flows):
+        super().__init__(['Sig'], flows)
+        self.assoc_modes({'wear'+str(i):[1.0, [1], 0] for i in range(58)})
+    def condfaults(self, time):
+        # adds modes not in the (58) modes of the function, so the fault bitmasks outgrow int64
+        if time>=5: self.add_faults(['crack'+str(i) for i in range(int(time)+5)], lanes=self.has_fault('wear0'))
+    def behavior(self, time):
+        self.Sig.v = 1.0 + np.sum([np.where(self.has_fault(fault), 1.0, 0.0) for fault in self.faults if fault!='nom'], axis=0)
+
+class WearModel(Model):
+    def __init__(self, params={}):
+        super().__init__(params=params, modelparams = {'times':[0, 2, 10], 'tstep':1})
+        self.add_flow('Sig', {'v':0.0})
+        self.add_fxn('Wearing', ['Sig'], fclass=Wearing)
+        self.construct_graph()
+
+def test_unlisted_modes():
+    mdl = WearModel()
+    scen = [scen for scen in propagate.list_init_faults(mdl) if scen['faults']=={'Wearing':'wear0'}][1]
+    mdlhist, _ = propagate.prop_one_scen(WearModel(), scen)
+    assert mdlhist['functions']['Wearing']['faults'].dtype == object
+    assert len(mdlhist['faultmodes']['Wearing']) == 74
+    assert proc.decode_faults(mdlhist, 'Wearing', 10) == {'nom', 'wear0'}|{'crack'+str(i) for i in range(15)}
+    assert proc.decode_faults(mdlhist, 'Wearing', 4) == {'nom', 'wear0'}
+    assert list(mdlhist['flows']['Sig']['v']) == [1.0, 1.0, 2.0, 2.0, 2.0]+[float(t+7) for t in range(5, 11)]
+    scens = [scen for scen in propagate.list_init_faults(mdl) if scen['properties']['time']==2][:4]
+    for lanehist, scen in zip(propagate.prop_batch(WearModel(), scens)[0], scens):
+        check_same_hists(lanehist, propagate.prop_one_scen(WearModel(), scen)[0])
+
+def test_profile():
+    mdl = Pump()
+    profiler = Profiler()
+    check_same_results(propagate.single_faults(mdl), propagate.single_faults(mdl, staged=True, profile=profiler))
+    report = profiler.report()
+    assert {('behavior', 'MoveWater'), ('propagation', 'propagate'), ('history', 'update_mdlhist'), 
+            ('copy', 'set_state'), ('classification', 'classify')}.issubset(report.index)
+    assert report.loc[('classification', 'classify'), 'calls'] == len(propagate.list_init_faults(mdl))
+    sweeps = profiler.sweeps()
+    assert len(sweeps) and set(sweeps['scenario']) >= {'nominal', 'MoveWater mech_break, t=0'}
+    assert all('behavior' not in vars(fxn) and 'condfaults' not in vars(fxn) for fxn in mdl.fxns.values())
+    calls = report.loc[('behavior', 'MoveWater'), 'calls']
+    propagate.single_faults(mdl)
+    assert profiler.report().loc[('behavior', 'MoveWater'), 'calls'] == calls # (runs are only recorded when profiled)
+
+def test_events():
+    mdl = LatchModel()
+    stream, events, fxnevents = EventStream(), [], []
+    stream.subscribe(events.append, kinds=['scenario start', 'scenario end', 'fault injected', 'flow degraded', 'reconverged'])
+    stream.subscribe(fxnevents.append, kinds='function changed', names=['Latch'])
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with EventLog(tmpdir+'/run.evt') as log:
+            stream.subscribe(log)
+            check_same_results(propagate.single_faults(mdl, reconv=True), propagate.single_faults(mdl, reconv=True, events=stream))
+        logged = list(read_eventlog(tmpdir+'/run.evt'))
+    assert [event.kind for event in logged if event.kind in stream.subscribers[0][1]] == [event.kind for event in events]
+    assert logged[-1] == events[-1] and logged[-1].data['elapsed'] > 0
+    glitch = [event for event in events if event.scen == 'Latch glitch, t=10']
+    assert [event.kind for event in glitch] == ['scenario start', 'fault injected', 'flow degraded', 'scenario end']
+    assert glitch[1].name == 'Latch' and glitch[1].data == {'faults':['glitch']} and glitch[2].time == 10
+    assert fxnevents and all(event.name == 'Latch' for event in fxnevents)
+    stream.unsubscribe(events.append)
+    stream.unsubscribe(log)
+    assert stream.kinds == {'function changed'}
+    errors = []
+    stream.subscribe(errors.append, kinds=['nonconvergence', 'error'])
+    try:
+        propagate.nominal(ChainModel(params={'flip':True}), events=stream)
+        assert False
+    except propagate.ConvergenceError: 
+        assert [event.kind for event in errors] == ['nonconvergence', 'error'] and errors[0].data['fxns'] == ['Relay3']
+
+def test_scenario_order():
+    mdl = EPS() # (functions of the EPS model write to flows in fault scenarios which they do not write to nominally)
+    endclasses, mdlhists = propagate.single_faults(mdl)
+    nomresults = propagate.run_nominal(mdl, propagate.construct_nomscen(mdl), mdl.times)
+    scenlist = propagate.list_init_faults(mdl)
+    revclasses, revhists = propagate.run_scenlist(nomresults, scenlist[::-1])
+    check_same_results((endclasses, mdlhists), ({scen:revclasses[scen] for scen in endclasses}, {scen:revhists[scen] for scen in mdlhists}))
+    assert mdlhists['Export_waste_H1 hot_sink, t=1']['flows']['waste_HE_1']['effort'][-1] == 2.0
+    check_same_results((endclasses, mdlhists), propagate.single_faults(mdl, workers=2))
+    check_same_results((endclasses, mdlhists), propagate.single_faults(mdl, staged=True))